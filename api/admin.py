@@ -1,8 +1,17 @@
-from django.contrib import admin
+import uuid
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.http import HttpResponseRedirect
+from django.template.response import TemplateResponse
 from django.utils.html import format_html
-from django.urls import reverse
+from django.urls import path, reverse
 from django.utils.safestring import mark_safe
 from .models import *
+from . import availability, exports, pricing_import, site_settings, snapshots
+from .signals import content_bulk_updated
 
 
 @admin.register(LandingPageBg)
@@ -152,6 +161,10 @@ class TreatmentCategoryAdmin(admin.ModelAdmin):
     treatment_count.short_description = "Treatments"
 
 
+class PricingImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV or XLSX with treatment, clinic and price columns")
+
+
 class TreatmentClinicPricingInline(admin.TabularInline):
     model = TreatmentClinicPricing
     extra = 1
@@ -198,6 +211,7 @@ class TreatmentAdmin(admin.ModelAdmin):
 
 @admin.register(TreatmentClinicPricing)
 class TreatmentClinicPricingAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/api/treatmentclinicpricing/change_list.html'
     list_display = ['treatment', 'clinic', 'price', 'order', 'is_active']
     list_filter = ['is_active', 'clinic', 'treatment__category']
     search_fields = ['treatment__name', 'clinic__name', 'price']
@@ -213,6 +227,51 @@ class TreatmentClinicPricingAdmin(admin.ModelAdmin):
             'fields': ('order', 'is_active')
         }),
     )
+    
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_view),
+                 name='api_treatmentclinicpricing_import'),
+        ]
+        return urls + super().get_urls()
+    
+    def import_view(self, request):
+        """Upload a pricing sheet, preview the diff, then apply it in one transaction"""
+        if not self.has_change_permission(request) or not self.has_add_permission(request):
+            raise PermissionDenied
+        
+        form = PricingImportForm()
+        context = {**self.admin_site.each_context(request), 'opts': self.model._meta,
+                   'title': "Import treatment pricing"}
+        
+        if request.method == 'POST' and 'apply' in request.POST:
+            rows = request.session.pop(f"pricing_import:{request.POST.get('token')}", None)
+            if rows is None:
+                messages.error(request, "The preview has expired. Please upload the sheet again.")
+                return HttpResponseRedirect(request.path)
+            # Diff again so edits made since the preview are not overwritten blindly
+            plan = pricing_import.plan(rows)
+            if plan.errors:
+                messages.error(request, "The sheet no longer matches the current data. Please upload it again.")
+                return HttpResponseRedirect(request.path)
+            created, updated = pricing_import.apply(plan)
+            messages.success(request, f"Imported pricing: {created} created, {updated} updated, {plan.unchanged} unchanged.")
+            return HttpResponseRedirect(reverse('admin:api_treatmentclinicpricing_changelist'))
+        
+        if request.method == 'POST':
+            form = PricingImportForm(request.POST, request.FILES)
+            if form.is_valid():
+                try:
+                    rows = pricing_import.read_rows(form.cleaned_data['file'])
+                except pricing_import.PricingImportError as e:
+                    form.add_error('file', str(e))
+                else:
+                    token = uuid.uuid4().hex
+                    request.session[f"pricing_import:{token}"] = rows
+                    context.update({'plan': pricing_import.plan(rows), 'token': token})
+        
+        context['form'] = form
+        return TemplateResponse(request, 'admin/api/treatmentclinicpricing/import.html', context)
 
 
 @admin.register(TreatmentBenefit)
@@ -285,11 +344,16 @@ class SkinConcernAdmin(admin.ModelAdmin):
         ('Content', {
             'fields': ('treatments', 'products', 'results')
         }),
+        ('Linked Treatments & Results', {
+            'fields': ('linked_treatments', 'linked_results'),
+            'description': 'Shown as treatment and result cards on the skin concern'
+        }),
         ('Display', {
             'fields': ('order', 'is_active')
         }),
     )
     readonly_fields = ['icon_preview']
+    filter_horizontal = ['linked_treatments', 'linked_results']
     
     def icon_preview(self, obj):
         if obj.icon:
@@ -310,8 +374,34 @@ class LandingFAQAdmin(admin.ModelAdmin):
     question_short.short_description = "Question"
 
 
+class WhyChooseUsForm(forms.ModelForm):
+    """Rejects activating a benefit beyond the cap before anything is saved"""
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('is_active'):
+            others = WhyChooseUs.objects.filter(is_active=True).exclude(pk=self.instance.pk)
+            if others.count() >= WHY_CHOOSE_US_MAX_ACTIVE:
+                raise ValidationError(WHY_CHOOSE_US_ACTIVE_CAP_ERROR)
+        return cleaned_data
+
+
+class WhyChooseUsChangelistFormSet(forms.BaseModelFormSet):
+    """Checks the cap on the result of all list edits together, so benefits can be swapped in one save"""
+
+    def clean(self):
+        super().clean()
+        if any(self.errors):
+            return
+        edited = {form.instance.pk: bool(form.cleaned_data.get('is_active')) for form in self.forms}
+        unedited = WhyChooseUs.objects.filter(is_active=True).exclude(pk__in=edited).count()
+        if unedited + sum(edited.values()) > WHY_CHOOSE_US_MAX_ACTIVE:
+            raise ValidationError(WHY_CHOOSE_US_ACTIVE_CAP_ERROR)
+
+
 @admin.register(WhyChooseUs)
 class WhyChooseUsAdmin(admin.ModelAdmin):
+    form = WhyChooseUsForm
     list_display = ['title', 'icon', 'order', 'is_active', 'created_at']
     list_filter = ['is_active', 'icon']
     search_fields = ['title', 'description']
@@ -329,15 +419,14 @@ class WhyChooseUsAdmin(admin.ModelAdmin):
         # Show active benefits first, then inactive ones
         return super().get_queryset(request).order_by('-is_active', 'order')
     
-    def save_model(self, request, obj, form, change):
-        try:
-            super().save_model(request, obj, form, change)
-        except ValueError as e:
-            # Add a friendly error message if trying to activate more than 4 benefits
-            from django.contrib import messages
-            messages.error(request, str(e))
-            if not change:  # If it's a new object, don't save it
-                return
+    def get_changelist_formset(self, request, **kwargs):
+        return super().get_changelist_formset(request, formset=WhyChooseUsChangelistFormSet, **kwargs)
+    
+    def changelist_view(self, request, extra_context=None):
+        # The formset already checked the cap; the database checks it again once all
+        # rows are saved, so a swap may save the activation before the deactivation
+        with why_choose_us_cap_deferred():
+            return super().changelist_view(request, extra_context)
 
 
 @admin.register(Appointment)
@@ -366,19 +455,36 @@ class AppointmentAdmin(admin.ModelAdmin):
         }),
     )
     
-    actions = ['mark_confirmed', 'mark_completed', 'mark_cancelled']
+    actions = ['mark_confirmed', 'mark_completed', 'mark_cancelled', 'export_csv', 'export_xlsx']
+    
+    # queryset.update() skips post_save, so recount the booked slots explicitly.
+    # The days are collected first: with a status filter on the changelist the
+    # queryset no longer matches the rows once their status changed.
+    
+    def set_status(self, queryset, status):
+        days = set(queryset.values_list('clinic_id', 'preferred_date'))
+        queryset.update(status=status)
+        availability.recount_days(days)
     
     def mark_confirmed(self, request, queryset):
-        queryset.update(status='confirmed')
+        self.set_status(queryset, 'confirmed')
     mark_confirmed.short_description = "Mark selected appointments as confirmed"
     
     def mark_completed(self, request, queryset):
-        queryset.update(status='completed')
+        self.set_status(queryset, 'completed')
     mark_completed.short_description = "Mark selected appointments as completed"
     
     def mark_cancelled(self, request, queryset):
-        queryset.update(status='cancelled')
+        self.set_status(queryset, 'cancelled')
     mark_cancelled.short_description = "Mark selected appointments as cancelled"
+    
+    def export_csv(self, request, queryset):
+        return exports.export_response('appointments', queryset, 'csv')
+    export_csv.short_description = "Export selected appointments to CSV"
+    
+    def export_xlsx(self, request, queryset):
+        return exports.export_response('appointments', queryset, 'xlsx')
+    export_xlsx.short_description = "Export selected appointments to Excel"
 
 
 class BlogImageInline(admin.TabularInline):
@@ -428,20 +534,29 @@ class BlogAdmin(admin.ModelAdmin):
     
     actions = ['mark_published', 'mark_unpublished', 'mark_featured', 'mark_unfeatured']
     
+    # queryset.update() skips post_save, so invalidate API snapshots and CDN explicitly
     def mark_published(self, request, queryset):
+        pks = list(queryset.values_list('pk', flat=True))
         queryset.update(is_published=True)
+        content_bulk_updated(Blog, pks)
     mark_published.short_description = "Mark selected blogs as published"
     
     def mark_unpublished(self, request, queryset):
+        pks = list(queryset.values_list('pk', flat=True))
         queryset.update(is_published=False)
+        content_bulk_updated(Blog, pks)
     mark_unpublished.short_description = "Mark selected blogs as unpublished"
     
     def mark_featured(self, request, queryset):
+        pks = list(queryset.values_list('pk', flat=True))
         queryset.update(is_featured=True)
+        content_bulk_updated(Blog, pks)
     mark_featured.short_description = "Mark selected blogs as featured"
     
     def mark_unfeatured(self, request, queryset):
+        pks = list(queryset.values_list('pk', flat=True))
         queryset.update(is_featured=False)
+        content_bulk_updated(Blog, pks)
     mark_unfeatured.short_description = "Remove selected blogs from featured"
 
 
@@ -475,7 +590,7 @@ class ContactMessageAdmin(admin.ModelAdmin):
         }),
     )
     
-    actions = ['mark_read', 'mark_unread']
+    actions = ['mark_read', 'mark_unread', 'export_csv', 'export_xlsx']
     
     def mark_read(self, request, queryset):
         queryset.update(is_read=True)
@@ -484,6 +599,14 @@ class ContactMessageAdmin(admin.ModelAdmin):
     def mark_unread(self, request, queryset):
         queryset.update(is_read=False)
     mark_unread.short_description = "Mark selected messages as unread"
+    
+    def export_csv(self, request, queryset):
+        return exports.export_response('contact-messages', queryset, 'csv')
+    export_csv.short_description = "Export selected messages to CSV"
+    
+    def export_xlsx(self, request, queryset):
+        return exports.export_response('contact-messages', queryset, 'xlsx')
+    export_xlsx.short_description = "Export selected messages to Excel"
 
 
 @admin.register(SiteSettings)
@@ -605,7 +728,7 @@ class SiteSettingsAdmin(admin.ModelAdmin):
     
     def has_add_permission(self, request):
         # Prevent adding multiple instances
-        return not SiteSettings.objects.exists()
+        return site_settings.get().pk is None
     
     def has_delete_permission(self, request, obj=None):
         # Prevent deletion
@@ -634,6 +757,13 @@ class ClinicTeamMemberInline(admin.TabularInline):
     ordering = ['order']
 
 
+class ClinicScheduleInline(admin.TabularInline):
+    model = ClinicSchedule
+    extra = 0
+    fields = ['weekday', 'opens_at', 'closes_at', 'slot_minutes', 'capacity', 'is_active']
+    ordering = ['weekday']
+
+
 class OfferInline(admin.TabularInline):
     model = Offer
     extra = 1
@@ -647,7 +777,7 @@ class ClinicAdmin(admin.ModelAdmin):
     list_filter = ['is_active', 'city']
     search_fields = ['name', 'city', 'specialization']
     list_editable = ['order', 'is_active']
-    inlines = [ClinicImageInline, ClinicTeamMemberInline, OfferInline]
+    inlines = [ClinicImageInline, ClinicTeamMemberInline, ClinicScheduleInline, OfferInline]
     
     fieldsets = (
         ('Basic Information', {
@@ -808,6 +938,49 @@ class OfferAdmin(admin.ModelAdmin):
     days_remaining_display.short_description = "Status"
 
 
+@admin.register(ApiSnapshot)
+class ApiSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'host', 'size', 'generated_at', 'freshness_display']
+    list_filter = ['path', 'host']
+    search_fields = ['path', 'query_string']
+    readonly_fields = ['key', 'scheme', 'host', 'path', 'query_string', 'content_version', 'size', 'generated_at']
+    exclude = ['body']
+    actions = ['rebuild_all_snapshots', 'rebuild_selected_snapshots']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('body')
+    
+    def has_add_permission(self, request):
+        # Snapshots are generated from the API, never entered by hand
+        return False
+    
+    def freshness_display(self, obj):
+        if obj.is_fresh:
+            return format_html('<span style="color: green;">Fresh</span>')
+        return format_html('<span style="color: orange;">Stale</span>')
+    freshness_display.short_description = "Status"
+    
+    def changelist_view(self, request, extra_context=None):
+        if (request.method == 'POST' and request.POST.get('action') == 'rebuild_all_snapshots'
+                and not request.POST.getlist(helpers.ACTION_CHECKBOX_NAME)):
+            # "Rebuild all" does not need a selection, so allow it on an empty changelist
+            self.rebuild_all_snapshots(request, self.get_queryset(request))
+            return HttpResponseRedirect(request.get_full_path())
+        return super().changelist_view(request, extra_context)
+    
+    def rebuild_all_snapshots(self, request, queryset):
+        targets = snapshots.public_targets(snapshots.canonical_host(), request.scheme)
+        count = snapshots.rebuild(targets)
+        messages.success(request, f"Rebuilt {count} of {len(targets)} API snapshots.")
+    rebuild_all_snapshots.short_description = "Rebuild all API snapshots"
+    
+    def rebuild_selected_snapshots(self, request, queryset):
+        targets = [snapshots.SnapshotTarget.from_snapshot(snapshot) for snapshot in queryset]
+        count = snapshots.rebuild(targets)
+        messages.success(request, f"Rebuilt {count} of {len(targets)} API snapshots.")
+    rebuild_selected_snapshots.short_description = "Rebuild selected API snapshots"
+
+
 # Custom admin interface styling
 def admin_media_js():
     return format_html("""
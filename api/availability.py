@@ -0,0 +1,240 @@
+"""
+Appointment slot availability per clinic.
+
+Each clinic weekday has a ``ClinicSchedule`` (opening hours, slot length and
+capacity). Bookings are tallied per clinic day in ``ClinicDaySlots``, whose
+``full_mask`` bitmap marks the slots that reached capacity, so availability
+over any date range is two queries regardless of how many appointments exist:
+
+    free slots on a day = schedule.open_mask & ~full slots of the day
+
+Bookings lock the day row with ``SELECT ... FOR UPDATE`` so concurrent
+requests for the same clinic day are serialized and cannot overbook a slot.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Appointment, ClinicDaySlots, ClinicSchedule
+
+MAX_DAYS = 90
+
+CLOSED_DAY_ERROR = "The clinic does not take appointments on this day."
+INVALID_SLOT_ERROR = "Please choose one of the available time slots."
+FULL_SLOT_ERROR = "This time slot is fully booked. Please choose another."
+
+
+def iter_bits(mask):
+    """Yield the indexes of the set bits in ``mask``, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def count_bookings(clinic_id, day, schedule):
+    """Tally the non-cancelled bookings on ``day`` per slot of ``schedule``"""
+    counts = {}
+    bookings = (
+        Appointment.objects.filter(clinic_id=clinic_id, preferred_date=day)
+        .exclude(status='cancelled')
+        .values('preferred_time').annotate(count=Count('id'))
+    )
+    for booking in bookings:
+        # Times that are not a slot start (legacy or admin-entered) count against the slot they fall in
+        t = booking['preferred_time']
+        index = (t.hour * 60 + t.minute) // schedule.slot_minutes
+        counts[str(index)] = counts.get(str(index), 0) + booking['count']
+    return counts
+
+
+def full_mask(counts, capacity):
+    mask = 0
+    for index, count in counts.items():
+        if count >= capacity:
+            mask |= 1 << int(index)
+    return mask
+
+
+def lock_day(clinic_id, day, schedule):
+    """
+    Return the locked ``ClinicDaySlots`` row for a clinic day, creating or
+    recounting it when missing or taken with a different slot length.
+    Must be called inside a transaction.
+    """
+    ClinicDaySlots.objects.get_or_create(
+        clinic_id=clinic_id, date=day,
+        defaults={'slot_minutes': schedule.slot_minutes,
+                  'booked_counts': count_bookings(clinic_id, day, schedule)},
+    )
+    slots = ClinicDaySlots.objects.select_for_update().get(clinic_id=clinic_id, date=day)
+    if slots.slot_minutes != schedule.slot_minutes:
+        slots.slot_minutes = schedule.slot_minutes
+        slots.booked_counts = count_bookings(clinic_id, day, schedule)
+    slots.full_mask = full_mask(slots.booked_counts, schedule.capacity)
+    return slots
+
+
+def get_schedule(clinic_id, day):
+    """
+    The active schedule for ``day``'s weekday. Returns None when the clinic has
+    no schedules at all (bookings are then taken without capacity checks) and
+    raises ValidationError when the clinic is closed that day: weekdays without
+    an active schedule are closed, even when every schedule is inactive.
+    """
+    schedules = list(ClinicSchedule.objects.filter(clinic_id=clinic_id))
+    if not schedules:
+        return None
+    schedules = {schedule.weekday: schedule for schedule in schedules if schedule.is_active}
+    if day.weekday() not in schedules:
+        raise ValidationError({'preferred_date': CLOSED_DAY_ERROR})
+    return schedules[day.weekday()]
+
+
+def book(validated_data):
+    """Create an appointment, reserving its slot; raises ValidationError when unavailable"""
+    clinic = validated_data.get('clinic')
+    if clinic is None:
+        return Appointment.objects.create(**validated_data)
+
+    day, preferred_time = validated_data['preferred_date'], validated_data['preferred_time']
+    with transaction.atomic():
+        schedule = get_schedule(clinic.id, day)
+        if schedule is None:
+            return Appointment.objects.create(**validated_data)
+
+        index = schedule.slot_index(preferred_time)
+        if index is None:
+            raise ValidationError({'preferred_time': INVALID_SLOT_ERROR})
+
+        slots = lock_day(clinic.id, day, schedule)
+        if slots.full_mask >> index & 1:
+            raise ValidationError({'preferred_time': FULL_SLOT_ERROR})
+
+        appointment = Appointment(**validated_data)
+        appointment._slot_reserved = True
+        appointment.save()
+
+        slots.booked_counts[str(index)] = slots.booked_counts.get(str(index), 0) + 1
+        slots.full_mask = full_mask(slots.booked_counts, schedule.capacity)
+        slots.save(update_fields=['slot_minutes', 'booked_counts', 'full_mask', 'updated_at'])
+    return appointment
+
+
+def reserve_many(appointments):
+    """
+    Reserve slots for a batch of unsaved appointments, e.g. before
+    ``bulk_create``. Returns ``{position: errors}`` for the appointments that
+    did not fit; the rest are counted. Must be called inside a transaction.
+    """
+    clinic_ids = {appointment.clinic_id for appointment in appointments if appointment.clinic_id}
+    all_schedules = list(ClinicSchedule.objects.filter(clinic_id__in=clinic_ids))
+    schedules = {
+        (schedule.clinic_id, schedule.weekday): schedule for schedule in all_schedules if schedule.is_active
+    }
+    # Inactive schedules still mark the clinic as scheduled: their weekdays are closed
+    scheduled_clinics = {schedule.clinic_id for schedule in all_schedules}
+
+    errors, wanted = {}, {}
+    for position, appointment in enumerate(appointments):
+        if appointment.clinic_id not in scheduled_clinics:
+            continue
+        day = appointment.preferred_date
+        schedule = schedules.get((appointment.clinic_id, day.weekday()))
+        if schedule is None:
+            errors[position] = {'preferred_date': [CLOSED_DAY_ERROR]}
+            continue
+        index = schedule.slot_index(appointment.preferred_time)
+        if index is None:
+            errors[position] = {'preferred_time': [INVALID_SLOT_ERROR]}
+            continue
+        wanted[position] = ((appointment.clinic_id, day), schedule, index)
+
+    # Lock days in a fixed order so concurrent batches cannot deadlock
+    days = {}
+    for clinic_id, day in sorted({key for key, _, _ in wanted.values()}):
+        schedule = schedules[(clinic_id, day.weekday())]
+        days[(clinic_id, day)] = lock_day(clinic_id, day, schedule)
+
+    for position, (key, schedule, index) in wanted.items():
+        counts = days[key].booked_counts
+        if counts.get(str(index), 0) >= schedule.capacity:
+            errors[position] = {'preferred_time': [FULL_SLOT_ERROR]}
+            continue
+        counts[str(index)] = counts.get(str(index), 0) + 1
+
+    for (clinic_id, day), slots in days.items():
+        slots.full_mask = full_mask(slots.booked_counts, schedules[(clinic_id, day.weekday())].capacity)
+        slots.save(update_fields=['slot_minutes', 'booked_counts', 'full_mask', 'updated_at'])
+    return errors
+
+
+def recount(clinic_id, day):
+    """Recount a clinic day after an appointment was edited, cancelled or deleted"""
+    if clinic_id is None:
+        return
+    schedule = ClinicSchedule.objects.filter(
+        clinic_id=clinic_id, weekday=day.weekday(), is_active=True,
+    ).first()
+    if schedule is None:
+        ClinicDaySlots.objects.filter(clinic_id=clinic_id, date=day).delete()
+        return
+    with transaction.atomic():
+        slots = lock_day(clinic_id, day, schedule)
+        slots.booked_counts = count_bookings(clinic_id, day, schedule)
+        slots.full_mask = full_mask(slots.booked_counts, schedule.capacity)
+        slots.save()
+
+
+def recount_days(days):
+    """
+    Recount ``(clinic_id, date)`` pairs after ``QuerySet.update()``, which sends
+    no signals. Collect them before the update, which may change which rows
+    the queryset matches.
+    """
+    for clinic_id, day in days:
+        recount(clinic_id, day)
+
+
+def free_slots(clinic_id, start, days):
+    """
+    Free slot start times for each open day in ``[start, start + days)``.
+
+    Returns ``[{'date': date, 'slots': [time, ...]}, ...]``; slots that have
+    already started today are left out.
+    """
+    end = start + timedelta(days=days)
+    schedules = {
+        schedule.weekday: schedule
+        for schedule in ClinicSchedule.objects.filter(clinic_id=clinic_id, is_active=True)
+    }
+    if not schedules:
+        return []
+    booked = {
+        slots.date: slots
+        for slots in ClinicDaySlots.objects.filter(clinic_id=clinic_id, date__gte=start, date__lt=end)
+    }
+
+    now = timezone.localtime()
+    result = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        schedule = schedules.get(day.weekday())
+        if schedule is None or day < now.date():
+            continue
+        mask = schedule.open_mask
+        slots = booked.get(day)
+        if slots is not None:
+            if slots.slot_minutes == schedule.slot_minutes:
+                mask &= ~full_mask(slots.booked_counts, schedule.capacity)
+            else:
+                # Slot length changed since the day was tallied; recount until the next booking does
+                mask &= ~full_mask(count_bookings(clinic_id, day, schedule), schedule.capacity)
+        times = [schedule.slot_time(index) for index in iter_bits(mask)]
+        if day == now.date():
+            times = [t for t in times if t > now.time()]
+        result.append({'date': day, 'slots': times})
+    return result
@@ -0,0 +1,298 @@
+"""
+In-process catalog of treatments, categories, clinic pricing and clinics.
+
+The treatment catalog is small and read by most public endpoints, so each
+worker loads it once into compact read-only records with precomputed indexes
+(category -> treatments, clinic -> treatments, treatment -> pricing) and
+answers from memory, related content included. The catalog is tied to the
+content version (see ``api.snapshots``): after any content save the next
+access builds a new catalog and swaps it in whole, so readers never see a
+half-built one.
+
+Records carry the ``_meta`` of their model and a ``pk``, so the existing
+model serializers render them unchanged, surrogate keys included.
+"""
+import logging
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+
+from . import related, snapshots
+from .prices import CURRENCY_CODES
+from .models import (
+    Clinic, Treatment, TreatmentBenefit, TreatmentCategory, TreatmentClinicPricing, TreatmentStep,
+)
+
+logger = logging.getLogger('api.catalog')
+
+_catalog = None
+_build_lock = threading.Lock()
+
+
+class Record:
+    """Read-only catalog row"""
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.id}>"
+
+
+class CategoryRecord(Record):
+    __slots__ = ('id', 'title', 'description', 'order', 'is_active')
+    _meta = TreatmentCategory._meta
+
+
+class BenefitRecord(Record):
+    __slots__ = ('id', 'title', 'description')
+    _meta = TreatmentBenefit._meta
+
+
+class StepRecord(Record):
+    __slots__ = ('id', 'title', 'description', 'step_number')
+    _meta = TreatmentStep._meta
+
+
+class TreatmentRecord(Record):
+    """An active treatment; ``image`` is the file URL or an empty string"""
+    __slots__ = ('id', 'category', 'name', 'duration', 'duration_minutes', 'description', 'image', 'is_featured',
+                 'order', 'benefits', 'steps', 'related')
+    _meta = Treatment._meta
+    is_active = True
+
+    @property
+    def category_id(self):
+        return self.category.id
+
+
+class PricingRecord(Record):
+    """An active pricing row of an active treatment"""
+    __slots__ = ('id', 'treatment_id', 'clinic_id', 'clinic_name', 'price', 'amount_min', 'amount_max', 'currency',
+                 'order')
+    _meta = TreatmentClinicPricing._meta
+    is_active = True
+
+
+class ClinicRecord(Record):
+    __slots__ = ('id', 'name', 'city', 'is_active')
+    _meta = Clinic._meta
+
+
+def to_id(value):
+    """Query string ids as ints; None when missing or not a number"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def price_filter(query_params):
+    """
+    ``(price_max, sort, currency)`` from ``?price_max=``, ``?sort=price|-price``
+    and ``?currency=INR``; ValueError when invalid
+    """
+    sort = query_params.get('sort')
+    if sort not in (None, 'price', '-price'):
+        raise ValueError("sort must be 'price' or '-price'")
+    price_max = query_params.get('price_max')
+    if price_max is not None:
+        try:
+            price_max = Decimal(price_max)
+        except InvalidOperation:
+            price_max = None
+        if price_max is None or not price_max.is_finite():
+            raise ValueError("price_max must be a number")
+    currency = query_params.get('currency')
+    if currency is not None:
+        currency = currency.upper()
+        if currency not in CURRENCY_CODES.values():
+            raise ValueError(f"currency must be one of {', '.join(sorted(set(CURRENCY_CODES.values())))}")
+    return price_max, sort, currency
+
+
+class Catalog:
+    """One immutable build of the catalog for a content version"""
+    __slots__ = ('version', 'categories', 'active_categories', 'clinics', 'treatments', 'featured',
+                 'treatments_by_category', 'treatments_by_clinic', 'pricing_by_treatment')
+
+    def __init__(self, version, categories, clinics, treatments, pricing):
+        self.version = version
+        self.categories = {category.id: category for category in categories}
+        self.active_categories = tuple(category for category in categories if category.is_active)
+        self.clinics = {clinic.id: clinic for clinic in clinics}
+        self.treatments = {treatment.id: treatment for treatment in treatments}
+        self.featured = tuple(treatment for treatment in treatments if treatment.is_featured)
+
+        by_category, by_clinic, by_treatment = {}, {}, {}
+        for treatment in treatments:
+            by_category.setdefault(treatment.category_id, []).append(treatment)
+        for row in pricing:
+            by_treatment.setdefault(row.treatment_id, []).append(row)
+            by_clinic.setdefault(row.clinic_id, []).append(self.treatments[row.treatment_id])
+        self.treatments_by_category = {key: tuple(value) for key, value in by_category.items()}
+        self.treatments_by_clinic = {
+            key: tuple(sorted(value, key=lambda treatment: (treatment.order, treatment.name)))
+            for key, value in by_clinic.items()
+        }
+        self.pricing_by_treatment = {key: tuple(value) for key, value in by_treatment.items()}
+
+    def offered_at(self, treatment, clinic_id):
+        return any(row.clinic_id == clinic_id for row in self.pricing_by_treatment.get(treatment.id, ()))
+
+    def pricing(self, treatment_id, clinic_id=None):
+        """Active pricing of a treatment, optionally for one clinic"""
+        rows = self.pricing_by_treatment.get(treatment_id, ())
+        if clinic_id:
+            clinic_id = to_id(clinic_id)
+            rows = tuple(row for row in rows if row.clinic_id == clinic_id)
+        return rows
+
+    def category_treatments(self, category_id, clinic_id=None):
+        """Active treatments of a category, optionally only those offered at a clinic"""
+        treatments = self.treatments_by_category.get(category_id, ())
+        if clinic_id:
+            clinic_id = to_id(clinic_id)
+            treatments = tuple(treatment for treatment in treatments if self.offered_at(treatment, clinic_id))
+        return treatments
+
+    def featured_treatments(self, clinic_id=None):
+        treatments = self.featured
+        if clinic_id:
+            clinic_id = to_id(clinic_id)
+            treatments = tuple(treatment for treatment in treatments if self.offered_at(treatment, clinic_id))
+        return treatments
+
+    def clinic_treatments(self, clinic_id):
+        """Active treatments with active pricing at a clinic, by order and name"""
+        return self.treatments_by_clinic.get(to_id(clinic_id), ())
+
+    def lowest_price(self, treatment_id, clinic_id=None, currency=None):
+        """
+        Lowest parsed amount a treatment is offered from, optionally at one
+        clinic and in one currency; None when unpriced
+        """
+        amounts = [
+            row.amount_min for row in self.pricing(treatment_id, clinic_id)
+            if row.amount_min is not None and (currency is None or row.currency == currency)
+        ]
+        return min(amounts) if amounts else None
+
+    def by_price(self, treatments, clinic_id=None, price_max=None, sort=None, currency=None):
+        """
+        ``treatments`` offered from at most ``price_max``, ordered by their
+        lowest price when ``sort`` is 'price' (or '-price' for highest
+        first). Treatments without a parsed price sort last.
+
+        Amounts are only compared within one currency: with ``currency`` only
+        rows in it count, without it ValueError is raised when the priced
+        rows name more than one currency.
+        """
+        if price_max is None and sort is None:
+            return treatments
+        if currency is None:
+            currencies = {
+                row.currency for treatment in treatments for row in self.pricing(treatment.id, clinic_id)
+                if row.amount_min is not None and row.currency
+            }
+            if len(currencies) > 1:
+                raise ValueError(f"Prices are in {', '.join(sorted(currencies))}; choose one with ?currency=")
+        lowest = {treatment.id: self.lowest_price(treatment.id, clinic_id, currency) for treatment in treatments}
+        if price_max is not None:
+            treatments = tuple(
+                treatment for treatment in treatments
+                if lowest[treatment.id] is not None and lowest[treatment.id] <= price_max
+            )
+        if sort is not None:
+            priced = sorted((treatment for treatment in treatments if lowest[treatment.id] is not None),
+                            key=lambda treatment: lowest[treatment.id], reverse=sort == '-price')
+            treatments = tuple(priced) + tuple(treatment for treatment in treatments if lowest[treatment.id] is None)
+        return treatments
+
+
+def file_url(field, name):
+    return field.storage.url(name) if name else ""
+
+
+def build(version):
+    """Load the catalog in seven queries"""
+    categories = [
+        CategoryRecord(id=id, title=title, description=description, order=order, is_active=is_active)
+        for id, title, description, order, is_active in TreatmentCategory.objects.order_by('order', 'id')
+        .values_list('id', 'title', 'description', 'order', 'is_active')
+    ]
+    clinics = [
+        ClinicRecord(id=id, name=name, city=city, is_active=is_active)
+        for id, name, city, is_active in Clinic.objects.values_list('id', 'name', 'city', 'is_active')
+    ]
+
+    benefits, steps = {}, {}
+    for id, treatment_id, title, description in (
+        TreatmentBenefit.objects.filter(is_active=True, treatment__is_active=True)
+        .order_by('order', 'id').values_list('id', 'treatment_id', 'title', 'description')
+    ):
+        benefits.setdefault(treatment_id, []).append(BenefitRecord(id=id, title=title, description=description))
+    for id, treatment_id, title, description, step_number in (
+        TreatmentStep.objects.filter(is_active=True, treatment__is_active=True)
+        .order_by('order', 'step_number', 'id')
+        .values_list('id', 'treatment_id', 'title', 'description', 'step_number')
+    ):
+        steps.setdefault(treatment_id, []).append(
+            StepRecord(id=id, title=title, description=description, step_number=step_number)
+        )
+
+    related_items = related.by_source('treatment')
+    category_map = {category.id: category for category in categories}
+    image_field = Treatment._meta.get_field('image')
+    treatments = [
+        TreatmentRecord(
+            id=id, category=category_map[category_id], name=name, duration=duration,
+            duration_minutes=duration_minutes, description=description, image=file_url(image_field, image),
+            is_featured=is_featured, order=order, benefits=tuple(benefits.get(id, ())),
+            steps=tuple(steps.get(id, ())), related=related_items.get(id, ()),
+        )
+        for id, category_id, name, duration, duration_minutes, description, image, is_featured, order in (
+            Treatment.objects.filter(is_active=True).order_by('order', 'id')
+            .values_list('id', 'category_id', 'name', 'duration', 'duration_minutes', 'description', 'image',
+                         'is_featured', 'order')
+        )
+    ]
+
+    clinic_names = {clinic.id: clinic.name for clinic in clinics}
+    pricing = [
+        PricingRecord(id=id, treatment_id=treatment_id, clinic_id=clinic_id, clinic_name=clinic_names[clinic_id],
+                      price=price, amount_min=amount_min, amount_max=amount_max, currency=currency, order=order)
+        for id, treatment_id, clinic_id, price, amount_min, amount_max, currency, order in (
+            TreatmentClinicPricing.objects.filter(is_active=True, treatment__is_active=True)
+            .order_by('order', 'clinic__name', 'id')
+            .values_list('id', 'treatment_id', 'clinic_id', 'price', 'amount_min', 'amount_max', 'currency', 'order')
+        )
+    ]
+    return Catalog(version, categories, clinics, treatments, pricing)
+
+
+def current():
+    """The catalog for the current content version, building it when stale"""
+    global _catalog
+
+    version = snapshots.current_version()
+    catalog = _catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+    with _build_lock:
+        # Another thread may have built it while we waited
+        if _catalog is None or _catalog.version != version:
+            started = time.monotonic()
+            _catalog = build(version)
+            logger.info(f"Built treatment catalog: {len(_catalog.treatments)} treatment(s) "
+                        f"in {(time.monotonic() - started) * 1000:.0f}ms")
+        return _catalog
@@ -0,0 +1,215 @@
+"""
+HTTP caching for a CDN tier in front of the public API.
+
+- ``CachePolicyMiddleware`` adds per-endpoint ``Cache-Control`` headers and a
+  ``Surrogate-Key`` header naming the model instances in the response
+  (``clinic-3``, ``treatment-42``) plus the models listed (``treatment``).
+- Serializers record those keys through ``add_keys`` while rendering.
+- ``purge_dispatcher`` collects keys from content saves/deletes and purges
+  them in batches through the configured purge backend.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('api.cdn')
+
+# Longest Surrogate-Key header we emit; CDNs reject much longer ones
+MAX_SURROGATE_HEADER = 8000
+
+DEFAULT_POLICY = {'max_age': 60, 's_maxage': 3600, 'stale_while_revalidate': 86400}
+
+# Cache policies by URL name. Blog detail is deliberately absent: it counts views.
+DEFAULT_CACHE_POLICIES = {
+    'landing_bg': DEFAULT_POLICY,
+    'about_us': DEFAULT_POLICY,
+    'treatments': DEFAULT_POLICY,
+    'treatment_categories': DEFAULT_POLICY,
+    'treatment_categories_nav': DEFAULT_POLICY,
+    'treatment_browse': DEFAULT_POLICY,
+    'treatment_detail': DEFAULT_POLICY,
+    'treatment_faq': DEFAULT_POLICY,
+    'clinics_list': DEFAULT_POLICY,
+    'clinic_detail': DEFAULT_POLICY,
+    'clinic_treatments': DEFAULT_POLICY,
+    'results': DEFAULT_POLICY,
+    'skin_concerns': DEFAULT_POLICY,
+    'landing_faq': DEFAULT_POLICY,
+    'why_choose_us': DEFAULT_POLICY,
+    'testimonials': DEFAULT_POLICY,
+    'blog_list_create': DEFAULT_POLICY,
+    'search': {'max_age': 60, 's_maxage': 600, 'stale_while_revalidate': 3600},
+    'suggest': {'max_age': 60, 's_maxage': 600, 'stale_while_revalidate': 3600},
+    'site_settings': {'max_age': 300, 's_maxage': 3600, 'stale_while_revalidate': 86400},
+    # Validity and days_remaining roll over at midnight
+    'clinic_offers': {'max_age': 60, 's_maxage': 900, 'stale_while_revalidate': 3600},
+    'offers_list': {'max_age': 60, 's_maxage': 900, 'stale_while_revalidate': 3600},
+}
+
+_surrogate_keys = ContextVar('surrogate_keys', default=None)
+
+
+def instance_key(instance):
+    return f"{instance._meta.model_name}-{instance.pk}"
+
+
+@contextmanager
+def surrogate_key_scope():
+    """Collect surrogate keys added while rendering; nested scopes share the outer set"""
+    keys = _surrogate_keys.get()
+    if keys is not None:
+        yield keys
+        return
+    keys = set()
+    token = _surrogate_keys.set(keys)
+    try:
+        yield keys
+    finally:
+        _surrogate_keys.reset(token)
+
+
+def add_keys(*keys):
+    """Record surrogate keys for the response being rendered (no-op outside a scope)"""
+    collected = _surrogate_keys.get()
+    if collected is not None:
+        collected.update(keys)
+
+
+def surrogate_header(keys):
+    """
+    Format keys for the ``Surrogate-Key`` header. When the header would be too
+    long, instance keys are folded into their model key, which is purged on
+    every change to that model and so covers them.
+    """
+    header = ' '.join(sorted(keys))
+    if len(header) > MAX_SURROGATE_HEADER:
+        header = ' '.join(sorted({key.rsplit('-', 1)[0] for key in keys}))
+    return header
+
+
+def cache_control(policy):
+    return (
+        f"public, max-age={policy['max_age']}, s-maxage={policy['s_maxage']}, "
+        f"stale-while-revalidate={policy['stale_while_revalidate']}"
+    )
+
+
+class CachePolicyMiddleware:
+    """Add Cache-Control and Surrogate-Key headers to cacheable API responses"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.policies = getattr(settings, 'API_CACHE_POLICIES', DEFAULT_CACHE_POLICIES)
+
+    def __call__(self, request):
+        with surrogate_key_scope() as keys:
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        policy = self.policies.get(match.url_name) if match else None
+        if (policy and request.method in ('GET', 'HEAD') and response.status_code == 200
+                and not response.has_header('Cache-Control')):
+            response['Cache-Control'] = cache_control(policy)
+            if keys:
+                response['Surrogate-Key'] = surrogate_header(keys)
+        return response
+
+
+def purge_keys_for(instance):
+    """Keys to purge when ``instance`` changes: itself, its model list and its parents"""
+    keys = {instance._meta.model_name, instance_key(instance)}
+    for field in instance._meta.concrete_fields:
+        if field.is_relation and field.many_to_one:
+            related_id = getattr(instance, field.attname)
+            if related_id is not None:
+                keys.add(f"{field.related_model._meta.model_name}-{related_id}")
+    return keys
+
+
+class LoggingPurgeBackend:
+    """Purge target without a CDN: only logs the batch (the default when Fastly is not configured)"""
+
+    def purge(self, keys):
+        logger.info(f"No CDN configured; skipped purging {len(keys)} surrogate key(s)")
+
+
+class LocalPurgeBackend:
+    """
+    Records purged batches in memory for tests to inspect. The list only
+    grows, so select it with override_settings, never in a running site.
+    """
+    purged = []
+
+    def purge(self, keys):
+        LocalPurgeBackend.purged.append(sorted(keys))
+        logger.info(f"Purged {len(keys)} surrogate key(s) locally")
+
+
+class FastlyPurgeBackend:
+    """Purge by surrogate key through the Fastly API (up to 256 keys per call)"""
+    batch_size = 256
+
+    def __init__(self):
+        self.service_id = settings.FASTLY_SERVICE_ID
+        self.api_token = settings.FASTLY_API_TOKEN
+
+    def purge(self, keys):
+        import requests
+
+        keys = sorted(keys)
+        for start in range(0, len(keys), self.batch_size):
+            batch = keys[start:start + self.batch_size]
+            response = requests.post(
+                f"https://api.fastly.com/service/{self.service_id}/purge",
+                headers={
+                    'Fastly-Key': self.api_token,
+                    'Surrogate-Key': ' '.join(batch),
+                    'Accept': 'application/json',
+                },
+                timeout=10,
+            )
+            response.raise_for_status()
+            logger.info(f"Purged {len(batch)} surrogate key(s) from Fastly")
+
+
+class PurgeDispatcher:
+    """
+    Batches surrogate keys and hands them to the purge backend. Keys queued
+    within ``API_PURGE_DELAY`` seconds of each other go out in one purge.
+    """
+
+    def __init__(self):
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def queue(self, keys):
+        delay = getattr(settings, 'API_PURGE_DELAY', 1)
+        with self.lock:
+            self.pending.update(keys)
+            if delay is not None and self.timer is None:
+                # The first key opens the batch window; later keys join it
+                self.timer = threading.Timer(delay, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+        if delay is None:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            keys, self.pending = self.pending, set()
+            self.timer = None
+        if not keys:
+            return
+        try:
+            backend = import_string(getattr(settings, 'API_PURGE_BACKEND', 'api.cdn.LoggingPurgeBackend'))()
+            backend.purge(keys)
+        except Exception:
+            logger.exception(f"Failed to purge {len(keys)} surrogate key(s)")
+
+
+purge_dispatcher = PurgeDispatcher()
@@ -0,0 +1,133 @@
+"""
+gzip/brotli compression of API responses, negotiated from ``Accept-Encoding``.
+
+- Snapshot and site settings bodies are compressed once, at the highest
+  level, when they are stored; a hit sends the stored variant as is.
+- ``CompressionMiddleware`` compresses other API responses on the fly at a
+  cheaper level.
+
+Bodies under ``API_COMPRESS_MIN_SIZE`` bytes are sent as they are. Only
+``/api/`` responses are compressed: admin pages carry CSRF tokens, which
+compression can leak (BREACH). Brotli is used when the ``brotli`` package is
+installed, otherwise only gzip is offered.
+"""
+import gzip
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred first when a client accepts both with the same quality
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+
+def min_size():
+    return getattr(settings, 'API_COMPRESS_MIN_SIZE', 1024)
+
+
+def compress(body, encoding, stored=False):
+    """Compress ``body``; stored bodies are compressed harder since it happens once"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=11 if stored else 5)
+    # mtime=0 keeps the bytes identical between workers and rebuilds
+    return gzip.compress(body, compresslevel=9 if stored else 6, mtime=0)
+
+
+def variants(body):
+    """``{encoding: compressed body}`` for storing next to ``body``; empty for small bodies"""
+    if len(body) < min_size():
+        return {}
+    result = {}
+    for encoding in ENCODINGS:
+        compressed = compress(body, encoding, stored=True)
+        if len(compressed) < len(body):
+            result[encoding] = compressed
+    return result
+
+
+def accepted_encodings(request):
+    """Encodings the client accepts, as ``{encoding: quality}``"""
+    accepted = {}
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def negotiate(request, available):
+    """The best encoding in ``available`` for the client, or None for identity"""
+    accepted = accepted_encodings(request)
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        if encoding not in available:
+            continue
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def apply_precompressed(request, response, encoded):
+    """Send the best of the stored ``encoded`` variants of ``response``'s body"""
+    encoding = negotiate(request, encoded)
+    if encoding:
+        response.content = encoded[encoding]
+        response['Content-Encoding'] = encoding
+    if encoded:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    # Already negotiated; the middleware leaves it alone
+    response.precompressed = True
+    return response
+
+
+def precompressed_response(request, body, encoded, content_type='application/json'):
+    return apply_precompressed(request, HttpResponse(body, content_type=content_type), encoded)
+
+
+class CompressionMiddleware:
+    """Compress API responses that were not precompressed"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            not request.path.startswith('/api/')
+            or getattr(response, 'precompressed', False)
+            or response.streaming
+            or response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES)
+            or len(response.content) < min_size()
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(request, ENCODINGS)
+        if encoding is None:
+            return response
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        if response.has_header('ETag'):
+            # A strong ETag names the uncompressed bytes
+            response['ETag'] = 'W/' + response['ETag'].removeprefix('W/')
+        return response
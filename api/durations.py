@@ -0,0 +1,59 @@
+"""
+Parsing of treatment duration strings ("60 minutes", "1-2 hours",
+"1 hour 30 mins") into minutes, and the duration buckets used to browse.
+
+Kept free of model imports so migrations can use it.
+"""
+import re
+from decimal import Decimal
+
+UNIT_MINUTES = {'m': 1, 'h': 60}
+
+PART_RE = re.compile(
+    r'(\d+(?:\.\d+)?)(?:\s*(?:-|–|to)\s*\d+(?:\.\d+)?)?\s*(min(?:ute)?s?|m|h(?:ou)?rs?|hours?|h)\b'
+)
+NUMBER_RE = re.compile(r'^\s*(\d+)\s*$')
+RANGE_RE = re.compile(r'-|–|\bto\b|\bor\b')
+
+# (slug, label, lowest minutes, highest minutes); bounds are inclusive, None is open
+DURATION_BUCKETS = [
+    ('up-to-30', "Up to 30 minutes", None, 30),
+    ('30-60', "30 to 60 minutes", 31, 60),
+    ('60-120', "1 to 2 hours", 61, 120),
+    ('over-120', "Over 2 hours", 121, None),
+]
+
+
+def parse_duration(text):
+    """
+    Minutes a treatment takes, or None when the text gives no time. Ranges
+    count from their lower end ("1-2 hours" is 60); "1 hour 30 mins" is 90.
+    """
+    text = (text or '').casefold()
+    minutes = Decimal(0)
+    found = False
+    previous_end = 0
+    for match in PART_RE.finditer(text):
+        if found and RANGE_RE.search(text, previous_end, match.start()):
+            # "45 minutes - 1 hour": a range across units, keep the lower end
+            break
+        minutes += Decimal(match.group(1)) * UNIT_MINUTES[match.group(2)[0]]
+        found = True
+        previous_end = match.end()
+    if not found:
+        # A bare number is taken as minutes
+        match = NUMBER_RE.match(text)
+        if match is None:
+            return None
+        minutes = Decimal(match.group(1))
+    return int(minutes.to_integral_value())
+
+
+def duration_bucket(minutes):
+    """Slug of the bucket ``minutes`` falls in; None for unknown durations"""
+    if minutes is None:
+        return None
+    for slug, _, lowest, highest in DURATION_BUCKETS:
+        if (lowest is None or minutes >= lowest) and (highest is None or minutes <= highest):
+            return slug
+    return None
@@ -0,0 +1,150 @@
+"""
+Streaming CSV/XLSX exports of appointments and contact messages.
+
+Rows are read with ``QuerySet.iterator()`` as plain tuples, so memory use
+does not grow with the number of rows:
+
+- CSV is written row by row straight into the response, so the first
+  bytes go out immediately;
+- XLSX goes through openpyxl's write-only workbook (rows are spooled to a
+  temporary file, not kept in memory) and the finished file is then
+  streamed in chunks, since a zip container is only complete once written.
+
+Names and messages come from the public forms, so text a spreadsheet would
+run as a formula is made inert: in CSV it gets a leading quote (see
+``neutralize``), in XLSX every text value is written as a string cell and
+kept unchanged.
+"""
+import csv
+import re
+import tempfile
+from datetime import datetime
+
+from django.http import StreamingHttpResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from django.utils import timezone
+
+from .models import Appointment, ContactMessage
+
+CHUNK_SIZE = 2000
+FILE_CHUNK_SIZE = 64 * 1024
+
+# (column header, values_list lookup) per export
+EXPORTS = {
+    'appointments': {
+        'model': Appointment,
+        'columns': [
+            ('ID', 'id'),
+            ('Clinic', 'clinic__name'),
+            ('First Name', 'first_name'),
+            ('Last Name', 'last_name'),
+            ('Email', 'email'),
+            ('Phone', 'phone'),
+            ('Preferred Date', 'preferred_date'),
+            ('Preferred Time', 'preferred_time'),
+            ('Treatment Interest', 'treatment_interest'),
+            ('Message', 'message'),
+            ('Status', 'status'),
+            ('Admin Notes', 'admin_notes'),
+            ('Created At', 'created_at'),
+        ],
+    },
+    'contact-messages': {
+        'model': ContactMessage,
+        'columns': [
+            ('ID', 'id'),
+            ('Name', 'name'),
+            ('Email', 'email'),
+            ('Subject', 'subject'),
+            ('Message', 'message'),
+            ('Read', 'is_read'),
+            ('Created At', 'created_at'),
+        ],
+    },
+}
+
+# Leading characters that make Excel, LibreOffice and Sheets treat a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+# Signed numbers such as "+919999999999" (phone numbers) are data, not formulas
+SIGNED_NUMBER_RE = re.compile(r'[+-]\d+(?:\.\d+)?')
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+class Echo:
+    """File-like object whose write() hands the value back, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def cell_value(value):
+    """Cell value for ``value``: aware datetimes become local"""
+    if isinstance(value, datetime):
+        # Spreadsheets cannot hold timezone-aware datetimes
+        return timezone.localtime(value).replace(tzinfo=None)
+    return value
+
+
+def neutralize(value):
+    """CSV value for ``value``: formula-like text other than a signed number gets a leading quote"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) and not SIGNED_NUMBER_RE.fullmatch(value):
+        return "'" + value
+    return value
+
+
+def string_cell(sheet, value):
+    """Text as a string cell: openpyxl would otherwise store text starting with '=' as a formula"""
+    if not isinstance(value, str):
+        return value
+    cell = WriteOnlyCell(sheet, value)
+    cell.data_type = 's'
+    return cell
+
+
+def iter_rows(queryset, columns):
+    lookups = [lookup for _, lookup in columns]
+    for row in queryset.values_list(*lookups).iterator(chunk_size=CHUNK_SIZE):
+        yield [cell_value(value) for value in row]
+
+
+def stream_csv(queryset, columns):
+    writer = csv.writer(Echo())
+    # BOM so Excel opens the file as UTF-8
+    yield '\ufeff' + writer.writerow([header for header, _ in columns])
+    for row in iter_rows(queryset, columns):
+        yield writer.writerow([neutralize(value) for value in row])
+
+
+def stream_xlsx(queryset, columns, title):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    sheet.append([header for header, _ in columns])
+    for row in iter_rows(queryset, columns):
+        sheet.append([string_cell(sheet, value) for value in row])
+
+    with tempfile.TemporaryFile() as xlsx_file:
+        workbook.save(xlsx_file)
+        xlsx_file.seek(0)
+        while True:
+            chunk = xlsx_file.read(FILE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def export_response(name, queryset, file_format):
+    """Streaming download of ``queryset`` with the columns of export ``name``"""
+    columns = EXPORTS[name]['columns']
+    if file_format == 'xlsx':
+        content = stream_xlsx(queryset, columns, name)
+    else:
+        content = stream_csv(queryset, columns)
+    response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[file_format])
+    filename = f"{name}-{timezone.localdate().isoformat()}.{file_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
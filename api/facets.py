@@ -0,0 +1,139 @@
+"""
+Faceted treatment browsing over in-memory bitsets.
+
+For each build of the treatment catalog, every browsable treatment (active,
+in an active category) gets a bit position, and every facet value - its
+category, the clinics offering it, the featured flag and its duration
+bucket - an int with the bits of its treatments set. A browse request ORs
+the selected values of each dimension and ANDs the dimensions; the count of
+a facet value is the popcount of its bits ANDed with the selection of the
+*other* dimensions, so picking one category still shows what the others
+hold. Nothing is queried or grouped per request.
+"""
+import logging
+import threading
+
+from . import catalog
+from .durations import DURATION_BUCKETS, duration_bucket
+
+logger = logging.getLogger('api.facets')
+
+DIMENSIONS = ('category', 'clinic', 'featured', 'duration')
+
+_index = None
+_build_lock = threading.Lock()
+
+
+def positions(bits):
+    """Positions of the set bits, lowest first"""
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+def parse_selection(query_params):
+    """``{dimension: {value, ...}}`` from comma-separated query parameters; ValueError when invalid"""
+    selection = {}
+    for dimension in DIMENSIONS:
+        raw = [value.strip() for value in query_params.get(dimension, '').split(',') if value.strip()]
+        if not raw:
+            continue
+        if dimension in ('category', 'clinic'):
+            try:
+                values = {int(value) for value in raw}
+            except ValueError:
+                raise ValueError(f"{dimension} must be a comma-separated list of ids")
+        elif dimension == 'featured':
+            if not set(value.lower() for value in raw) <= {'true', 'false'}:
+                raise ValueError("featured must be true or false")
+            values = {value.lower() == 'true' for value in raw}
+        else:
+            values = set(raw)
+            unknown = values - {slug for slug, *_ in DURATION_BUCKETS}
+            if unknown:
+                raise ValueError(f"Unknown duration(s): {', '.join(sorted(unknown))}. "
+                                 f"Choose from {', '.join(slug for slug, *_ in DURATION_BUCKETS)}")
+        selection[dimension] = values
+    return selection
+
+
+class FacetIndex:
+    """Bitsets for one catalog build"""
+    __slots__ = ('version', 'treatments', 'everything', 'values')
+
+    def __init__(self, treatment_catalog):
+        self.version = treatment_catalog.version
+        self.treatments = tuple(
+            treatment
+            for category in treatment_catalog.active_categories
+            for treatment in treatment_catalog.category_treatments(category.id)
+        )
+        self.everything = (1 << len(self.treatments)) - 1
+
+        # {dimension: {value: [label, bits]}}, in display order
+        values = {
+            'category': {category.id: [category.title, 0] for category in treatment_catalog.active_categories},
+            'clinic': {
+                clinic.id: [clinic.name, 0]
+                for clinic in sorted(treatment_catalog.clinics.values(), key=lambda clinic: (clinic.name, clinic.id))
+                if clinic.is_active
+            },
+            'featured': {True: ["Featured", 0], False: ["Not featured", 0]},
+            'duration': {slug: [label, 0] for slug, label, *_ in DURATION_BUCKETS},
+        }
+        for position, treatment in enumerate(self.treatments):
+            bit = 1 << position
+            treatment_values = [
+                ('category', treatment.category_id),
+                ('featured', treatment.is_featured),
+                ('duration', duration_bucket(treatment.duration_minutes)),
+            ]
+            treatment_values += [('clinic', row.clinic_id) for row in treatment_catalog.pricing(treatment.id)]
+            for dimension, value in treatment_values:
+                if value in values[dimension]:
+                    values[dimension][value][1] |= bit
+        self.values = {
+            dimension: {value: (label, bits) for value, (label, bits) in dimension_values.items() if bits}
+            for dimension, dimension_values in values.items()
+        }
+
+    def selected_bits(self, selection, skip=None):
+        """Bits of the treatments matching ``selection``, ignoring the ``skip`` dimension"""
+        bits = self.everything
+        for dimension, selected in selection.items():
+            if dimension == skip:
+                continue
+            dimension_bits = 0
+            for value in selected:
+                dimension_bits |= self.values[dimension].get(value, (None, 0))[1]
+            bits &= dimension_bits
+        return bits
+
+    def browse(self, selection):
+        """``(treatments, facets)`` for a selection from ``parse_selection``"""
+        treatments = [self.treatments[position] for position in positions(self.selected_bits(selection))]
+        facets = {}
+        for dimension in DIMENSIONS:
+            others = self.selected_bits(selection, skip=dimension)
+            selected = selection.get(dimension, ())
+            facets[dimension] = [
+                {'value': value, 'label': label, 'count': (bits & others).bit_count(), 'selected': value in selected}
+                for value, (label, bits) in self.values[dimension].items()
+            ]
+        return treatments, facets
+
+
+def current():
+    """The facet index for the current catalog, rebuilding it after content changes"""
+    global _index
+
+    treatment_catalog = catalog.current()
+    index = _index
+    if index is not None and index.version == treatment_catalog.version:
+        return index
+    with _build_lock:
+        if _index is None or _index.version != treatment_catalog.version:
+            _index = FacetIndex(treatment_catalog)
+            logger.info(f"Built treatment facet index over {len(_index.treatments)} treatment(s)")
+        return _index
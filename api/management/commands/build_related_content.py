@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api import related
+
+
+class Command(BaseCommand):
+    help = "Recompute the related blogs, treatments and skin concerns shown on detail pages (run nightly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=None,
+            help="Related items to keep per record (default: API_RELATED_TOP_K)",
+        )
+
+    def handle(self, *args, **options):
+        count = related.build(options['top'])
+        self.stdout.write(self.style.SUCCESS(f"Stored {count} related content link(s)"))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from api.signals import content_bulk_updated
+from api.models import Offer
+
+
+class Command(BaseCommand):
+    help = "Deactivate offers whose valid_until date has passed (run daily from the scheduler)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Only report how many offers would be deactivated",
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = Offer.objects.filter(is_active=True).expired().count()
+            self.stdout.write(f"{count} expired offer(s) would be deactivated")
+            return
+
+        count = Offer.objects.expire()
+        if count:
+            # update() skips post_save, so invalidate API snapshots and CDN explicitly
+            content_bulk_updated(Offer)
+        self.stdout.write(self.style.SUCCESS(f"Deactivated {count} expired offer(s)"))
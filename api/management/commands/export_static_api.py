@@ -0,0 +1,102 @@
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from api import snapshots
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def export_name(target):
+    """
+    Map an API URL to a file name, e.g. ``/api/clinics/3/?valid=true`` becomes
+    ``api/clinics/3/index.valid=true.json``.
+    """
+    name = 'index'
+    if target.query_string:
+        name += '.' + target.query_string.replace('&', '.')
+    return f"{target.path.strip('/')}/{name}.json"
+
+
+class Command(BaseCommand):
+    help = (
+        "Render every public API endpoint and parameter permutation into JSON files "
+        "for serving from object storage or a CDN. Unchanged files are not rewritten."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help="Local directory to export to (defaults to the configured storage under --prefix)",
+        )
+        parser.add_argument('--prefix', default='static-api', help="Path prefix inside the default storage")
+        parser.add_argument('--host', default='localhost:8000', help="Public host used for absolute URLs")
+        parser.add_argument('--scheme', default='http', choices=['http', 'https'])
+        parser.add_argument('--workers', type=int, default=4, help="Number of parallel renders")
+
+    def handle(self, *args, **options):
+        if options['output']:
+            storage, prefix = FileSystemStorage(location=options['output']), ''
+        else:
+            storage, prefix = default_storage, options['prefix'].strip('/') + '/'
+
+        targets = snapshots.public_targets(options['host'], options['scheme'], include_blog_details=True)
+        previous = self.load_manifest(storage, prefix)
+
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+                bodies = list(executor.map(self.render, targets))
+        else:
+            bodies = [snapshots.render(target, refresh=False) for target in targets]
+
+        files = {}
+        written = unchanged = 0
+        for target, body in zip(targets, bodies):
+            if body is None:
+                continue
+            name = export_name(target)
+            digest = hashlib.sha256(body).hexdigest()
+            files[name] = {'url': target.url, 'sha256': digest, 'size': len(body)}
+            if previous.get(name, {}).get('sha256') == digest and storage.exists(prefix + name):
+                unchanged += 1
+                continue
+            self.write(storage, prefix + name, body)
+            written += 1
+
+        removed = 0
+        for name in set(previous) - set(files):
+            if storage.exists(prefix + name):
+                storage.delete(prefix + name)
+                removed += 1
+
+        manifest = {'generated_at': timezone.now().isoformat(), 'files': files}
+        self.write(storage, prefix + MANIFEST_NAME, json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {len(files)} file(s): {written} written, {unchanged} unchanged, {removed} removed"
+        ))
+
+    def render(self, target):
+        try:
+            return snapshots.render(target, refresh=False)
+        finally:
+            # Worker threads open their own connections; don't leak them
+            connections.close_all()
+
+    def load_manifest(self, storage, prefix):
+        if not storage.exists(prefix + MANIFEST_NAME):
+            return {}
+        with storage.open(prefix + MANIFEST_NAME) as manifest_file:
+            return json.load(manifest_file).get('files', {})
+
+    def write(self, storage, name, body):
+        # FileSystemStorage never overwrites, it picks a new name instead
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, ContentFile(body))
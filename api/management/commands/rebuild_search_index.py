@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the site search entries of every treatment, skin concern, blog and FAQ."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            counts = search.rebuild()
+        for kind, count in counts.items():
+            self.stdout.write(f"{kind:>14}: {count}")
+        self.stdout.write(self.style.SUCCESS(f"Indexed {sum(counts.values())} entries"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api import notifications
+
+
+class Command(BaseCommand):
+    help = (
+        "Email the owner one summary of the appointments and contact messages received since the "
+        "last digest (run from the scheduler at the digest interval, e.g. hourly)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--per-clinic',
+            action='store_true',
+            default=None,
+            help="Send one digest per clinic (defaults to NOTIFICATION_DIGEST_GROUPING)",
+        )
+
+    def handle(self, *args, **options):
+        count = notifications.send_digest(per_clinic=options['per_clinic'])
+        self.stdout.write(self.style.SUCCESS(f"Sent {count} digest email(s)"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.throttling import rejection_counts
+
+
+class Command(BaseCommand):
+    help = "Show how many public POST requests were rejected by throttling, per day and bucket"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help="Number of days to report")
+
+    def handle(self, *args, **options):
+        counts = rejection_counts(options['days'])
+        if not counts:
+            self.stdout.write(f"No throttled requests in the last {options['days']} day(s)")
+            return
+        for (day, scope, bucket), count in sorted(counts.items(), reverse=True):
+            self.stdout.write(f"{day}  {scope:<14} {bucket:<12} {count}")
+        self.stdout.write(self.style.SUCCESS(f"{sum(counts.values())} request(s) throttled"))
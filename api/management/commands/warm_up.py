@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api import warmup
+
+
+class Command(BaseCommand):
+    help = "Run the worker warm-up in this process and report how long each phase took."
+
+    def handle(self, *args, **options):
+        timings = warmup.warm_up()
+        for phase, value in timings.items():
+            unit = '' if phase == 'targets' else 'ms'
+            self.stdout.write(f"{phase:>14}: {value}{unit}")
@@ -0,0 +1,81 @@
+# Generated manually: indexes for the hot API filters and orderings.
+# Built CONCURRENTLY so deploying does not lock the tables against writes.
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0016_rename_result_image_fields'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='appointment',
+            index=models.Index(fields=['status', 'preferred_date'], name='appointment_status_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='appointment',
+            index=models.Index(fields=['-created_at'], name='appointment_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='blog',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-created_at'], name='blog_published_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='blog',
+            index=models.Index(condition=models.Q(('is_featured', True), ('is_published', True)), fields=['-created_at'], name='blog_featured_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='clinic',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order', 'name'], name='clinic_active_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='clinicimage',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['clinic', 'order'], name='clinicimage_active_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='clinicteammember',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['clinic', 'order', 'name'], name='clinicteam_active_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='contactmessage',
+            index=models.Index(fields=['-created_at'], name='contact_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='offer',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['clinic', 'order', '-created_at'], name='offer_active_clinic_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='offer',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order', '-created_at'], name='offer_active_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='result',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at'], name='result_active_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='result',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_featured', True)), fields=['-created_at'], name='result_featured_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='testimonial',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order', '-created_at'], name='testimonial_active_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='treatment',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', 'order'], name='treatment_active_cat_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='treatment',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_featured', True)), fields=['order'], name='treatment_featured_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='treatmentclinicpricing',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['clinic', 'treatment'], name='pricing_active_clinic_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated manually: index backing the SQL-side offer validity filter.
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0017_hot_query_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='offer',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['valid_until', 'valid_from'], name='offer_validity_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.10 on 2026-10-19 15:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_offer_validity_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='SHA-1 of the snapshot URL', max_length=40, unique=True)),
+                ('scheme', models.CharField(default='https', max_length=5)),
+                ('host', models.CharField(max_length=255)),
+                ('path', models.CharField(max_length=255)),
+                ('query_string', models.CharField(blank=True, max_length=500)),
+                ('content_version', models.CharField(help_text='Content version the body was rendered for', max_length=64)),
+                ('body', models.BinaryField()),
+                ('size', models.PositiveIntegerField(default=0, help_text='Body size in bytes')),
+                ('generated_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'API Snapshot',
+                'verbose_name_plural': 'API Snapshots',
+                'ordering': ['path', 'query_string'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-19 15:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_apisnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apisnapshot',
+            name='surrogate_keys',
+            field=models.TextField(blank=True, help_text='Space-separated CDN surrogate keys of the response'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.10 on 2026-10-19 15:22
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    # The appointment index is built CONCURRENTLY, which cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('api', '0020_apisnapshot_surrogate_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClinicDaySlots',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('slot_minutes', models.PositiveSmallIntegerField(help_text='Slot length the counts were taken with')),
+                ('booked_counts', models.JSONField(default=dict, help_text='Bookings per slot number')),
+                ('full_mask', models.BigIntegerField(default=0, help_text='Bitmap of fully booked slots')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Clinic Day Slots',
+                'verbose_name_plural': 'Clinic Day Slots',
+                'ordering': ['clinic', 'date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ClinicSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('opens_at', models.TimeField(help_text='Start of the first bookable slot')),
+                ('closes_at', models.TimeField(help_text='No slot may start at or after this time')),
+                ('slot_minutes', models.PositiveSmallIntegerField(choices=[(30, '30 minutes'), (45, '45 minutes'), (60, '1 hour'), (90, '1.5 hours'), (120, '2 hours')], default=30)),
+                ('capacity', models.PositiveSmallIntegerField(default=1, help_text='Appointments that can be booked per slot')),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name': 'Clinic Schedule',
+                'verbose_name_plural': 'Clinic Schedules',
+                'ordering': ['clinic', 'weekday'],
+            },
+        ),
+        AddIndexConcurrently(
+            model_name='appointment',
+            index=models.Index(fields=['clinic', 'preferred_date'], name='appointment_clinic_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='clinicschedule',
+            name='clinic',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedules', to='api.clinic'),
+        ),
+        migrations.AddField(
+            model_name='clinicdayslots',
+            name='clinic',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_slots', to='api.clinic'),
+        ),
+        migrations.AddConstraint(
+            model_name='clinicschedule',
+            constraint=models.UniqueConstraint(fields=('clinic', 'weekday'), name='unique_clinic_weekday_schedule'),
+        ),
+        migrations.AddConstraint(
+            model_name='clinicschedule',
+            constraint=models.CheckConstraint(check=models.Q(('closes_at__gt', models.F('opens_at'))), name='clinic_schedule_hours_order'),
+        ),
+        migrations.AddConstraint(
+            model_name='clinicdayslots',
+            constraint=models.UniqueConstraint(fields=('clinic', 'date'), name='unique_clinic_day_slots'),
+        ),
+    ]
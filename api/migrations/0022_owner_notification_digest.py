@@ -0,0 +1,43 @@
+# Generated manually: track owner notifications for the digest mode.
+# Existing rows were emailed when they arrived, so they are backfilled as notified
+# before the partial "pending" indexes are built CONCURRENTLY.
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+def mark_existing_notified(apps, schema_editor):
+    for model_name in ('Appointment', 'ContactMessage'):
+        model = apps.get_model('api', model_name)
+        model.objects.filter(notified_at__isnull=True).update(notified_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0021_clinic_slot_availability'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='notified_at',
+            field=models.DateTimeField(blank=True, help_text='When the owner was emailed about it', null=True),
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='notified_at',
+            field=models.DateTimeField(blank=True, help_text='When the owner was emailed about it', null=True),
+        ),
+        migrations.RunPython(mark_existing_notified, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('notified_at__isnull', True)), fields=['created_at'], name='appointment_pending_note_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='contactmessage',
+            index=models.Index(condition=models.Q(('notified_at__isnull', True)), fields=['created_at'], name='contact_pending_note_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated manually: enforce the SiteSettings singleton and the "max 4 active
+# Why Choose Us benefits" rule in the database instead of with save-time queries.
+
+from django.db import migrations, models
+
+ACTIVE_CAP_SQL = """
+CREATE OR REPLACE FUNCTION api_whychooseus_active_cap() RETURNS trigger AS $$
+BEGIN
+    -- Serialize concurrent activations so two transactions cannot both see room for one more
+    PERFORM pg_advisory_xact_lock(hashtext('api_whychooseus_active_cap'));
+    IF (SELECT count(*) FROM api_whychooseus WHERE is_active) > 4 THEN
+        RAISE EXCEPTION 'Only 4 ''Why Choose Us'' benefits can be active at the same time.'
+            USING ERRCODE = 'check_violation', CONSTRAINT = 'whychooseus_active_cap';
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE CONSTRAINT TRIGGER whychooseus_active_cap
+    AFTER INSERT OR UPDATE OF is_active ON api_whychooseus
+    DEFERRABLE INITIALLY IMMEDIATE
+    FOR EACH ROW WHEN (NEW.is_active)
+    EXECUTE FUNCTION api_whychooseus_active_cap();
+"""
+
+DROP_ACTIVE_CAP_SQL = """
+DROP TRIGGER IF EXISTS whychooseus_active_cap ON api_whychooseus;
+DROP FUNCTION IF EXISTS api_whychooseus_active_cap();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_owner_notification_digest'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='sitesettings',
+            constraint=models.UniqueConstraint(models.Value(1), name='sitesettings_singleton', violation_error_message='Only one SiteSettings instance is allowed'),
+        ),
+        migrations.RunSQL(ACTIVE_CAP_SQL, DROP_ACTIVE_CAP_SQL),
+    ]
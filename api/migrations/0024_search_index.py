@@ -0,0 +1,60 @@
+# Generated by Django 4.2.10 on 2026-10-19 15:43
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+# Typo-tolerant title matching needs pg_trgm. It ships with the standard
+# contrib packages; where it is missing or may not be created, search falls
+# back to full-text matching only (see api.search.trigram_available).
+TRIGRAM_SQL = """
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS searchentry_title_trgm_idx ON api_searchentry USING gin (title gin_trgm_ops);
+    END IF;
+EXCEPTION WHEN insufficient_privilege THEN
+    RAISE NOTICE 'pg_trgm could not be created; search runs without typo tolerance';
+END;
+$$;
+"""
+
+DROP_TRIGRAM_SQL = "DROP INDEX IF EXISTS searchentry_title_trgm_idx;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_db_enforced_invariants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('treatment', 'Treatment'), ('skin_concern', 'Skin Concern'), ('blog', 'Blog'), ('treatment_faq', 'Treatment FAQ'), ('landing_faq', 'Landing FAQ')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=500)),
+                ('summary', models.TextField(blank=True, help_text='Secondary text: category, excerpt, tags')),
+                ('body', models.TextField(blank=True)),
+                ('excerpt', models.TextField(blank=True, help_text='Shown in search results')),
+                ('slug', models.CharField(blank=True, max_length=350)),
+                ('document', django.contrib.postgres.search.SearchVectorField(help_text='Weighted full-text document of title, summary and body', null=True)),
+                ('boost', models.FloatField(default=0, help_text='Added to the rank, e.g. for featured records')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Search Entry',
+                'verbose_name_plural': 'Search Entries',
+                'ordering': ['kind', 'object_id'],
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['document'], name='searchentry_document_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchentry',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='searchentry_unique_object'),
+        ),
+        migrations.RunSQL(TRIGRAM_SQL, DROP_TRIGRAM_SQL),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.10 on 2026-10-19 15:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedContent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(help_text='TF-IDF cosine similarity')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related', to='api.searchentry')),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.searchentry')),
+            ],
+            options={
+                'verbose_name': 'Related Content',
+                'verbose_name_plural': 'Related Content',
+                'ordering': ['source', 'rank'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='relatedcontent',
+            constraint=models.UniqueConstraint(fields=('source', 'rank'), name='relatedcontent_unique_rank'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.10 on 2026-10-19 15:49
+
+import re
+
+from django.db import migrations, models
+
+
+def normalize(text):
+    """Lower-cased words separated by single spaces, padded so phrases match on word boundaries"""
+    words = re.split(r'[\W_]+', text.casefold())
+    return f" {' '.join(word for word in words if word)} "
+
+
+def mentions(text, phrase):
+    phrase = normalize(phrase)
+    return phrase.strip() != '' and phrase in normalize(text)
+
+
+def link_mentioned(apps, schema_editor):
+    """
+    Link each skin concern to the treatments named in its ``treatments`` text
+    and to the results whose condition its title or ``results`` text names
+    (or that name its title, e.g. "Acne" -> "Acne Scars").
+    """
+    SkinConcern = apps.get_model('api', 'SkinConcern')
+    Treatment = apps.get_model('api', 'Treatment')
+    Result = apps.get_model('api', 'Result')
+    treatments = list(Treatment.objects.values_list('id', 'name'))
+    results = list(Result.objects.values_list('id', 'condition'))
+
+    treatment_links, result_links = [], []
+    for concern in SkinConcern.objects.all():
+        treatment_links += [
+            SkinConcern.linked_treatments.through(skinconcern_id=concern.id, treatment_id=treatment_id)
+            for treatment_id, name in treatments if mentions(concern.treatments, name)
+        ]
+        result_links += [
+            SkinConcern.linked_results.through(skinconcern_id=concern.id, result_id=result_id)
+            for result_id, condition in results
+            if mentions(f"{concern.title} {concern.results}", condition) or mentions(condition, concern.title)
+        ]
+    SkinConcern.linked_treatments.through.objects.bulk_create(treatment_links, ignore_conflicts=True)
+    SkinConcern.linked_results.through.objects.bulk_create(result_links, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_related_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skinconcern',
+            name='linked_results',
+            field=models.ManyToManyField(blank=True, help_text='Before/after results shown for this concern', related_name='skin_concerns', to='api.result'),
+        ),
+        migrations.AddField(
+            model_name='skinconcern',
+            name='linked_treatments',
+            field=models.ManyToManyField(blank=True, help_text='Treatments shown as cards for this concern', related_name='skin_concerns', to='api.treatment'),
+        ),
+        migrations.RunPython(link_mentioned, migrations.RunPython.noop),
+    ]
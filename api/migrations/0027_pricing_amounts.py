@@ -0,0 +1,44 @@
+# Generated by Django 4.2.10 on 2026-10-19 15:51
+
+from django.db import migrations, models
+
+from api.prices import parse_price
+
+
+def backfill_amounts(apps, schema_editor):
+    """Parse the existing display prices into the amount columns"""
+    TreatmentClinicPricing = apps.get_model('api', 'TreatmentClinicPricing')
+    rows = list(TreatmentClinicPricing.objects.only('id', 'price'))
+    for row in rows:
+        row.amount_min, row.amount_max, row.currency = parse_price(row.price)
+    TreatmentClinicPricing.objects.bulk_update(rows, ['amount_min', 'amount_max', 'currency'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_skinconcern_links'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='treatmentclinicpricing',
+            name='amount_max',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='treatmentclinicpricing',
+            name='amount_min',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='treatmentclinicpricing',
+            name='currency',
+            field=models.CharField(blank=True, editable=False, max_length=3),
+        ),
+        migrations.RunPython(backfill_amounts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='treatmentclinicpricing',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['amount_min', 'treatment'], name='pricing_active_amount_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.10 on 2026-10-19 15:52
+
+from django.db import migrations, models
+
+from api.durations import parse_duration
+
+
+def backfill_minutes(apps, schema_editor):
+    """Parse the existing duration strings into minutes"""
+    Treatment = apps.get_model('api', 'Treatment')
+    treatments = list(Treatment.objects.only('id', 'duration'))
+    for treatment in treatments:
+        treatment.duration_minutes = parse_duration(treatment.duration)
+    Treatment.objects.bulk_update(treatments, ['duration_minutes'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_pricing_amounts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='treatment',
+            name='duration_minutes',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_minutes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated manually: one (clinic, treatment) index on pricing replaces both the
+# partial active-rows index and the foreign key index on clinic, which it covers.
+# The new index is built CONCURRENTLY before the old ones are dropped.
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0028_treatment_duration_minutes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='treatmentclinicpricing',
+            index=models.Index(fields=['clinic', 'treatment'], name='pricing_clinic_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='treatmentclinicpricing',
+            name='pricing_active_clinic_idx',
+        ),
+        migrations.AlterField(
+            model_name='treatmentclinicpricing',
+            name='clinic',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='treatment_pricing', to='api.clinic'),
+        ),
+    ]
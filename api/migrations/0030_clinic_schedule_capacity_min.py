@@ -0,0 +1,31 @@
+# Generated by Django 4.2.10 on 2026-10-19 16:08
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def close_zero_capacity_days(apps, schema_editor):
+    # Capacity 0 meant "no bookings"; an inactive schedule closes the weekday instead,
+    # also when it leaves the clinic without active schedules (see availability.get_schedule)
+    ClinicSchedule = apps.get_model('api', 'ClinicSchedule')
+    ClinicSchedule.objects.filter(capacity=0).update(capacity=1, is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_pricing_clinic_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(close_zero_capacity_days, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='clinicschedule',
+            name='capacity',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Appointments that can be booked per slot', validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddConstraint(
+            model_name='clinicschedule',
+            constraint=models.CheckConstraint(check=models.Q(('capacity__gte', 1)), name='clinic_schedule_capacity_min'),
+        ),
+    ]
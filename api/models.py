@@ -1,9 +1,17 @@
-from django.db import models
-from django.core.validators import RegexValidator, EmailValidator
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import IntegrityError, connection, models, transaction
+from django.core.exceptions import ValidationError
+from django.core.validators import RegexValidator, EmailValidator, MinValueValidator
 from django.utils import timezone
 from colorfield.fields import ColorField
+from contextlib import contextmanager
+from datetime import time
 import json
 
+from .durations import parse_duration
+from .prices import parse_price
+
 
 class LandingPageBg(models.Model):
     """Model for landing page background image or carousel"""
@@ -166,6 +174,8 @@ class Treatment(models.Model):
     category = models.ForeignKey(TreatmentCategory, on_delete=models.CASCADE, related_name='items')
     name = models.CharField(max_length=200)
     duration = models.CharField(max_length=50, help_text="e.g., '60 minutes', '1-2 hours'")
+    # Parsed from duration on save, for browsing by duration
+    duration_minutes = models.PositiveIntegerField(null=True, blank=True, editable=False)
     description = models.TextField()
     image = models.ImageField(upload_to='treatments/', blank=True, null=True)
     is_featured = models.BooleanField(default=False, help_text="Featured on landing page")
@@ -174,27 +184,63 @@ class Treatment(models.Model):
     
     class Meta:
         ordering = ['order']
+        indexes = [
+            models.Index(fields=['category', 'order'], condition=models.Q(is_active=True),
+                         name='treatment_active_cat_idx'),
+            models.Index(fields=['order'], condition=models.Q(is_active=True, is_featured=True),
+                         name='treatment_featured_idx'),
+        ]
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        self.duration_minutes = parse_duration(self.duration)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'duration' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'duration_minutes'}
+        super().save(*args, **kwargs)
 
 
 class TreatmentClinicPricing(models.Model):
     """Model for treatment pricing at specific clinics"""
     treatment = models.ForeignKey(Treatment, on_delete=models.CASCADE, related_name='clinic_pricing')
-    clinic = models.ForeignKey('Clinic', on_delete=models.CASCADE, related_name='treatment_pricing')
+    # Indexed by pricing_clinic_idx, which leads with clinic
+    clinic = models.ForeignKey('Clinic', on_delete=models.CASCADE, related_name='treatment_pricing', db_index=False)
     price = models.CharField(max_length=50, help_text="e.g., '$150', 'From $100'")
+    # Parsed from price on save, for sorting and filtering by amount
+    amount_min = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, editable=False)
+    amount_max = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, editable=False)
+    currency = models.CharField(max_length=3, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     order = models.PositiveIntegerField(default=0, help_text="Display order for this clinic")
     
     class Meta:
         ordering = ['order', 'clinic__name']
         unique_together = ['treatment', 'clinic']  # Ensure one pricing per treatment-clinic combination
+        indexes = [
+            # unique_together covers treatment lookups; clinic pages (and the foreign key)
+            # need the reverse direction
+            models.Index(fields=['clinic', 'treatment'], name='pricing_clinic_idx'),
+            models.Index(fields=['amount_min', 'treatment'], condition=models.Q(is_active=True),
+                         name='pricing_active_amount_idx'),
+        ]
         verbose_name = "Treatment Clinic Pricing"
         verbose_name_plural = "Treatment Clinic Pricing"
     
     def __str__(self):
         return f"{self.treatment.name} - {self.clinic.name} - {self.price}"
+    
+    def parse_amounts(self):
+        """Set amount_min, amount_max and currency from the display price"""
+        self.amount_min, self.amount_max, self.currency = parse_price(self.price)
+    
+    def save(self, *args, **kwargs):
+        self.parse_amounts()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'price' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'amount_min', 'amount_max', 'currency'}
+        super().save(*args, **kwargs)
 
 
 class TreatmentFAQ(models.Model):
@@ -226,6 +272,12 @@ class Result(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], condition=models.Q(is_active=True),
+                         name='result_active_idx'),
+            models.Index(fields=['-created_at'], condition=models.Q(is_active=True, is_featured=True),
+                         name='result_featured_idx'),
+        ]
     
     def __str__(self):
         return f"Result: {self.condition}"
@@ -239,6 +291,10 @@ class SkinConcern(models.Model):
     treatments = models.TextField(help_text="Related treatments information")
     products = models.TextField(help_text="Recommended products information")
     results = models.TextField(help_text="Expected results information")
+    linked_treatments = models.ManyToManyField(Treatment, blank=True, related_name='skin_concerns',
+                                               help_text="Treatments shown as cards for this concern")
+    linked_results = models.ManyToManyField(Result, blank=True, related_name='skin_concerns',
+                                            help_text="Before/after results shown for this concern")
     order = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
     
@@ -293,12 +349,20 @@ class Appointment(models.Model):
     
     # Admin notes
     admin_notes = models.TextField(blank=True, help_text="Internal notes for admin")
+    notified_at = models.DateTimeField(null=True, blank=True, help_text="When the owner was emailed about it")
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], condition=models.Q(notified_at__isnull=True),
+                         name='appointment_pending_note_idx'),
+            models.Index(fields=['status', 'preferred_date'], name='appointment_status_date_idx'),
+            models.Index(fields=['-created_at'], name='appointment_created_idx'),
+            models.Index(fields=['clinic', 'preferred_date'], name='appointment_clinic_date_idx'),
+        ]
     
     def __str__(self):
         clinic_name = self.clinic.name if self.clinic else 'No Clinic'
@@ -316,10 +380,16 @@ class ContactMessage(models.Model):
     subject = models.CharField(max_length=200)
     message = models.TextField()
     is_read = models.BooleanField(default=False)
+    notified_at = models.DateTimeField(null=True, blank=True, help_text="When the owner was emailed about it")
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], condition=models.Q(notified_at__isnull=True),
+                         name='contact_pending_note_idx'),
+            models.Index(fields=['-created_at'], name='contact_created_idx'),
+        ]
     
     def __str__(self):
         return f"Message from {self.name} - {self.subject}"
@@ -345,6 +415,12 @@ class Blog(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], condition=models.Q(is_published=True),
+                         name='blog_published_idx'),
+            models.Index(fields=['-created_at'], condition=models.Q(is_published=True, is_featured=True),
+                         name='blog_featured_idx'),
+        ]
         
     def __str__(self):
         return self.title
@@ -377,6 +453,52 @@ class BlogImage(models.Model):
         return f"Image for {self.blog.title}"
 
 
+def raise_for_constraint(error, constraint_name, message):
+    """Re-raise an IntegrityError from ``constraint_name`` as a ValidationError"""
+    if constraint_name in str(error):
+        raise ValidationError(message) from error
+    raise error
+
+
+WHY_CHOOSE_US_ACTIVE_CAP = 'whychooseus_active_cap'
+WHY_CHOOSE_US_MAX_ACTIVE = 4
+WHY_CHOOSE_US_ACTIVE_CAP_ERROR = (
+    f"Only {WHY_CHOOSE_US_MAX_ACTIVE} 'Why Choose Us' benefits can be active at the same time."
+)
+
+
+@contextmanager
+def why_choose_us_cap_deferred():
+    """
+    Check the active cap once at the end of the block instead of after every
+    statement, so benefits can be swapped in any order (bulk_update, admin list edits).
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'SET CONSTRAINTS {WHY_CHOOSE_US_ACTIVE_CAP} DEFERRED')
+        yield
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'SET CONSTRAINTS {WHY_CHOOSE_US_ACTIVE_CAP} IMMEDIATE')
+        except IntegrityError as e:
+            raise_for_constraint(e, WHY_CHOOSE_US_ACTIVE_CAP, WHY_CHOOSE_US_ACTIVE_CAP_ERROR)
+
+
+class WhyChooseUsQuerySet(models.QuerySet):
+    """Queryset whose bulk writes surface the active cap as a ValidationError"""
+    
+    def update(self, **kwargs):
+        try:
+            with transaction.atomic():
+                return super().update(**kwargs)
+        except IntegrityError as e:
+            raise_for_constraint(e, WHY_CHOOSE_US_ACTIVE_CAP, WHY_CHOOSE_US_ACTIVE_CAP_ERROR)
+    
+    def bulk_update(self, objs, fields, batch_size=None):
+        with why_choose_us_cap_deferred():
+            return super().bulk_update(objs, fields, batch_size=batch_size)
+
+
 class WhyChooseUs(models.Model):
     """Model for Why Choose Us benefits"""
     ICON_CHOICES = [
@@ -398,6 +520,8 @@ class WhyChooseUs(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = WhyChooseUsQuerySet.as_manager()
+    
     class Meta:
         ordering = ['order']
         verbose_name = "Why Choose Us Benefit"
@@ -407,12 +531,12 @@ class WhyChooseUs(models.Model):
         return self.title
     
     def save(self, *args, **kwargs):
-        if self.is_active:
-            # Check if there are already 4 active items (excluding current instance)
-            active_count = WhyChooseUs.objects.filter(is_active=True).exclude(pk=self.pk).count()
-            if active_count >= 4:
-                raise ValueError("Only 4 'Why Choose Us' benefits can be active at the same time.")
-        super().save(*args, **kwargs)
+        # At most 4 active benefits, enforced by the whychooseus_active_cap trigger
+        try:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+        except IntegrityError as e:
+            raise_for_constraint(e, WHY_CHOOSE_US_ACTIVE_CAP, WHY_CHOOSE_US_ACTIVE_CAP_ERROR)
 
 
 class Clinic(models.Model):
@@ -451,6 +575,10 @@ class Clinic(models.Model):
         ordering = ['order', 'name']
         verbose_name = "Clinic"
         verbose_name_plural = "Clinics"
+        indexes = [
+            models.Index(fields=['order', 'name'], condition=models.Q(is_active=True),
+                         name='clinic_active_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -468,6 +596,10 @@ class ClinicImage(models.Model):
         ordering = ['order']
         verbose_name = "Clinic Image"
         verbose_name_plural = "Clinic Images"
+        indexes = [
+            models.Index(fields=['clinic', 'order'], condition=models.Q(is_active=True),
+                         name='clinicimage_active_idx'),
+        ]
     
     def __str__(self):
         return f"{self.clinic.name} - Image {self.order}"
@@ -487,11 +619,112 @@ class ClinicTeamMember(models.Model):
         ordering = ['order', 'name']
         verbose_name = "Clinic Team Member"
         verbose_name_plural = "Clinic Team Members"
+        indexes = [
+            models.Index(fields=['clinic', 'order', 'name'], condition=models.Q(is_active=True),
+                         name='clinicteam_active_idx'),
+        ]
     
     def __str__(self):
         return f"{self.clinic.name} - {self.name}"
 
 
+class ClinicSchedule(models.Model):
+    """Model for a clinic's bookable hours and slot capacity on one weekday"""
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+    # Slots are numbered from midnight; 30 minutes or longer keeps a day within a 64-bit bitmap
+    SLOT_MINUTES_CHOICES = [
+        (30, '30 minutes'),
+        (45, '45 minutes'),
+        (60, '1 hour'),
+        (90, '1.5 hours'),
+        (120, '2 hours'),
+    ]
+    
+    clinic = models.ForeignKey(Clinic, on_delete=models.CASCADE, related_name='schedules')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    opens_at = models.TimeField(help_text="Start of the first bookable slot")
+    closes_at = models.TimeField(help_text="No slot may start at or after this time")
+    slot_minutes = models.PositiveSmallIntegerField(choices=SLOT_MINUTES_CHOICES, default=30)
+    capacity = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)],
+                                                help_text="Appointments that can be booked per slot")
+    is_active = models.BooleanField(default=True)
+    
+    class Meta:
+        ordering = ['clinic', 'weekday']
+        verbose_name = "Clinic Schedule"
+        verbose_name_plural = "Clinic Schedules"
+        constraints = [
+            models.UniqueConstraint(fields=['clinic', 'weekday'], name='unique_clinic_weekday_schedule'),
+            models.CheckConstraint(check=models.Q(closes_at__gt=models.F('opens_at')),
+                                   name='clinic_schedule_hours_order'),
+            # A slot nobody can book would show as free; close the weekday instead
+            models.CheckConstraint(check=models.Q(capacity__gte=1), name='clinic_schedule_capacity_min'),
+        ]
+    
+    def __str__(self):
+        return f"{self.clinic.name} - {self.get_weekday_display()} {self.opens_at:%H:%M}-{self.closes_at:%H:%M}"
+    
+    def clean(self):
+        for value in (self.opens_at, self.closes_at):
+            if value and self.slot_minutes and (value.hour * 60 + value.minute) % self.slot_minutes:
+                raise ValidationError(f"Opening and closing times must fall on {self.slot_minutes}-minute boundaries.")
+    
+    def slot_index(self, value):
+        """Slot number of a time of day, or None if no bookable slot starts then"""
+        minutes = value.hour * 60 + value.minute
+        if value.second or value.microsecond or minutes % self.slot_minutes:
+            return None
+        if not self.opens_at <= value < self.closes_at:
+            return None
+        return minutes // self.slot_minutes
+    
+    def slot_time(self, index):
+        minutes = index * self.slot_minutes
+        return time(minutes // 60, minutes % 60)
+    
+    @property
+    def open_mask(self):
+        """Bitmap with one bit set per bookable slot"""
+        first = self.slot_index(self.opens_at)
+        closes = self.closes_at.hour * 60 + self.closes_at.minute
+        last = -(-closes // self.slot_minutes)  # first slot starting at or after closing
+        if first is None or last <= first:
+            return 0
+        return ((1 << (last - first)) - 1) << first
+
+
+class ClinicDaySlots(models.Model):
+    """
+    Precomputed bookings per slot for one clinic day. Bit ``i`` of
+    ``full_mask`` is set once slot ``i`` has reached the schedule's capacity.
+    """
+    clinic = models.ForeignKey(Clinic, on_delete=models.CASCADE, related_name='day_slots')
+    date = models.DateField()
+    slot_minutes = models.PositiveSmallIntegerField(help_text="Slot length the counts were taken with")
+    booked_counts = models.JSONField(default=dict, help_text="Bookings per slot number")
+    full_mask = models.BigIntegerField(default=0, help_text="Bitmap of fully booked slots")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['clinic', 'date']
+        verbose_name = "Clinic Day Slots"
+        verbose_name_plural = "Clinic Day Slots"
+        constraints = [
+            models.UniqueConstraint(fields=['clinic', 'date'], name='unique_clinic_day_slots'),
+        ]
+    
+    def __str__(self):
+        return f"{self.clinic.name} - {self.date}"
+
+
 class SiteSettings(models.Model):
     """Model for general site settings"""
     site_name = models.CharField(max_length=100, default="Monalisa Wellness")
@@ -537,22 +770,28 @@ class SiteSettings(models.Model):
     class Meta:
         verbose_name = "Site Settings"
         verbose_name_plural = "Site Settings"
+        constraints = [
+            # A unique index on a constant admits exactly one row
+            models.UniqueConstraint(models.Value(1), name='sitesettings_singleton',
+                                    violation_error_message='Only one SiteSettings instance is allowed'),
+        ]
 
     def __str__(self):
         return self.site_name
 
     def save(self, *args, **kwargs):
-        # Ensure only one instance exists
-        if not self.pk and SiteSettings.objects.exists():
-            raise ValueError('Only one SiteSettings instance is allowed')
-        
         # Auto-migrate legacy fields to new JSON fields if they exist and new fields are empty
         if self.contact_email and not self.contact_emails:
             self.contact_emails = [self.contact_email]
         if self.contact_phone and not self.contact_phones:
             self.contact_phones = [self.contact_phone]
-            
-        return super().save(*args, **kwargs)
+        
+        # Only one instance may exist (sitesettings_singleton constraint)
+        try:
+            with transaction.atomic():
+                return super().save(*args, **kwargs)
+        except IntegrityError as e:
+            raise_for_constraint(e, 'sitesettings_singleton', 'Only one SiteSettings instance is allowed')
     
     def get_contact_emails(self):
         """Get all contact emails (from both new and legacy fields)"""
@@ -648,12 +887,34 @@ class Testimonial(models.Model):
         ordering = ['order', '-created_at']
         verbose_name = "Testimonial"
         verbose_name_plural = "Testimonials"
+        indexes = [
+            models.Index(fields=['order', '-created_at'], condition=models.Q(is_active=True),
+                         name='testimonial_active_idx'),
+        ]
     
     def __str__(self):
         name = self.reviewer_name or "Anonymous"
         return f"{name} - {self.rating} stars"
 
 
+class OfferQuerySet(models.QuerySet):
+    """QuerySet helpers for offer validity, evaluated in SQL"""
+
+    def valid(self, on=None):
+        """Offers whose validity window contains the given date (default: today)"""
+        on = on or timezone.now().date()
+        return self.filter(valid_from__lte=on, valid_until__gte=on)
+
+    def expired(self, on=None):
+        """Offers whose validity window ended before the given date (default: today)"""
+        on = on or timezone.now().date()
+        return self.filter(valid_until__lt=on)
+
+    def expire(self, on=None):
+        """Deactivate every active, expired offer in one UPDATE; returns the row count"""
+        return self.filter(is_active=True).expired(on).update(is_active=False, updated_at=timezone.now())
+
+
 class Offer(models.Model):
     """Model for clinic-specific offers"""
     clinic = models.ForeignKey(Clinic, on_delete=models.CASCADE, related_name='offers')
@@ -674,10 +935,20 @@ class Offer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = OfferQuerySet.as_manager()
+    
     class Meta:
         ordering = ['order', '-created_at']
         verbose_name = "Offer"
         verbose_name_plural = "Offers"
+        indexes = [
+            models.Index(fields=['clinic', 'order', '-created_at'], condition=models.Q(is_active=True),
+                         name='offer_active_clinic_idx'),
+            models.Index(fields=['order', '-created_at'], condition=models.Q(is_active=True),
+                         name='offer_active_idx'),
+            models.Index(fields=['valid_until', 'valid_from'], condition=models.Q(is_active=True),
+                         name='offer_validity_idx'),
+        ]
     
     def __str__(self):
         return f"{self.clinic.name} - {self.header}"
@@ -695,3 +966,87 @@ class Offer(models.Model):
         if today > self.valid_until:
             return 0
         return (self.valid_until - today).days
+
+
+class ApiSnapshot(models.Model):
+    """Fully rendered response bytes for one public endpoint and parameter combination"""
+    key = models.CharField(max_length=40, unique=True, help_text="SHA-1 of the snapshot URL")
+    scheme = models.CharField(max_length=5, default='https')
+    host = models.CharField(max_length=255)
+    path = models.CharField(max_length=255)
+    query_string = models.CharField(max_length=500, blank=True)
+    content_version = models.CharField(max_length=64, help_text="Content version the body was rendered for")
+    body = models.BinaryField()
+    size = models.PositiveIntegerField(default=0, help_text="Body size in bytes")
+    surrogate_keys = models.TextField(blank=True, help_text="Space-separated CDN surrogate keys of the response")
+    generated_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['path', 'query_string']
+        verbose_name = "API Snapshot"
+        verbose_name_plural = "API Snapshots"
+    
+    def __str__(self):
+        return f"{self.path}?{self.query_string}" if self.query_string else self.path
+    
+    @property
+    def is_fresh(self):
+        """Check if the snapshot matches the current content version"""
+        from .snapshots import current_version
+        return self.content_version == current_version()
+
+
+class SearchEntry(models.Model):
+    """One searchable public record (treatment, skin concern, blog or FAQ), maintained by api.search"""
+    KIND_CHOICES = [
+        ('treatment', 'Treatment'),
+        ('skin_concern', 'Skin Concern'),
+        ('blog', 'Blog'),
+        ('treatment_faq', 'Treatment FAQ'),
+        ('landing_faq', 'Landing FAQ'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    title = models.CharField(max_length=500)
+    summary = models.TextField(blank=True, help_text="Secondary text: category, excerpt, tags")
+    body = models.TextField(blank=True)
+    excerpt = models.TextField(blank=True, help_text="Shown in search results")
+    slug = models.CharField(max_length=350, blank=True)
+    document = SearchVectorField(null=True, help_text="Weighted full-text document of title, summary and body")
+    boost = models.FloatField(default=0, help_text="Added to the rank, e.g. for featured records")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['kind', 'object_id']
+        verbose_name = "Search Entry"
+        verbose_name_plural = "Search Entries"
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='searchentry_unique_object'),
+        ]
+        indexes = [
+            GinIndex(fields=['document'], name='searchentry_document_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.title}"
+
+
+class RelatedContent(models.Model):
+    """Precomputed "related" link between two search entries, rebuilt by ``build_related_content``"""
+    source = models.ForeignKey(SearchEntry, on_delete=models.CASCADE, related_name='related')
+    target = models.ForeignKey(SearchEntry, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField(help_text="TF-IDF cosine similarity")
+    rank = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        ordering = ['source', 'rank']
+        verbose_name = "Related Content"
+        verbose_name_plural = "Related Content"
+        constraints = [
+            # Also the index behind detail page lookups
+            models.UniqueConstraint(fields=['source', 'rank'], name='relatedcontent_unique_rank'),
+        ]
+    
+    def __str__(self):
+        return f"{self.source} -> {self.target}"
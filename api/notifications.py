@@ -0,0 +1,205 @@
+"""
+Owner notifications for new appointments and contact messages.
+
+With ``NOTIFICATION_MODE = 'immediate'`` every item is emailed as it
+arrives. With ``'digest'`` items are left pending (``notified_at`` is NULL)
+and the ``send_notification_digest`` command, run from the scheduler, sends
+one summary per interval - globally or per clinic - over a single SMTP
+connection. Items matching the urgency rule are always sent immediately.
+
+An item is only marked notified once its email went out; when an immediate
+send fails it stays pending for the next digest.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection, send_mail
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import site_settings
+from .models import Appointment, ContactMessage
+
+logger = logging.getLogger('api.notifications')
+
+
+def digest_mode():
+    return getattr(settings, 'NOTIFICATION_MODE', 'immediate') == 'digest'
+
+
+def has_urgent_keyword(*texts):
+    keywords = getattr(settings, 'NOTIFICATION_URGENT_KEYWORDS', [])
+    text = ' '.join(texts).lower()
+    return any(keyword.lower() in text for keyword in keywords)
+
+
+def is_urgent(item):
+    """Urgency rule: a keyword in the text, or an appointment wanted within NOTIFICATION_URGENT_WITHIN_DAYS"""
+    if isinstance(item, Appointment):
+        within_days = getattr(settings, 'NOTIFICATION_URGENT_WITHIN_DAYS', 1)
+        if within_days is not None and item.preferred_date <= timezone.localdate() + timedelta(days=within_days):
+            return True
+        return has_urgent_keyword(item.treatment_interest, item.message)
+    return has_urgent_keyword(item.subject, item.message)
+
+
+def send_owner_email(subject, message, on_sent=None):
+    """
+    Email the clinic owner from a background thread; returns the started
+    thread. ``on_sent`` is called in that thread once the email was sent.
+    """
+    def send():
+        try:
+            send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [settings.OWNER_EMAIL], fail_silently=False)
+            logger.info(f"Sent owner notification: {subject}")
+            if on_sent is not None:
+                on_sent()
+        except Exception:
+            logger.exception(f"Failed to send owner notification: {subject}")
+        finally:
+            # The thread opened its own connection if on_sent touched the database
+            connections.close_all()
+
+    thread = threading.Thread(target=send)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def describe_appointment(appointment):
+    clinic_name = appointment.clinic.name if appointment.clinic else 'No clinic specified'
+    return f"""
+Clinic: {clinic_name}
+Name: {appointment.full_name}
+Email: {appointment.email}
+Phone: {appointment.phone}
+Preferred Date: {appointment.preferred_date}
+Preferred Time: {appointment.preferred_time}
+Treatment Interest: {appointment.treatment_interest}
+Message: {appointment.message}
+"""
+
+
+def describe_contact_message(message):
+    return f"""
+Name: {message.name}
+Email: {message.email}
+Subject: {message.subject}
+Message: {message.message}
+"""
+
+
+def mark_notified(model, pks):
+    model.objects.filter(pk__in=pks).update(notified_at=timezone.now())
+
+
+def marker(model, pks):
+    """``on_sent`` callback marking ``pks`` notified"""
+    return lambda: mark_notified(model, pks)
+
+
+def appointment_created(appointment):
+    """Email a new appointment now, unless digest mode holds it for the next summary"""
+    if digest_mode() and not is_urgent(appointment):
+        return None
+    clinic_name = appointment.clinic.name if appointment.clinic else 'No clinic specified'
+    prefix = "URGENT: " if digest_mode() else ""
+    return send_owner_email(
+        f"{prefix}New Appointment Request - {appointment.full_name} at {clinic_name}",
+        "New appointment request received:\n" + describe_appointment(appointment)
+        + "\nPlease log in to the admin panel to manage this appointment.",
+        on_sent=marker(Appointment, [appointment.pk]),
+    )
+
+
+def contact_message_created(message):
+    """Email a new contact message now, unless digest mode holds it for the next summary"""
+    if digest_mode() and not is_urgent(message):
+        return None
+    prefix = "URGENT: " if digest_mode() else ""
+    return send_owner_email(
+        f"{prefix}New Contact Message - {message.subject}",
+        "New contact message received:\n" + describe_contact_message(message)
+        + "\nPlease log in to the admin panel to respond to this message.",
+        on_sent=marker(ContactMessage, [message.pk]),
+    )
+
+
+def notify_bulk_appointments(appointments, clinics):
+    """One summary email for a batch of appointments instead of one per booking"""
+    if digest_mode():
+        # The next digest lists them
+        return None
+    per_clinic = {}
+    for appointment in appointments:
+        clinic = clinics.get(appointment.clinic_id)
+        name = clinic.name if clinic else 'No clinic specified'
+        per_clinic[name] = per_clinic.get(name, 0) + 1
+
+    lines = [f"{len(appointments)} appointment(s) were entered in a batch:", ""]
+    lines += [f"  {name}: {count}" for name, count in sorted(per_clinic.items())]
+    lines += ["", "Please log in to the admin panel to manage these appointments."]
+    return send_owner_email(f"{len(appointments)} New Appointment Requests", '\n'.join(lines),
+                            on_sent=marker(Appointment, [appointment.pk for appointment in appointments]))
+
+
+def build_digest(title, appointments, messages):
+    subject = f"{title}: {len(appointments)} new appointment(s), {len(messages)} new message(s)"
+    parts = [subject, '']
+    if appointments:
+        parts.append("APPOINTMENTS")
+        parts += [describe_appointment(appointment) for appointment in appointments]
+    if messages:
+        parts.append("CONTACT MESSAGES")
+        parts += [describe_contact_message(message) for message in messages]
+    parts.append("Please log in to the admin panel to manage these requests.")
+    return EmailMessage(subject, '\n'.join(parts), settings.DEFAULT_FROM_EMAIL, [settings.OWNER_EMAIL])
+
+
+def send_digest(per_clinic=None):
+    """
+    Send pending appointments and contact messages as digest emails over one
+    SMTP connection and mark them notified. Returns the number of emails sent.
+
+    Rows are locked with SKIP LOCKED so overlapping runs never send an item twice.
+    """
+    if per_clinic is None:
+        per_clinic = getattr(settings, 'NOTIFICATION_DIGEST_GROUPING', 'global') == 'clinic'
+
+    with transaction.atomic():
+        appointments = list(
+            Appointment.objects.filter(notified_at__isnull=True)
+            .select_for_update(skip_locked=True, of=('self',))
+            .select_related('clinic').order_by('created_at')
+        )
+        messages = list(
+            ContactMessage.objects.filter(notified_at__isnull=True)
+            .select_for_update(skip_locked=True).order_by('created_at')
+        )
+        if not appointments and not messages:
+            return 0
+
+        if per_clinic:
+            groups = {}
+            for appointment in appointments:
+                groups.setdefault(appointment.clinic, []).append(appointment)
+            emails = [
+                build_digest(clinic.name if clinic else 'No clinic specified', items, [])
+                for clinic, items in sorted(groups.items(), key=lambda group: group[0].name if group[0] else '')
+            ]
+            if messages:
+                emails.append(build_digest('Contact messages', [], messages))
+        else:
+            emails = [build_digest(f"{site_settings.get().site_name} digest", appointments, messages)]
+
+        connection = get_connection(fail_silently=False)
+        # send_messages opens the connection once for the whole batch
+        connection.send_messages(emails)
+
+        mark_notified(Appointment, [appointment.pk for appointment in appointments])
+        mark_notified(ContactMessage, [message.pk for message in messages])
+    logger.info(f"Sent {len(emails)} digest email(s) for {len(appointments)} appointment(s) "
+                f"and {len(messages)} message(s)")
+    return len(emails)
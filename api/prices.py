@@ -0,0 +1,54 @@
+"""
+Parsing of the display price strings of treatment pricing ("$150",
+"From ₹2,500", "₹3,000 - ₹5,000", "Up to Rs. 8000") into numbers.
+
+Kept free of model imports so migrations can use it.
+"""
+import re
+from decimal import Decimal
+
+CURRENCY_CODES = {'₹': 'INR', 'rs': 'INR', 'inr': 'INR', '$': 'USD', 'usd': 'USD', '€': 'EUR', 'eur': 'EUR',
+                  '£': 'GBP', 'gbp': 'GBP', 'aed': 'AED'}
+
+# Largest amount the pricing columns hold
+MAX_AMOUNT = Decimal('9999999999.99')
+
+CURRENCY_RE = re.compile(r'[₹$€£]|\b(?:rs|inr|usd|eur|gbp|aed)\b\.?')
+AMOUNT_RE = re.compile(r'(?<![\d,])(\d+(?:,\d+)*(?:\.\d+)?)(\s*k\b)?')
+# Numbers that count something other than money: "3 sessions for $300", "20% off"
+QUANTITY_RE = re.compile(r'\s*(?:%|x\b|sessions?\b|sittings?\b|areas?\b|units?\b|ml\b|mins?\b|minutes?\b'
+                         r'|hours?\b|hrs?\b|weeks?\b|months?\b)')
+LOWER_BOUND_RE = re.compile(r'\b(?:from|starting|starts|onwards|upwards|min|minimum)\b|\d\s*\+')
+UPPER_BOUND_RE = re.compile(r'\b(?:up\s*to|upto|under|below|max|maximum|less than)\b')
+
+
+def parse_price(text):
+    """
+    ``(amount_min, amount_max, currency)`` of a display price. An open bound
+    ("From $100") or a price without numbers ("On request") leaves that
+    amount None; the currency is '' when the text names none.
+    """
+    lowered = (text or '').casefold()
+    match = CURRENCY_RE.search(lowered)
+    currency = CURRENCY_CODES[match.group().rstrip('.')] if match else ''
+
+    amounts = []
+    for match in AMOUNT_RE.finditer(lowered):
+        if QUANTITY_RE.match(lowered, match.end()):
+            continue
+        amount = Decimal(match.group(1).replace(',', ''))
+        if match.group(2):
+            amount *= 1000
+        if amount <= MAX_AMOUNT:
+            amounts.append(amount)
+
+    if not amounts:
+        return None, None, currency
+    if len(amounts) > 1:
+        return min(amounts), max(amounts), currency
+    amount = amounts[0]
+    if UPPER_BOUND_RE.search(lowered):
+        return None, amount, currency
+    if LOWER_BOUND_RE.search(lowered):
+        return amount, None, currency
+    return amount, amount, currency
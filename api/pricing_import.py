@@ -0,0 +1,213 @@
+"""
+Spreadsheet import of treatment pricing per clinic.
+
+A CSV or XLSX sheet with the columns ``treatment``, ``clinic``, ``price``
+and optionally ``is_active`` and ``order`` is diffed against the existing
+``TreatmentClinicPricing`` rows; treatments and clinics are matched by name,
+or by id written ``#12`` (names are not unique, and may themselves be
+numbers). ``plan()`` reads everything it needs in three queries and
+``apply()`` writes the result with ``bulk_create``/``bulk_update`` in one
+transaction.
+"""
+import csv
+import io
+
+from django.db import transaction
+from openpyxl import load_workbook
+
+from .models import Clinic, Treatment, TreatmentClinicPricing
+from .signals import content_bulk_updated
+
+REQUIRED_COLUMNS = ['treatment', 'clinic', 'price']
+OPTIONAL_COLUMNS = ['is_active', 'order']
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'active'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'inactive'}
+BATCH_SIZE = 500
+# Range of the PositiveIntegerField ``order`` column
+MAX_ORDER = 2147483647
+
+
+class PricingImportError(Exception):
+    """The uploaded file cannot be read as a pricing sheet"""
+
+
+def cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def csv_rows(uploaded_file):
+    """Rows of a UTF-8 CSV file as lists of cell texts"""
+    text = io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline='')
+    try:
+        for row in csv.reader(text):
+            yield [cell_text(value) for value in row]
+    except UnicodeDecodeError:
+        # Decoding happens as the rows are read
+        raise PricingImportError("The file is not UTF-8 encoded CSV.")
+
+
+def read_rows(uploaded_file):
+    """Rows of an uploaded CSV/XLSX file as dicts keyed by lower-case column name"""
+    name = uploaded_file.name.lower()
+    if name.endswith('.xlsx'):
+        try:
+            workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+        except Exception:
+            raise PricingImportError("The file is not a valid .xlsx workbook.")
+        rows = ([cell_text(value) for value in row] for row in workbook.active.iter_rows(values_only=True))
+    elif name.endswith('.csv'):
+        rows = csv_rows(uploaded_file)
+    else:
+        raise PricingImportError("Upload a .csv or .xlsx file.")
+
+    header = [column.lower().replace(' ', '_') for column in next(rows, [])]
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise PricingImportError(f"Missing column(s): {', '.join(missing)}")
+    columns = [column for column in REQUIRED_COLUMNS + OPTIONAL_COLUMNS if column in header]
+    positions = {column: header.index(column) for column in columns}
+
+    result = []
+    for row in rows:
+        if not any(row):
+            continue
+        row += [''] * (len(header) - len(row))
+        result.append({column: row[position] for column, position in positions.items()})
+    return result
+
+
+class ImportPlan:
+    """Changes needed to bring the pricing table in line with a sheet"""
+
+    def __init__(self):
+        self.to_create = []
+        self.to_update = []
+        self.changes = []
+        self.unchanged = 0
+        self.errors = []
+
+    @property
+    def has_changes(self):
+        return bool(self.to_create or self.to_update)
+
+
+def lookup_map(objects, name_attr):
+    """``(by_id, by_name)``: objects by id, and every object per lower-case name"""
+    by_id, by_name = {}, {}
+    for obj in objects:
+        by_id[obj.id] = obj
+        by_name.setdefault(getattr(obj, name_attr).strip().lower(), []).append(obj)
+    return by_id, by_name
+
+
+def resolve(value, lookup, label):
+    """``(object, error)`` for a cell naming an object by name or by ``#id``"""
+    by_id, by_name = lookup
+    if value.startswith('#'):
+        obj = by_id.get(int(value[1:])) if value[1:].isdigit() else None
+        return (obj, None) if obj else (None, f"Unknown {label} id '{value}'")
+    matches = by_name.get(value.lower(), [])
+    if not matches:
+        return None, f"Unknown {label} '{value}'"
+    if len(matches) > 1:
+        ids = ', '.join(f"#{obj_id}" for obj_id in sorted(obj.id for obj in matches))
+        return None, f"Ambiguous {label} '{value}': use one of {ids}"
+    return matches[0], None
+
+
+def parse_flag(value):
+    value = value.lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f"'{value}' is not a yes/no value")
+
+
+def parse_order(value):
+    try:
+        order = int(value)
+    except ValueError:
+        raise ValueError(f"Order '{value}' is not a whole number")
+    if not 0 <= order <= MAX_ORDER:
+        raise ValueError(f"Order must be between 0 and {MAX_ORDER}")
+    return order
+
+
+def plan(rows):
+    """Diff sheet rows against the existing pricing; rows are numbered from 2 (below the header)"""
+    treatments = lookup_map(Treatment.objects.only('id', 'name'), 'name')
+    clinics = lookup_map(Clinic.objects.only('id', 'name'), 'name')
+    existing = {
+        (pricing.treatment_id, pricing.clinic_id): pricing
+        for pricing in TreatmentClinicPricing.objects.all()
+    }
+
+    result = ImportPlan()
+    seen = set()
+    for line, row in enumerate(rows, start=2):
+        treatment, error = resolve(row['treatment'], treatments, 'treatment')
+        if error is None:
+            clinic, error = resolve(row['clinic'], clinics, 'clinic')
+        if error is not None:
+            result.errors.append((line, error))
+            continue
+        if not row['price']:
+            result.errors.append((line, "Price is empty"))
+            continue
+        if len(row['price']) > TreatmentClinicPricing._meta.get_field('price').max_length:
+            result.errors.append((line, "Price is too long"))
+            continue
+        if (treatment.id, clinic.id) in seen:
+            result.errors.append((line, f"Duplicate row for {treatment.name} at {clinic.name}"))
+            continue
+        seen.add((treatment.id, clinic.id))
+
+        values = {'price': row['price']}
+        try:
+            if row.get('is_active'):
+                values['is_active'] = parse_flag(row['is_active'])
+            if row.get('order'):
+                values['order'] = parse_order(row['order'])
+        except ValueError as e:
+            result.errors.append((line, str(e)))
+            continue
+
+        pricing = existing.get((treatment.id, clinic.id))
+        if pricing is None:
+            result.to_create.append(TreatmentClinicPricing(treatment=treatment, clinic=clinic, **values))
+            result.changes.append(('create', treatment.name, clinic.name, {
+                field: (None, value) for field, value in values.items()
+            }))
+            continue
+
+        changed = {field: (getattr(pricing, field), value)
+                   for field, value in values.items() if getattr(pricing, field) != value}
+        if not changed:
+            result.unchanged += 1
+            continue
+        for field, (_, value) in changed.items():
+            setattr(pricing, field, value)
+        result.to_update.append(pricing)
+        result.changes.append(('update', treatment.name, clinic.name, changed))
+    return result
+
+
+def apply(import_plan):
+    """Write a plan in one transaction; returns ``(created, updated)``"""
+    # bulk writes skip save(), which parses the display price
+    for pricing in import_plan.to_create + import_plan.to_update:
+        pricing.parse_amounts()
+    with transaction.atomic():
+        TreatmentClinicPricing.objects.bulk_create(import_plan.to_create, batch_size=BATCH_SIZE)
+        TreatmentClinicPricing.objects.bulk_update(
+            import_plan.to_update, ['price', 'amount_min', 'amount_max', 'currency', 'is_active', 'order'],
+            batch_size=BATCH_SIZE,
+        )
+        # bulk writes send no signals
+        content_bulk_updated(TreatmentClinicPricing)
+    return len(import_plan.to_create), len(import_plan.to_update)
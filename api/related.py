@@ -0,0 +1,156 @@
+"""
+Precomputed "related content" for blog and treatment detail pages.
+
+``build()`` (run by the ``build_related_content`` command from the
+scheduler) turns every blog, treatment and skin concern search entry into a
+TF-IDF vector with numpy, finds each one's top-k cosine neighbours with a
+matrix product and stores them as ``RelatedContent`` rows. Detail pages then
+read their neighbours with one indexed query; the treatment catalog loads
+them all when it is built.
+
+Links point at ``SearchEntry`` rows, so titles stay current and a neighbour
+that is unpublished or deleted disappears at once (its entry and links are
+deleted with it) instead of waiting for the next build.
+"""
+import logging
+import re
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from . import cdn, snapshots
+from .models import RelatedContent, SearchEntry
+
+logger = logging.getLogger('api.related')
+
+KINDS = ('blog', 'treatment', 'skin_concern')
+
+# Rows of the similarity matrix computed at once; bounds memory to CHUNK_SIZE x documents
+CHUNK_SIZE = 1024
+
+TOKEN_RE = re.compile(r"[^\W\d_][\w']+")
+
+STOP_WORDS = frozenset("""
+a about after all also an and any are as at be been before being but by can could do does during each
+for from had has have how if in into is it its may more most no not of on or our over same should so
+some such than that the their them then there these they this those through to too under up very was
+we were what when where which while who will with would you your
+""".split())
+
+
+def top_k():
+    return getattr(settings, 'API_RELATED_TOP_K', 5)
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.casefold()) if token not in STOP_WORDS]
+
+
+def tfidf(texts):
+    """
+    L2-normalized TF-IDF vectors (sublinear tf, smoothed idf) as a dense
+    ``documents x terms`` matrix. Terms found in a single document only
+    count towards the norms: they can never make two documents similar, and
+    dropping their columns keeps the matrix small.
+    """
+    vocabulary = {}
+    rows, columns, counts = [], [], []
+    for row, text in enumerate(texts):
+        for term, count in Counter(tokenize(text)).items():
+            rows.append(row)
+            columns.append(vocabulary.setdefault(term, len(vocabulary)))
+            counts.append(count)
+    rows = np.asarray(rows, dtype=np.intp)
+    columns = np.asarray(columns, dtype=np.intp)
+
+    document_frequency = np.bincount(columns, minlength=len(vocabulary))
+    idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1
+    weights = (1 + np.log(np.asarray(counts, dtype=np.float64))) * idf[columns]
+    norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=len(texts)))
+    weights /= np.where(norms > 0, norms, 1)[rows]
+
+    shared_terms = np.flatnonzero(document_frequency > 1)
+    shared_column = np.full(len(vocabulary), -1, dtype=np.intp)
+    shared_column[shared_terms] = np.arange(len(shared_terms))
+    keep = shared_column[columns] >= 0
+    matrix = np.zeros((len(texts), len(shared_terms)), dtype=np.float32)
+    matrix[rows[keep], shared_column[columns[keep]]] = weights[keep]
+    return matrix
+
+
+def nearest_neighbours(matrix, k):
+    """``(indexes, scores)``, each ``documents x k``, of every row's most similar other rows, best first"""
+    count = len(matrix)
+    k = min(k, count - 1)
+    if k < 1:
+        return np.empty((count, 0), dtype=np.intp), np.empty((count, 0), dtype=np.float32)
+    indexes = np.empty((count, k), dtype=np.intp)
+    scores = np.empty((count, k), dtype=np.float32)
+    for start in range(0, count, CHUNK_SIZE):
+        end = min(start + CHUNK_SIZE, count)
+        similarity = matrix[start:end] @ matrix.T
+        # A document is not related to itself
+        similarity[np.arange(end - start), np.arange(start, end)] = -1
+        candidates = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(similarity, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind='stable')
+        indexes[start:end] = np.take_along_axis(candidates, order, axis=1)
+        scores[start:end] = np.take_along_axis(candidate_scores, order, axis=1)
+    return indexes, scores
+
+
+def build(k=None):
+    """Recompute and replace every related content link; returns the number stored"""
+    k = top_k() if k is None else k
+    entries = list(
+        SearchEntry.objects.filter(kind__in=KINDS).order_by('id').values_list('id', 'title', 'summary', 'body')
+    )
+    links = []
+    if entries:
+        matrix = tfidf([' '.join(texts) for _, *texts in entries])
+        indexes, scores = nearest_neighbours(matrix, k)
+        for row, (source_id, *_) in enumerate(entries):
+            rank = 0
+            for index, score in zip(indexes[row], scores[row]):
+                if score <= 0:
+                    break
+                rank += 1
+                links.append(RelatedContent(source_id=source_id, target_id=entries[index][0],
+                                            score=round(float(score), 4), rank=rank))
+
+    with transaction.atomic():
+        RelatedContent.objects.all().delete()
+        RelatedContent.objects.bulk_create(links, batch_size=1000)
+        transaction.on_commit(snapshots.invalidate)
+        transaction.on_commit(lambda: cdn.purge_dispatcher.queue({'blog', 'treatment'}))
+    logger.info(f"Stored {len(links)} related content link(s) for {len(entries)} document(s)")
+    return len(links)
+
+
+def as_dict(link):
+    target = link.target
+    return {'type': target.kind, 'id': target.object_id, 'title': target.title, 'slug': target.slug,
+            'score': link.score}
+
+
+def for_source(kind, object_id):
+    """Related items of one record, best first"""
+    links = (
+        RelatedContent.objects.filter(source__kind=kind, source__object_id=object_id)
+        .select_related('target').order_by('rank')
+    )
+    return [as_dict(link) for link in links]
+
+
+def by_source(kind):
+    """``{object_id: (related items, ...)}`` for every record of ``kind``"""
+    related = {}
+    links = (
+        RelatedContent.objects.filter(source__kind=kind)
+        .select_related('source', 'target').order_by('source_id', 'rank')
+    )
+    for link in links:
+        related.setdefault(link.source.object_id, []).append(as_dict(link))
+    return {object_id: tuple(items) for object_id, items in related.items()}
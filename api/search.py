@@ -0,0 +1,184 @@
+"""
+Site search over treatments, skin concerns, blogs and FAQs.
+
+Every public record has one row in ``SearchEntry`` holding its display
+fields and a weighted full-text document (title A, summary B, body C). The
+signal handlers in ``api.signals`` keep the rows in step with content saves
+inside the saving transaction; ``rebuild_search_index`` rebuilds them all.
+
+``search()`` matches the document with a websearch query (quoted phrases,
+``or``, ``-word``) and ranks with ``ts_rank``. When the ``pg_trgm``
+extension is installed, titles also match by trigram word similarity, so
+misspellings like "hydrafacial" still find "HydraFacial", and the similarity
+adds to the score. Featured records get a small boost.
+"""
+import logging
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+
+from .models import Blog, LandingFAQ, SearchEntry, SkinConcern, Treatment, TreatmentCategory, TreatmentFAQ
+
+logger = logging.getLogger('api.search')
+
+MAX_LIMIT = 50
+EXCERPT_LENGTH = 200
+FEATURED_BOOST = 0.1
+
+_trigram_available = None
+
+
+def search_config():
+    """Text search configuration used for stemming and stop words"""
+    return getattr(settings, 'API_SEARCH_CONFIG', 'english')
+
+
+def shorten(text, length=EXCERPT_LENGTH):
+    text = ' '.join(text.split())
+    return text if len(text) <= length else text[:length].rsplit(' ', 1)[0] + '...'
+
+
+def treatment_entry(treatment):
+    return {
+        'title': treatment.name,
+        'summary': treatment.category.title,
+        'body': treatment.description,
+        'excerpt': shorten(treatment.description),
+        'boost': FEATURED_BOOST if treatment.is_featured else 0,
+    }
+
+
+def skin_concern_entry(concern):
+    return {
+        'title': concern.title,
+        'summary': concern.description,
+        'body': '\n'.join((concern.treatments, concern.products, concern.results)),
+        'excerpt': shorten(concern.description),
+    }
+
+
+def blog_entry(blog):
+    return {
+        'title': blog.title,
+        'summary': f"{blog.excerpt} {blog.tags}",
+        'body': blog.content,
+        'excerpt': shorten(blog.excerpt or blog.content),
+        'slug': blog.slug,
+        'boost': FEATURED_BOOST if blog.is_featured else 0,
+    }
+
+
+def faq_entry(faq):
+    return {
+        'title': faq.question,
+        'body': faq.answer,
+        'excerpt': shorten(faq.answer),
+    }
+
+
+# kind -> (model, public rows, entry fields)
+SOURCES = {
+    'treatment': (Treatment, lambda: Treatment.objects.filter(is_active=True).select_related('category'),
+                  treatment_entry),
+    'skin_concern': (SkinConcern, lambda: SkinConcern.objects.filter(is_active=True), skin_concern_entry),
+    'blog': (Blog, lambda: Blog.objects.filter(is_published=True), blog_entry),
+    'treatment_faq': (TreatmentFAQ, lambda: TreatmentFAQ.objects.filter(is_active=True), faq_entry),
+    'landing_faq': (LandingFAQ, lambda: LandingFAQ.objects.filter(is_active=True), faq_entry),
+}
+
+KINDS_BY_MODEL = {model: kind for kind, (model, _, _) in SOURCES.items()}
+
+
+def document():
+    config = search_config()
+    return (
+        SearchVector('title', weight='A', config=config)
+        + SearchVector('summary', weight='B', config=config)
+        + SearchVector('body', weight='C', config=config)
+    )
+
+
+def reindex(model, pks=None):
+    """
+    Bring the entries of ``model`` rows ``pks`` (all rows when None) up to
+    date: public rows are written, the others removed. Returns the number of
+    entries written.
+    """
+    if model is TreatmentCategory:
+        # Treatments carry their category title
+        treatments = Treatment.objects.all() if pks is None else Treatment.objects.filter(category_id__in=pks)
+        return reindex(Treatment, list(treatments.values_list('pk', flat=True)))
+    kind = KINDS_BY_MODEL.get(model)
+    if kind is None:
+        return 0
+    _, public, entry = SOURCES[kind]
+
+    rows = public() if pks is None else public().filter(pk__in=pks)
+    entries = []
+    for row in rows:
+        fields = {'summary': '', 'slug': '', 'boost': 0, **entry(row)}
+        entries.append(SearchEntry(kind=kind, object_id=row.pk, **fields))
+
+    stale = SearchEntry.objects.filter(kind=kind).exclude(object_id__in=[item.object_id for item in entries])
+    if pks is not None:
+        stale = stale.filter(object_id__in=pks)
+    stale.delete()
+    if entries:
+        SearchEntry.objects.bulk_create(
+            entries, update_conflicts=True, unique_fields=['kind', 'object_id'],
+            update_fields=['title', 'summary', 'body', 'excerpt', 'slug', 'boost', 'updated_at'],
+        )
+        SearchEntry.objects.filter(kind=kind, object_id__in=[item.object_id for item in entries]).update(
+            document=document()
+        )
+    return len(entries)
+
+
+def index_instance(instance):
+    reindex(type(instance), [instance.pk])
+
+
+def remove_instance(instance):
+    kind = KINDS_BY_MODEL.get(type(instance))
+    if kind:
+        SearchEntry.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+
+def rebuild():
+    """Reindex every source; returns ``{kind: entries}``"""
+    return {kind: reindex(model) for kind, (model, _, _) in SOURCES.items()}
+
+
+def trigram_available():
+    """Whether pg_trgm is installed in this database; checked once per process"""
+    global _trigram_available
+    if _trigram_available is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_available = cursor.fetchone() is not None
+        if not _trigram_available:
+            logger.info("pg_trgm is not installed; search runs without typo tolerance")
+    return _trigram_available
+
+
+def search(text, kinds=None, limit=20):
+    """Ranked entries matching ``text``, each annotated with ``score``"""
+    query = SearchQuery(text, search_type='websearch', config=search_config())
+    entries = SearchEntry.objects.all()
+    if kinds:
+        entries = entries.filter(kind__in=kinds)
+
+    score = SearchRank(F('document'), query) + F('boost')
+    match = Q(document=query)
+    if trigram_available():
+        score = score + TrigramWordSimilarity(text, 'title')
+        match |= Q(title__trigram_word_similar=text)
+    return (
+        entries.filter(match)
+        .annotate(score=Cast(score, FloatField()))
+        .only('kind', 'object_id', 'title', 'excerpt', 'slug')
+        .order_by('-score', 'kind', 'object_id')[:max(1, min(limit, MAX_LIMIT))]
+    )
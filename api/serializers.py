@@ -1,8 +1,79 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
+from . import availability, catalog, cdn, notifications, related
 from .models import *
 
 
-class SiteSettingsSerializer(serializers.ModelSerializer):
+def sparse_fieldset(request):
+    """
+    Serializer kwargs for ``?fields=a,b`` / ``?exclude=c`` on GET requests,
+    e.g. ``{'fields': {'a', 'b'}}``; empty when neither is given.
+    """
+    if request is None or request.method != 'GET':
+        return {}
+    kwargs = {}
+    for param in ('fields', 'exclude'):
+        names = {name.strip() for name in request.query_params.get(param, '').split(',') if name.strip()}
+        if names:
+            kwargs[param] = names
+    return kwargs
+
+
+def sparse_list_serializer(serializer_class, queryset, context):
+    """List serializer for ``queryset`` honouring the request's sparse fieldset, with unused columns deferred"""
+    fieldset = sparse_fieldset(context.get('request'))
+    if fieldset:
+        queryset = serializer_class(**fieldset).defer_dropped(queryset)
+    return serializer_class(queryset, many=True, context=context, **fieldset)
+
+
+class KeyedModelSerializer(serializers.ModelSerializer):
+    """
+    Model serializer that records CDN surrogate keys for what it renders.
+
+    Takes optional ``fields``/``exclude`` sets to render a sparse fieldset
+    (unknown names are ignored). ``Meta.field_columns`` lists the extra model
+    columns a field reads, e.g. for properties, so they are never deferred
+    while the field is rendered.
+    """
+
+    def __init__(self, *args, fields=None, exclude=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dropped_fields = {}
+        if fields is not None or exclude is not None:
+            for name in list(self.fields):
+                if (fields is not None and name not in fields) or (exclude is not None and name in exclude):
+                    self.dropped_fields[name] = self.fields.pop(name)
+
+    def field_column_names(self, fields):
+        extra = getattr(self.Meta, 'field_columns', {})
+        names = set()
+        for name, field in fields.items():
+            # Method fields (source '*') are named after the column they read
+            names.add(name if field.source == '*' else field.source.split('.')[0])
+            names.update(extra.get(name, ()))
+        return names
+
+    def deferrable_columns(self):
+        """Model columns that only the dropped fields read"""
+        columns = {field.name for field in self.Meta.model._meta.concrete_fields if not field.primary_key}
+        dropped = self.field_column_names(self.dropped_fields)
+        return sorted((dropped & columns) - self.field_column_names(self.fields))
+
+    def defer_dropped(self, queryset):
+        """``queryset`` without the columns of the dropped fields"""
+        columns = self.deferrable_columns()
+        return queryset.defer(*columns) if columns else queryset
+
+    def to_representation(self, instance):
+        cdn.add_keys(cdn.instance_key(instance))
+        if isinstance(self.parent, serializers.ListSerializer):
+            # Lists change when any row of the model is added or removed
+            cdn.add_keys(instance._meta.model_name)
+        return super().to_representation(instance)
+
+
+class SiteSettingsSerializer(KeyedModelSerializer):
     """Serializer for site settings"""
     all_contact_emails = serializers.SerializerMethodField()
     all_contact_phones = serializers.SerializerMethodField()
@@ -41,7 +112,7 @@ class SiteSettingsSerializer(serializers.ModelSerializer):
         return obj.get_primary_phone()
 
 
-class CarouselImageSerializer(serializers.ModelSerializer):
+class CarouselImageSerializer(KeyedModelSerializer):
     """Serializer for carousel images"""
     imageUrl = serializers.SerializerMethodField()
     
@@ -58,7 +129,7 @@ class CarouselImageSerializer(serializers.ModelSerializer):
         return ""
 
 
-class LandingPageBgSerializer(serializers.ModelSerializer):
+class LandingPageBgSerializer(KeyedModelSerializer):
     """Serializer for landing page background"""
     image = serializers.SerializerMethodField()
     
@@ -87,7 +158,7 @@ class LandingPageBgSerializer(serializers.ModelSerializer):
             return ""
 
 
-class TeamMemberSerializer(serializers.ModelSerializer):
+class TeamMemberSerializer(KeyedModelSerializer):
     """Serializer for team members"""
     image = serializers.SerializerMethodField()
     
@@ -104,7 +175,7 @@ class TeamMemberSerializer(serializers.ModelSerializer):
         return ""
 
 
-class PhilosophyHighlightSerializer(serializers.ModelSerializer):
+class PhilosophyHighlightSerializer(KeyedModelSerializer):
     """Serializer for philosophy highlights"""
     
     class Meta:
@@ -112,7 +183,7 @@ class PhilosophyHighlightSerializer(serializers.ModelSerializer):
         fields = ['title', 'description']
 
 
-class AboutUsSerializer(serializers.ModelSerializer):
+class AboutUsSerializer(KeyedModelSerializer):
     """Serializer for About Us content"""
     team = serializers.SerializerMethodField()
     philosophy = serializers.SerializerMethodField()
@@ -196,18 +267,18 @@ class AboutUsSerializer(serializers.ModelSerializer):
         return data
 
 
-class TreatmentClinicPricingSerializer(serializers.ModelSerializer):
-    """Serializer for treatment pricing at specific clinics"""
-    clinic_name = serializers.CharField(source='clinic.name', read_only=True)
-    clinic_id = serializers.IntegerField(source='clinic.id', read_only=True)
+class TreatmentClinicPricingSerializer(KeyedModelSerializer):
+    """Serializer for treatment pricing at specific clinics (catalog records)"""
+    clinic_name = serializers.CharField(read_only=True)
+    clinic_id = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = TreatmentClinicPricing
-        fields = ['clinic_id', 'clinic_name', 'price', 'order', 'is_active']
+        fields = ['clinic_id', 'clinic_name', 'price', 'amount_min', 'amount_max', 'currency', 'order', 'is_active']
 
 
-class TreatmentItemSerializer(serializers.ModelSerializer):
-    """Serializer for individual treatments"""
+class TreatmentItemSerializer(KeyedModelSerializer):
+    """Serializer for individual treatments (catalog records)"""
     image = serializers.SerializerMethodField()
     clinic_pricing = serializers.SerializerMethodField()
     
@@ -216,28 +287,23 @@ class TreatmentItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'duration', 'description', 'image', 'is_active', 'clinic_pricing']
     
     def get_image(self, obj):
+        # Catalog records hold the file URL
         if obj.image:
             request = self.context.get('request')
             if request:
-                return request.build_absolute_uri(obj.image.url)
-            return obj.image.url
+                return request.build_absolute_uri(obj.image)
+            return obj.image
         return ""
     
     def get_clinic_pricing(self, obj):
         """Get pricing for all clinics where this treatment is available"""
-        clinic_id = self.context.get('clinic_id')
-        if clinic_id:
-            # Filter pricing for specific clinic
-            pricing = obj.clinic_pricing.filter(clinic_id=clinic_id, is_active=True)
-        else:
-            # Get all active pricing
-            pricing = obj.clinic_pricing.filter(is_active=True)
-        
+        treatment_catalog = self.context.get('catalog') or catalog.current()
+        pricing = treatment_catalog.pricing(obj.id, self.context.get('clinic_id'))
         return TreatmentClinicPricingSerializer(pricing, many=True).data
 
 
-class TreatmentLandingSerializer(serializers.ModelSerializer):
-    """Serializer for treatments on landing page"""
+class TreatmentLandingSerializer(KeyedModelSerializer):
+    """Serializer for treatments on landing page (catalog records)"""
     image = serializers.SerializerMethodField()
     clinic_pricing = serializers.SerializerMethodField()
     
@@ -246,40 +312,22 @@ class TreatmentLandingSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'image', 'duration', 'clinic_pricing']
     
     def get_image(self, obj):
+        # Catalog records hold the file URL
         if obj.image:
             request = self.context.get('request')
             if request:
-                return request.build_absolute_uri(obj.image.url)
-            return obj.image.url
+                return request.build_absolute_uri(obj.image)
+            return obj.image
         return ""
     
     def get_clinic_pricing(self, obj):
         """Get pricing for all clinics where this treatment is available"""
-        clinic_id = self.context.get('clinic_id')
-        if clinic_id:
-            # Filter pricing for specific clinic
-            pricing = obj.clinic_pricing.filter(clinic_id=clinic_id, is_active=True)
-        else:
-            # Get all active pricing
-            pricing = obj.clinic_pricing.filter(is_active=True)
-        
+        treatment_catalog = self.context.get('catalog') or catalog.current()
+        pricing = treatment_catalog.pricing(obj.id, self.context.get('clinic_id'))
         return TreatmentClinicPricingSerializer(pricing, many=True).data
 
 
-class TreatmentCategorySerializer(serializers.ModelSerializer):
-    """Serializer for treatment categories"""
-    items = TreatmentItemSerializer(many=True, read_only=True)
-    
-    class Meta:
-        model = TreatmentCategory
-        fields = ['id', 'title', 'description', 'items']
-    
-    def get_items(self, obj):
-        treatments = obj.items.filter(is_active=True)
-        return TreatmentItemSerializer(treatments, many=True, context=self.context).data
-
-
-class TreatmentFAQSerializer(serializers.ModelSerializer):
+class TreatmentFAQSerializer(KeyedModelSerializer):
     """Serializer for treatment FAQs"""
     
     class Meta:
@@ -287,7 +335,7 @@ class TreatmentFAQSerializer(serializers.ModelSerializer):
         fields = ['question', 'answer']
 
 
-class ResultSerializer(serializers.ModelSerializer):
+class ResultSerializer(KeyedModelSerializer):
     """Serializer for results"""
     result_image = serializers.SerializerMethodField()
     is_featured = serializers.ReadOnlyField()
@@ -311,7 +359,7 @@ class ResultSerializer(serializers.ModelSerializer):
         return ""
 
 
-class ResultLandingSerializer(serializers.ModelSerializer):
+class ResultLandingSerializer(KeyedModelSerializer):
     """Serializer for results on landing page"""
     result_image = serializers.SerializerMethodField()
     
@@ -333,13 +381,57 @@ class ResultLandingSerializer(serializers.ModelSerializer):
         return ""
 
 
-class SkinConcernSerializer(serializers.ModelSerializer):
+class TreatmentSummarySerializer(KeyedModelSerializer):
+    """Serializer for treatment cards embedded in other payloads"""
+    image = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Treatment
+        fields = ['id', 'name', 'category', 'duration', 'image', 'is_featured']
+    
+    def get_image(self, obj):
+        if obj.image:
+            request = self.context.get('request')
+            if request:
+                return request.build_absolute_uri(obj.image.url)
+            return obj.image.url
+        return ""
+
+
+class ResultSummarySerializer(ResultSerializer):
+    """Serializer for result cards embedded in other payloads"""
+    is_featured = None
+    created_at = None
+    
+    class Meta:
+        model = Result
+        fields = ['id', 'condition', 'duration', 'result_image']
+
+
+class SkinConcernSerializer(KeyedModelSerializer):
     """Serializer for skin concerns"""
     icon = serializers.SerializerMethodField()
+    linked_treatments = serializers.SerializerMethodField()
+    linked_results = serializers.SerializerMethodField()
     
     class Meta:
         model = SkinConcern
-        fields = ['id', 'title', 'description', 'icon', 'treatments', 'products', 'results']
+        fields = [
+            'id', 'title', 'description', 'icon', 'treatments', 'products', 'results',
+            'linked_treatments', 'linked_results'
+        ]
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Prefetch the active linked treatments and results: two queries for the whole list"""
+        return queryset.prefetch_related(
+            Prefetch('linked_treatments', to_attr='active_treatments',
+                     queryset=Treatment.objects.filter(is_active=True).order_by('order', 'name', 'id')
+                     .only('id', 'name', 'category_id', 'duration', 'image', 'is_featured', 'order')),
+            Prefetch('linked_results', to_attr='active_results',
+                     queryset=Result.objects.filter(is_active=True).order_by('-created_at', 'id')
+                     .only('id', 'condition', 'duration', 'result_image', 'created_at')),
+        )
     
     def get_icon(self, obj):
         if obj.icon:
@@ -348,9 +440,21 @@ class SkinConcernSerializer(serializers.ModelSerializer):
                 return request.build_absolute_uri(obj.icon.url)
             return obj.icon.url
         return ""
+    
+    def get_linked_treatments(self, obj):
+        treatments = getattr(obj, 'active_treatments', None)
+        if treatments is None:
+            treatments = obj.linked_treatments.filter(is_active=True)
+        return TreatmentSummarySerializer(treatments, many=True, context=self.context).data
+    
+    def get_linked_results(self, obj):
+        results = getattr(obj, 'active_results', None)
+        if results is None:
+            results = obj.linked_results.filter(is_active=True)
+        return ResultSummarySerializer(results, many=True, context=self.context).data
 
 
-class LandingFAQSerializer(serializers.ModelSerializer):
+class LandingFAQSerializer(KeyedModelSerializer):
     """Serializer for landing page FAQs"""
     
     class Meta:
@@ -358,7 +462,7 @@ class LandingFAQSerializer(serializers.ModelSerializer):
         fields = ['question', 'answer']
 
 
-class OfferSerializer(serializers.ModelSerializer):
+class OfferSerializer(KeyedModelSerializer):
     """Serializer for clinic offers"""
     image = serializers.SerializerMethodField()
     clinic_name = serializers.CharField(source='clinic.name', read_only=True)
@@ -371,6 +475,10 @@ class OfferSerializer(serializers.ModelSerializer):
             'id', 'header', 'description', 'image', 'clinic_name', 
             'valid_from', 'valid_until', 'is_featured', 'is_valid', 'days_remaining'
         ]
+        field_columns = {
+            'is_valid': ['valid_from', 'valid_until'],
+            'days_remaining': ['valid_until'],
+        }
     
     def get_image(self, obj):
         if obj.image:
@@ -381,7 +489,7 @@ class OfferSerializer(serializers.ModelSerializer):
         return ""
 
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(KeyedModelSerializer):
     """Serializer for appointment bookings"""
     
     class Meta:
@@ -392,129 +500,30 @@ class AppointmentSerializer(serializers.ModelSerializer):
         ]
     
     def create(self, validated_data):
-        appointment = Appointment.objects.create(**validated_data)
-        
-        # Send email notification to owner (non-blocking)
-        import threading
-        import logging
-        from django.core.mail import send_mail
-        from django.conf import settings
+        # Reserves the clinic slot; raises a validation error when it is taken
+        appointment = availability.book(validated_data)
         
-        logger = logging.getLogger('api.serializers')
-        
-        def send_email_async():
-            try:
-                logger.info("=" * 60)
-                logger.info("EMAIL SENDING PROCESS STARTED")
-                logger.info("=" * 60)
-                
-                clinic_name = appointment.clinic.name if appointment.clinic else 'No clinic specified'
-                subject = f"New Appointment Request - {appointment.full_name} at {clinic_name}"
-                message = f"""
-                New appointment request received:
-                
-                Clinic: {clinic_name}
-                Name: {appointment.full_name}
-                Email: {appointment.email}
-                Phone: {appointment.phone}
-                Preferred Date: {appointment.preferred_date}
-                Preferred Time: {appointment.preferred_time}
-                Treatment Interest: {appointment.treatment_interest}
-                Message: {appointment.message}
-                
-                Please log in to the admin panel to manage this appointment.
-                """
-                
-                # Log email configuration (without sensitive data)
-                logger.info(f"Email Backend: {settings.EMAIL_BACKEND}")
-                logger.info(f"Email Host: {settings.EMAIL_HOST}")
-                logger.info(f"Email Port: {settings.EMAIL_PORT}")
-                logger.info(f"Email Use TLS: {settings.EMAIL_USE_TLS}")
-                logger.info(f"Email Host User: {settings.EMAIL_HOST_USER if settings.EMAIL_HOST_USER else 'NOT SET'}")
-                logger.info(f"Email Host Password: {'SET' if settings.EMAIL_HOST_PASSWORD else 'NOT SET'}")
-                logger.info(f"Default From Email: {settings.DEFAULT_FROM_EMAIL}")
-                logger.info(f"Owner Email (Recipient): {settings.OWNER_EMAIL}")
-                logger.info(f"Email Timeout: {getattr(settings, 'EMAIL_TIMEOUT', 'Not set')}")
-                
-                # Check if credentials are configured
-                if not settings.EMAIL_HOST_USER:
-                    logger.warning("EMAIL_HOST_USER is not configured. Email will not be sent.")
-                    logger.info("=" * 60)
-                    logger.info("EMAIL SENDING PROCESS ABORTED - Missing EMAIL_HOST_USER")
-                    logger.info("=" * 60)
-                    return
-                
-                if not settings.EMAIL_HOST_PASSWORD:
-                    logger.warning("EMAIL_HOST_PASSWORD is not configured. Email will not be sent.")
-                    logger.info("=" * 60)
-                    logger.info("EMAIL SENDING PROCESS ABORTED - Missing EMAIL_HOST_PASSWORD")
-                    logger.info("=" * 60)
-                    return
-                
-                if not settings.OWNER_EMAIL:
-                    logger.warning("OWNER_EMAIL is not configured. Email will not be sent.")
-                    logger.info("=" * 60)
-                    logger.info("EMAIL SENDING PROCESS ABORTED - Missing OWNER_EMAIL")
-                    logger.info("=" * 60)
-                    return
-                
-                logger.info(f"Attempting to send email...")
-                logger.info(f"Subject: {subject}")
-                logger.info(f"From: {settings.DEFAULT_FROM_EMAIL}")
-                logger.info(f"To: {settings.OWNER_EMAIL}")
-                logger.info(f"Message length: {len(message)} characters")
-                
-                # Attempt to send email
-                result = send_mail(
-                    subject,
-                    message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [settings.OWNER_EMAIL],
-                    fail_silently=False,  # Changed to False to get exceptions
-                )
-                
-                if result:
-                    logger.info("✓ Email sent successfully!")
-                    logger.info(f"Email result: {result}")
-                else:
-                    logger.warning("✗ Email sending returned False (may have failed silently)")
-                
-                logger.info("=" * 60)
-                logger.info("EMAIL SENDING PROCESS COMPLETED")
-                logger.info("=" * 60)
-                
-            except Exception as e:
-                # Log detailed error information
-                logger.error("=" * 60)
-                logger.error("EMAIL SENDING FAILED")
-                logger.error("=" * 60)
-                logger.error(f"Error Type: {type(e).__name__}")
-                logger.error(f"Error Message: {str(e)}")
-                logger.error(f"Error Details: {repr(e)}")
-                
-                # Log traceback for debugging
-                import traceback
-                logger.error("Full Traceback:")
-                logger.error(traceback.format_exc())
-                
-                # Log additional context
-                logger.error(f"Appointment ID: {appointment.id}")
-                logger.error(f"Appointment Email: {appointment.email}")
-                logger.error(f"Appointment Name: {appointment.full_name}")
-                
-                logger.error("=" * 60)
-        
-        # Send email in background thread to avoid blocking
-        logger.info(f"Starting email thread for appointment ID: {appointment.id}")
-        email_thread = threading.Thread(target=send_email_async)
-        email_thread.daemon = True
-        email_thread.start()
-        logger.info(f"Email thread started (daemon={email_thread.daemon})")
+        # Email the owner now or hold it for the digest (non-blocking)
+        notifications.appointment_created(appointment)
         
         return appointment
 
 
-class BlogImageSerializer(serializers.ModelSerializer):
+class AppointmentBulkItemSerializer(AppointmentSerializer):
+    """Serializer for one row of a bulk appointment upload"""
+    # Resolved from the clinics the view loads once for the whole batch
+    clinic = serializers.IntegerField(required=False, allow_null=True)
+    
+    def validate_clinic(self, value):
+        if value is None:
+            return None
+        clinic = self.context['clinics'].get(value)
+        if clinic is None:
+            raise serializers.ValidationError(f'Invalid pk "{value}" - object does not exist.')
+        return clinic
+
+
+class BlogImageSerializer(KeyedModelSerializer):
     """Serializer for blog images"""
     image = serializers.SerializerMethodField()
     
@@ -531,7 +540,7 @@ class BlogImageSerializer(serializers.ModelSerializer):
         return ""
 
 
-class BlogListSerializer(serializers.ModelSerializer):
+class BlogListSerializer(KeyedModelSerializer):
     """Serializer for blog list view"""
     featured_image = serializers.SerializerMethodField()
     tags_list = serializers.SerializerMethodField()
@@ -555,18 +564,19 @@ class BlogListSerializer(serializers.ModelSerializer):
         return obj.get_tags_list()
 
 
-class BlogDetailSerializer(serializers.ModelSerializer):
+class BlogDetailSerializer(KeyedModelSerializer):
     """Serializer for blog detail view"""
     featured_image = serializers.SerializerMethodField()
     images = BlogImageSerializer(many=True, read_only=True)
     tags_list = serializers.SerializerMethodField()
+    related = serializers.SerializerMethodField()
     
     class Meta:
         model = Blog
         fields = [
             'id', 'title', 'slug', 'content', 'excerpt', 'author', 'featured_image',
             'images', 'tags_list', 'read_time', 'views_count', 'meta_title',
-            'meta_description', 'created_at', 'updated_at'
+            'meta_description', 'created_at', 'updated_at', 'related'
         ]
     
     def get_featured_image(self, obj):
@@ -579,9 +589,13 @@ class BlogDetailSerializer(serializers.ModelSerializer):
     
     def get_tags_list(self, obj):
         return obj.get_tags_list()
+    
+    def get_related(self, obj):
+        """Precomputed related blogs, treatments and skin concerns"""
+        return related.for_source('blog', obj.id)
 
 
-class BlogCreateUpdateSerializer(serializers.ModelSerializer):
+class BlogCreateUpdateSerializer(KeyedModelSerializer):
     """Serializer for creating and updating blog posts"""
     
     class Meta:
@@ -603,7 +617,7 @@ class BlogCreateUpdateSerializer(serializers.ModelSerializer):
         return value
 
 
-class TreatmentBenefitSerializer(serializers.ModelSerializer):
+class TreatmentBenefitSerializer(KeyedModelSerializer):
     """Serializer for treatment benefits"""
     
     class Meta:
@@ -611,7 +625,7 @@ class TreatmentBenefitSerializer(serializers.ModelSerializer):
         fields = ['title', 'description']
 
 
-class TreatmentStepSerializer(serializers.ModelSerializer):
+class TreatmentStepSerializer(KeyedModelSerializer):
     """Serializer for treatment steps"""
     
     class Meta:
@@ -619,60 +633,58 @@ class TreatmentStepSerializer(serializers.ModelSerializer):
         fields = ['title', 'description', 'step_number']
 
 
-class TreatmentCategoryDetailSerializer(serializers.ModelSerializer):
+class TreatmentCategoryDetailSerializer(KeyedModelSerializer):
     """Serializer for category details in treatment"""
     class Meta:
         model = TreatmentCategory
         fields = ['id', 'title', 'description']
 
 
-class TreatmentDetailSerializer(serializers.ModelSerializer):
-    """Serializer for detailed treatment view"""
+class TreatmentDetailSerializer(KeyedModelSerializer):
+    """Serializer for detailed treatment view (catalog records)"""
     category = TreatmentCategoryDetailSerializer(read_only=True)
     image = serializers.SerializerMethodField()
     benefits = serializers.SerializerMethodField()
     steps = serializers.SerializerMethodField()
     clinic_pricing = serializers.SerializerMethodField()
+    related = serializers.SerializerMethodField()
     
     class Meta:
         model = Treatment
         fields = [
             'id', 'name', 'category', 'duration', 'description',
-            'image', 'is_featured', 'order', 'is_active', 'benefits', 'steps', 'clinic_pricing'
+            'image', 'is_featured', 'order', 'is_active', 'benefits', 'steps', 'clinic_pricing', 'related'
         ]
     
     def get_image(self, obj):
+        # Catalog records hold the file URL
         if obj.image:
             request = self.context.get('request')
             if request:
-                return request.build_absolute_uri(obj.image.url)
-            return obj.image.url
+                return request.build_absolute_uri(obj.image)
+            return obj.image
         return ""
     
     def get_benefits(self, obj):
         """Get benefits specific to this treatment"""
-        benefits = obj.benefits.filter(is_active=True)
-        return TreatmentBenefitSerializer(benefits, many=True).data
+        return TreatmentBenefitSerializer(obj.benefits, many=True).data
     
     def get_steps(self, obj):
         """Get steps specific to this treatment"""
-        steps = obj.steps.filter(is_active=True)
-        return TreatmentStepSerializer(steps, many=True).data
+        return TreatmentStepSerializer(obj.steps, many=True).data
     
     def get_clinic_pricing(self, obj):
         """Get pricing for all clinics where this treatment is available"""
-        clinic_id = self.context.get('clinic_id')
-        if clinic_id:
-            # Filter pricing for specific clinic
-            pricing = obj.clinic_pricing.filter(clinic_id=clinic_id, is_active=True)
-        else:
-            # Get all active pricing
-            pricing = obj.clinic_pricing.filter(is_active=True)
-        
+        treatment_catalog = self.context.get('catalog') or catalog.current()
+        pricing = treatment_catalog.pricing(obj.id, self.context.get('clinic_id'))
         return TreatmentClinicPricingSerializer(pricing, many=True).data
+    
+    def get_related(self, obj):
+        """Precomputed related content, loaded with the catalog"""
+        return list(obj.related)
 
 
-class WhyChooseUsSerializer(serializers.ModelSerializer):
+class WhyChooseUsSerializer(KeyedModelSerializer):
     """Serializer for Why Choose Us benefits"""
     
     class Meta:
@@ -680,7 +692,7 @@ class WhyChooseUsSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'description', 'icon', 'order']
 
 
-class TestimonialSerializer(serializers.ModelSerializer):
+class TestimonialSerializer(KeyedModelSerializer):
     """Serializer for testimonials (Google review screenshots)"""
     screenshot = serializers.SerializerMethodField()
     user_image = serializers.SerializerMethodField()
@@ -706,7 +718,7 @@ class TestimonialSerializer(serializers.ModelSerializer):
         return ""
 
 
-class ContactMessageSerializer(serializers.ModelSerializer):
+class ContactMessageSerializer(KeyedModelSerializer):
     """Serializer for contact messages"""
     
     class Meta:
@@ -716,38 +728,13 @@ class ContactMessageSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         message = ContactMessage.objects.create(**validated_data)
         
-        # Send email notification to owner
-        from django.core.mail import send_mail
-        from django.conf import settings
-        
-        try:
-            subject = f"New Contact Message - {message.subject}"
-            email_message = f"""
-            New contact message received:
-            
-            Name: {message.name}
-            Email: {message.email}
-            Subject: {message.subject}
-            Message: {message.message}
-            
-            Please log in to the admin panel to respond to this message.
-            """
-            
-            send_mail(
-                subject,
-                email_message,
-                settings.DEFAULT_FROM_EMAIL,
-                [settings.OWNER_EMAIL],
-                fail_silently=True,
-            )
-        except Exception as e:
-            # Log the error but don't fail the message creation
-            print(f"Failed to send email notification: {e}")
+        # Email the owner now or hold it for the digest (non-blocking)
+        notifications.contact_message_created(message)
         
         return message
 
 
-class ClinicImageSerializer(serializers.ModelSerializer):
+class ClinicImageSerializer(KeyedModelSerializer):
     """Serializer for clinic gallery images"""
     image = serializers.SerializerMethodField()
     
@@ -764,7 +751,7 @@ class ClinicImageSerializer(serializers.ModelSerializer):
         return ""
 
 
-class ClinicTeamMemberSerializer(serializers.ModelSerializer):
+class ClinicTeamMemberSerializer(KeyedModelSerializer):
     """Serializer for clinic team members"""
     image = serializers.SerializerMethodField()
     
@@ -781,7 +768,7 @@ class ClinicTeamMemberSerializer(serializers.ModelSerializer):
         return ""
 
 
-class ClinicListSerializer(serializers.ModelSerializer):
+class ClinicListSerializer(KeyedModelSerializer):
     """Serializer for clinic list view"""
     main_image = serializers.SerializerMethodField()
     
@@ -802,7 +789,7 @@ class ClinicListSerializer(serializers.ModelSerializer):
         return ""
 
 
-class ClinicDetailSerializer(serializers.ModelSerializer):
+class ClinicDetailSerializer(KeyedModelSerializer):
     """Serializer for clinic detail view"""
     main_image = serializers.SerializerMethodField()
     images = serializers.SerializerMethodField()
@@ -819,6 +806,23 @@ class ClinicDetailSerializer(serializers.ModelSerializer):
             'map_embed_url', 'images', 'team_members', 'treatments', 'offers'
         ]
     
+    @staticmethod
+    def setup_eager_loading(queryset, valid_offers=False):
+        """
+        Prefetch everything the detail payload needs into ``to_attr`` lists so a
+        clinic costs the same fixed number of queries whatever its size.
+        Treatments come from the in-memory catalog.
+        """
+        offers = Offer.objects.filter(is_active=True)
+        if valid_offers:
+            offers = offers.valid()
+        return queryset.prefetch_related(
+            Prefetch('images', queryset=ClinicImage.objects.filter(is_active=True), to_attr='active_images'),
+            Prefetch('team_members', queryset=ClinicTeamMember.objects.filter(is_active=True),
+                     to_attr='active_team_members'),
+            Prefetch('offers', queryset=offers.order_by('order', '-created_at'), to_attr='active_offers'),
+        )
+    
     def get_main_image(self, obj):
         if obj.main_image:
             request = self.context.get('request')
@@ -828,23 +832,28 @@ class ClinicDetailSerializer(serializers.ModelSerializer):
         return ""
     
     def get_images(self, obj):
-        images = obj.images.filter(is_active=True)
+        images = getattr(obj, 'active_images', None)
+        if images is None:
+            images = obj.images.filter(is_active=True)
         return ClinicImageSerializer(images, many=True, context=self.context).data
     
     def get_team_members(self, obj):
-        team_members = obj.team_members.filter(is_active=True)
+        team_members = getattr(obj, 'active_team_members', None)
+        if team_members is None:
+            team_members = obj.team_members.filter(is_active=True)
         return ClinicTeamMemberSerializer(team_members, many=True, context=self.context).data
     
     def get_treatments(self, obj):
-        # Get treatments that have pricing for this clinic
-        from .models import Treatment
-        treatments = Treatment.objects.filter(
-            clinic_pricing__clinic=obj, 
-            clinic_pricing__is_active=True,
-            is_active=True
-        ).prefetch_related('clinic_pricing__clinic').distinct().order_by('order', 'name')
-        return TreatmentItemSerializer(treatments, many=True, context=self.context).data
+        treatment_catalog = self.context.get('catalog') or catalog.current()
+        treatments = treatment_catalog.clinic_treatments(obj.id)
+        context = dict(self.context, catalog=treatment_catalog)
+        return TreatmentItemSerializer(treatments, many=True, context=context).data
     
     def get_offers(self, obj):
-        offers = obj.offers.filter(is_active=True).order_by('order', '-created_at')
+        offers = getattr(obj, 'active_offers', None)
+        if offers is None:
+            offers = obj.offers.filter(is_active=True)
+            if self.context.get('valid_offers'):
+                offers = offers.valid()
+            offers = offers.order_by('order', '-created_at')
         return OfferSerializer(offers, many=True, context=self.context).data 
\ No newline at end of file
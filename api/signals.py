@@ -0,0 +1,116 @@
+"""
+Signal handlers that keep derived data in step with content edits.
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+
+from . import availability, cdn, search, site_settings, snapshots
+from .models import *
+
+# Models whose rows appear in public API responses
+CONTENT_MODELS = [
+    LandingPageBg, CarouselImage, TeamMember, PhilosophyHighlight, AboutUs,
+    TreatmentCategory, TreatmentBenefit, TreatmentStep, Treatment, TreatmentClinicPricing,
+    TreatmentFAQ, Result, SkinConcern, LandingFAQ, Blog, BlogImage, WhyChooseUs,
+    Clinic, ClinicImage, ClinicTeamMember, SiteSettings, Testimonial, Offer,
+]
+
+
+def content_changed(sender, instance, **kwargs):
+    """Invalidate API snapshots and purge CDN copies once the saving transaction commits"""
+    update_fields = kwargs.get('update_fields')
+    if sender is Blog and update_fields and set(update_fields) == {'views_count'}:
+        # View counting on blog detail is not an editorial change
+        return
+    keys = cdn.purge_keys_for(instance)
+    transaction.on_commit(snapshots.invalidate)
+    transaction.on_commit(lambda: cdn.purge_dispatcher.queue(keys))
+
+
+def content_links_changed(sender, instance, action, model, pk_set, **kwargs):
+    """
+    ``content_changed`` for edits of many-to-many links between content models.
+    Both sides show the link, so the rows on the other side are purged too,
+    whichever side the edit was made from. ``clear()`` sends no primary keys,
+    so it purges the other model's key, which covers all of its pages.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    content_changed(type(instance), instance)
+    name = model._meta.model_name
+    keys = {name, *(f"{name}-{pk}" for pk in pk_set or ())}
+    transaction.on_commit(lambda: cdn.purge_dispatcher.queue(keys))
+
+
+def content_bulk_updated(model, pks=()):
+    """
+    Same as ``content_changed`` for ``QuerySet.update()`` calls, which send no
+    signals. Purges the model key, which covers every list of that model.
+    """
+    keys = {model._meta.model_name}
+    if model is SiteSettings:
+        transaction.on_commit(site_settings.invalidate)
+    keys.update(f"{model._meta.model_name}-{pk}" for pk in pks)
+    search.reindex(model, list(pks) or None)
+    transaction.on_commit(snapshots.invalidate)
+    transaction.on_commit(lambda: cdn.purge_dispatcher.queue(keys))
+
+
+for model in CONTENT_MODELS:
+    post_save.connect(content_changed, sender=model, dispatch_uid=f'content_changed_save_{model.__name__}')
+    post_delete.connect(content_changed, sender=model, dispatch_uid=f'content_changed_delete_{model.__name__}')
+
+for through in (SkinConcern.linked_treatments.through, SkinConcern.linked_results.through):
+    m2m_changed.connect(content_links_changed, sender=through, dispatch_uid=f'content_links_changed_{through.__name__}')
+
+
+def search_source_saved(sender, instance, **kwargs):
+    """Update the search entry in the saving transaction, so it commits or rolls back with the edit"""
+    update_fields = kwargs.get('update_fields')
+    if sender is Blog and update_fields and set(update_fields) == {'views_count'}:
+        return
+    search.index_instance(instance)
+
+
+def search_source_deleted(sender, instance, **kwargs):
+    search.remove_instance(instance)
+
+
+for model in [*search.KINDS_BY_MODEL, TreatmentCategory]:
+    post_save.connect(search_source_saved, sender=model, dispatch_uid=f'search_source_saved_{model.__name__}')
+for model in search.KINDS_BY_MODEL:
+    post_delete.connect(search_source_deleted, sender=model, dispatch_uid=f'search_source_deleted_{model.__name__}')
+
+
+def site_settings_changed(sender, instance, **kwargs):
+    """Make every worker reload its cached site settings once the change commits"""
+    transaction.on_commit(site_settings.invalidate)
+
+
+post_save.connect(site_settings_changed, sender=SiteSettings, dispatch_uid='site_settings_changed_save')
+post_delete.connect(site_settings_changed, sender=SiteSettings, dispatch_uid='site_settings_changed_delete')
+
+
+def appointment_pre_save(sender, instance, **kwargs):
+    """Remember the clinic day an edited appointment was booked on"""
+    instance._booked_day = (
+        Appointment.objects.filter(pk=instance.pk).values_list('clinic_id', 'preferred_date').first()
+        if instance.pk else None
+    )
+
+
+def appointment_changed(sender, instance, **kwargs):
+    """Keep the clinic day slot tallies in step with admin edits, cancellations and deletes"""
+    if getattr(instance, '_slot_reserved', False):
+        # Booked through availability.book, which already counted it
+        return
+    days = {(instance.clinic_id, instance.preferred_date)}
+    if getattr(instance, '_booked_day', None):
+        days.add(instance._booked_day)
+    for clinic_id, day in days:
+        availability.recount(clinic_id, day)
+
+
+pre_save.connect(appointment_pre_save, sender=Appointment, dispatch_uid='appointment_pre_save')
+post_save.connect(appointment_changed, sender=Appointment, dispatch_uid='appointment_changed_save')
+post_delete.connect(appointment_changed, sender=Appointment, dispatch_uid='appointment_changed_delete')
@@ -0,0 +1,91 @@
+"""
+Process-level cache of the ``SiteSettings`` singleton.
+
+The settings row is read by every page view of the frontend, so each worker
+keeps the loaded instance and its rendered JSON in memory. A token in the
+shared cache identifies the current settings; saving or deleting them
+switches the token (after commit), and every worker reloads on its next
+access. Serving the settings therefore costs one cache lookup and no query.
+The JSON is compressed once per load (see ``api.compression``).
+"""
+import logging
+import uuid
+
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+
+from . import compression
+
+logger = logging.getLogger('api.site_settings')
+
+TOKEN_KEY = 'api:site-settings-token'
+
+# Used while no SiteSettings row exists yet
+DEFAULTS = {
+    'site_name': "Monalisa Wellness",
+    'site_tagline': "Skin Clinic",
+    'site_description': "Expert skincare treatments and products that transform your skin and enhance your natural beauty.",
+    'contact_email': "info@monalisaclinic.com",
+    'contact_phone': "092891 57655",
+    'address': "Delhi & Gurugram\nMultiple Locations",
+    'social_facebook': "",
+    'social_instagram': "",
+    'social_twitter': "",
+    'business_hours': "Monday - Sunday: Open Daily\nCloses at: 7:30 PM\nCall for specific timings",
+    'offers_strip_color': "#DC2626",
+    'offers_strip_gradient_color': "#B91C1C",
+}
+
+# (token, instance, rendered JSON, compressed variants) of this process; replaced as a whole
+_loaded = None
+
+
+def current_token():
+    token = cache.get(TOKEN_KEY)
+    if token is None:
+        cache.add(TOKEN_KEY, uuid.uuid4().hex, timeout=None)
+        token = cache.get(TOKEN_KEY)
+    return token
+
+
+def load(token):
+    global _loaded
+    from .models import SiteSettings
+    from .serializers import SiteSettingsSerializer
+
+    instance = SiteSettings.objects.first()
+    if instance is None:
+        instance = SiteSettings(**DEFAULTS)
+    data = SiteSettingsSerializer(instance).data
+    body = JSONRenderer().render(data)
+    _loaded = (token, instance, body, compression.variants(body))
+    logger.info(f"Loaded site settings ({'defaults' if instance.pk is None else 'saved'})")
+    return _loaded
+
+
+def loaded():
+    # Read the token before the row, so a save committed in between is picked up next time
+    token = current_token()
+    if _loaded is not None and _loaded[0] == token:
+        return _loaded
+    return load(token)
+
+
+def get():
+    """
+    The site settings; an unsaved instance holding ``DEFAULTS`` when none
+    exist. Treat it as read-only, it is shared by every request of the process.
+    """
+    return loaded()[1]
+
+
+def rendered():
+    """The site settings API payload as ``(JSON bytes, compressed variants)``"""
+    return loaded()[2:]
+
+
+def invalidate():
+    """Make every process reload the settings on its next access"""
+    global _loaded
+    cache.set(TOKEN_KEY, uuid.uuid4().hex, timeout=None)
+    _loaded = None
@@ -0,0 +1,409 @@
+"""
+Materialized JSON snapshots for the public read API.
+
+Every public GET endpoint renders the same bytes until an editor changes
+content, so the fully rendered response is stored once per endpoint and
+parameter combination:
+
+- the ``ApiSnapshot`` table is the durable store (listed in the admin);
+- the cache holds the hot copy, keyed by the current content version, so a
+  fresh snapshot is served without a single ORM query. The gzip/brotli
+  variants of the body are cached with it (see ``api.compression``).
+
+Saving any content model bumps the content version (see ``api.signals``),
+which makes every snapshot stale at once; existing snapshots are then
+re-rendered in a background thread.
+
+Only canonical requests are stored: the configured ``API_CANONICAL_HOST``,
+ids in the path written without leading zeros, and query parameters whose
+values name something that exists (see ``PARAM_CHECKS``). Anything else is
+rendered live, so made-up Host headers and parameter values cannot grow the
+table or the cache.
+"""
+import hashlib
+import logging
+import re
+import threading
+import uuid
+from functools import wraps
+from io import BytesIO
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.urls import resolve
+from django.utils import timezone
+
+from . import cdn, compression
+
+logger = logging.getLogger('api.snapshots')
+
+CONTENT_TOKEN_KEY = 'api:content-token'
+SNAPSHOT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Largest ?limit= of the navigation menu worth a snapshot of its own
+MAX_SNAPSHOT_LIMIT = 50
+
+LEADING_ZERO_RE = re.compile(r'/0\d')
+
+_rebuild_timer = None
+_rebuild_lock = threading.Lock()
+
+
+def snapshots_enabled():
+    return getattr(settings, 'API_SNAPSHOTS_ENABLED', True)
+
+
+def canonical_host():
+    """Host snapshots are stored for; requests on any other Host header render live"""
+    return getattr(settings, 'API_CANONICAL_HOST', 'localhost')
+
+
+def canonical_int(value):
+    """``value`` as an int when written the one canonical way ("12", not "012" or "+12"), else None"""
+    if value.isascii() and value.isdigit() and value == str(int(value)):
+        return int(value)
+    return None
+
+
+def is_flag(value):
+    return value in ('true', 'false')
+
+
+def is_page(value):
+    # Pages past the end are 404s, which are never stored
+    page = canonical_int(value)
+    return page is not None and page >= 1
+
+
+def is_limit(value):
+    limit = canonical_int(value)
+    return limit is not None and 1 <= limit <= MAX_SNAPSHOT_LIMIT
+
+
+def is_active_clinic(value):
+    from . import catalog
+
+    clinic = catalog.current().clinics.get(canonical_int(value))
+    return clinic is not None and clinic.is_active
+
+
+def is_active_category(value):
+    from . import catalog
+
+    category = catalog.current().categories.get(canonical_int(value))
+    return category is not None and category.is_active
+
+
+def is_price_sort(value):
+    return value in ('price', '-price')
+
+
+# Query parameters a snapshot may carry, with the check their values must pass
+PARAM_CHECKS = {
+    'isLanding': is_flag,
+    'valid': is_flag,
+    'featured': is_flag,
+    'page': is_page,
+    'limit': is_limit,
+    'clinic_id': is_active_clinic,
+    'category_id': is_active_category,
+    'sort': is_price_sort,
+}
+
+
+def current_version():
+    """
+    Current content version shared by all workers through the cache.
+
+    The token changes on every content save; the date is part of the version
+    because offer validity and ``days_remaining`` change at midnight.
+    """
+    token = cache.get(CONTENT_TOKEN_KEY)
+    if token is None:
+        cache.add(CONTENT_TOKEN_KEY, uuid.uuid4().hex, timeout=None)
+        token = cache.get(CONTENT_TOKEN_KEY)
+    return f"{token}:{timezone.now().date().isoformat()}"
+
+
+def bump_version():
+    """Mark every snapshot stale by switching to a new content token"""
+    cache.set(CONTENT_TOKEN_KEY, uuid.uuid4().hex, timeout=None)
+
+
+class SnapshotTarget:
+    """One endpoint + parameter combination, as seen by a given host"""
+    __slots__ = ('scheme', 'host', 'path', 'query_string')
+
+    def __init__(self, path, params=None, host='localhost', scheme='https'):
+        self.scheme = scheme
+        self.host = host
+        self.path = path
+        self.query_string = urlencode(sorted((params or {}).items()))
+
+    @classmethod
+    def from_request(cls, request):
+        return cls(request.path, request.GET.dict(), host=request.get_host(), scheme=request.scheme)
+
+    def is_canonical(self):
+        """Whether this target may be stored (see the module docstring)"""
+        if self.host != canonical_host() or LEADING_ZERO_RE.search(self.path):
+            return False
+        return all(
+            name in PARAM_CHECKS and PARAM_CHECKS[name](value)
+            for name, value in parse_qsl(self.query_string, keep_blank_values=True)
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        target = cls(snapshot.path, host=snapshot.host, scheme=snapshot.scheme)
+        target.query_string = snapshot.query_string
+        return target
+
+    @property
+    def url(self):
+        url = f"{self.scheme}://{self.host}{self.path}"
+        return f"{url}?{self.query_string}" if self.query_string else url
+
+    @property
+    def key(self):
+        return hashlib.sha1(self.url.encode('utf-8')).hexdigest()
+
+    def cache_key(self, version):
+        return f"api:snapshot:{version}:{self.key}"
+
+    def build_request(self):
+        """Build a bare GET request for rendering this target outside the request cycle"""
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': self.path,
+            'QUERY_STRING': self.query_string,
+            'HTTP_HOST': self.host,
+            'SERVER_NAME': self.host.split(':')[0],
+            'SERVER_PORT': '443' if self.scheme == 'https' else '80',
+            'wsgi.url_scheme': self.scheme,
+            'wsgi.input': BytesIO(),
+        }
+        request = WSGIRequest(environ)
+        # Lets views skip visitor-only side effects such as view counting
+        request.is_internal_render = True
+        return request
+
+
+def get_fresh(target, version=None):
+    """
+    Return ``(body, surrogate_keys, encoded)`` for ``target`` if a snapshot
+    exists for the current version, otherwise None. ``encoded`` maps content
+    encodings to the compressed body.
+    """
+    from .models import ApiSnapshot
+
+    version = version or current_version()
+    snapshot = cache.get(target.cache_key(version))
+    if snapshot is None:
+        # Hot copy evicted or written by another process: fall back to the table
+        row = (
+            ApiSnapshot.objects.filter(key=target.key, content_version=version)
+            .values_list('body', 'surrogate_keys').first()
+        )
+        if row is None:
+            return None
+        body = bytes(row[0])
+        snapshot = (body, row[1].split(), compression.variants(body))
+        cache.set(target.cache_key(version), snapshot, SNAPSHOT_CACHE_TIMEOUT)
+    return snapshot
+
+
+def store(target, body, surrogate_keys=(), version=None):
+    """Persist rendered bytes for ``target`` under the given content version; returns the compressed variants"""
+    from .models import ApiSnapshot
+
+    version = version or current_version()
+    surrogate_keys = sorted(surrogate_keys)
+    ApiSnapshot.objects.update_or_create(
+        key=target.key,
+        defaults={
+            'scheme': target.scheme,
+            'host': target.host,
+            'path': target.path,
+            'query_string': target.query_string,
+            'content_version': version,
+            'body': body,
+            'size': len(body),
+            'surrogate_keys': ' '.join(surrogate_keys),
+            'generated_at': timezone.now(),
+        },
+    )
+    encoded = compression.variants(body)
+    cache.set(target.cache_key(version), (body, surrogate_keys, encoded), SNAPSHOT_CACHE_TIMEOUT)
+    return encoded
+
+
+def render(target, refresh=True):
+    """
+    Render ``target`` through its view; returns the bytes or None.
+
+    Snapshot-backed views store the result. With ``refresh=False`` a fresh
+    snapshot is reused instead of rendering again.
+    """
+    request = target.build_request()
+    request._snapshot_refresh = refresh
+    match = resolve(target.path)
+    response = match.func(request, *match.args, **match.kwargs)
+    if response.status_code != 200:
+        return None
+    if hasattr(response, 'render'):
+        response.render()
+    return response.content
+
+
+def snapshot_view(params=()):
+    """
+    Serve the decorated GET view from a fresh snapshot, rendering and storing
+    it on a miss. Requests with query parameters outside ``params``, or that
+    are not canonical, bypass snapshots so they cannot flood the store.
+    """
+    allowed = set(params)
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or not snapshots_enabled() or set(request.GET) - allowed:
+                return view_func(request, *args, **kwargs)
+
+            target = SnapshotTarget.from_request(request)
+            if not target.is_canonical():
+                return view_func(request, *args, **kwargs)
+            version = current_version()
+            if not getattr(request, '_snapshot_refresh', False):
+                snapshot = get_fresh(target, version)
+                if snapshot is not None:
+                    body, surrogate_keys, encoded = snapshot
+                    cdn.add_keys(*surrogate_keys)
+                    response = compression.precompressed_response(request, body, encoded)
+                    response['X-Snapshot'] = 'hit'
+                    return response
+
+            with cdn.surrogate_key_scope() as surrogate_keys:
+                response = view_func(request, *args, **kwargs)
+            if response.status_code == 200:
+                if hasattr(response, 'render'):
+                    response.render()
+                encoded = store(target, response.content, surrogate_keys, version)
+                compression.apply_precompressed(request, response, encoded)
+            response['X-Snapshot'] = 'miss'
+            return response
+        return wrapper
+    return decorator
+
+
+def public_targets(host, scheme='https', include_blog_details=False):
+    """
+    Every public endpoint and parameter permutation worth snapshotting.
+
+    Blog detail pages are only included on request since they are not
+    snapshot-backed (the live view counts visits).
+    """
+    from .models import Blog, Clinic, Treatment, TreatmentCategory
+
+    def target(path, **params):
+        return SnapshotTarget(path, params, host=host, scheme=scheme)
+
+    targets = [
+        target('/api/landing-bg/'),
+        target('/api/about-us/'),
+        target('/api/about-us/', isLanding='true'),
+        target('/api/treatments/'),
+        target('/api/treatments/', isLanding='true'),
+        target('/api/treatments/categories/'),
+        target('/api/treatments/categories/nav/'),
+        target('/api/treatments/faq/'),
+        target('/api/results/'),
+        target('/api/results/', isLanding='true'),
+        target('/api/skin-concerns/'),
+        target('/api/landing/faq/'),
+        target('/api/why-choose-us/'),
+        target('/api/clinics/'),
+        target('/api/offers/'),
+        target('/api/offers/', valid='true'),
+        target('/api/blogs/'),
+        target('/api/blogs/', featured='true'),
+        target('/api/testimonials/'),
+    ]
+    for category_id in TreatmentCategory.objects.filter(is_active=True).values_list('id', flat=True):
+        targets.append(target('/api/treatments/', category_id=category_id))
+    for treatment_id in Treatment.objects.filter(is_active=True).values_list('id', flat=True):
+        targets.append(target(f'/api/treatments/{treatment_id}/'))
+    for clinic_id in Clinic.objects.filter(is_active=True).values_list('id', flat=True):
+        targets.extend([
+            target(f'/api/clinics/{clinic_id}/'),
+            target(f'/api/clinics/{clinic_id}/', valid='true'),
+            target(f'/api/clinics/{clinic_id}/treatments/'),
+            target(f'/api/clinics/{clinic_id}/offers/'),
+            target(f'/api/clinics/{clinic_id}/offers/', valid='true'),
+            target('/api/treatments/', clinic_id=clinic_id),
+            target('/api/treatments/', isLanding='true', clinic_id=clinic_id),
+            target('/api/offers/', clinic_id=clinic_id),
+        ])
+    
+    blogs = Blog.objects.filter(is_published=True)
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    for params, count in [({}, blogs.count()), ({'featured': 'true'}, blogs.filter(is_featured=True).count())]:
+        for page in range(2, (count - 1) // page_size + 2):
+            targets.append(target('/api/blogs/', page=page, **params))
+    if include_blog_details:
+        for slug in blogs.values_list('slug', flat=True):
+            targets.append(target(f'/api/blogs/{slug}/'))
+    return targets
+
+
+def rebuild(targets):
+    """Re-render ``targets``; returns the number of snapshots stored"""
+    count = 0
+    for target in targets:
+        try:
+            if render(target) is not None:
+                count += 1
+        except Exception:
+            logger.exception(f"Failed to render snapshot for {target.url}")
+    return count
+
+
+def rebuild_stale():
+    """
+    Re-render every stored snapshot that belongs to an older content version.
+    Snapshots that are no longer canonical (a deactivated clinic, a changed
+    canonical host) are deleted instead.
+    """
+    from .models import ApiSnapshot
+
+    try:
+        version = current_version()
+        stale = ApiSnapshot.objects.exclude(content_version=version).defer('body')
+        targets = [SnapshotTarget.from_snapshot(snapshot) for snapshot in stale]
+        dropped = [target.key for target in targets if not target.is_canonical()]
+        if dropped:
+            ApiSnapshot.objects.filter(key__in=dropped).delete()
+        count = rebuild([target for target in targets if target.is_canonical()])
+        logger.info(f"Rebuilt {count} stale API snapshot(s), dropped {len(dropped)}")
+    finally:
+        connections.close_all()
+
+
+def invalidate():
+    """Make all snapshots stale and schedule a debounced background rebuild"""
+    global _rebuild_timer
+
+    bump_version()
+    delay = getattr(settings, 'API_SNAPSHOT_REBUILD_DELAY', 2)
+    if delay is None:
+        return
+    with _rebuild_lock:
+        # Coalesce bursts of saves (inlines, list_editable) into one rebuild
+        if _rebuild_timer is not None:
+            _rebuild_timer.cancel()
+        _rebuild_timer = threading.Timer(delay, rebuild_stale)
+        _rebuild_timer.daemon = True
+        _rebuild_timer.start()
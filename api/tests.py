@@ -1,3 +1,1503 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import load_workbook
+from rest_framework.request import Request
+
+from . import (
+    availability, catalog, cdn, compression, facets, notifications, prices, related, site_settings, snapshots,
+    suggest, throttling, warmup,
+)
+from .models import *
+from .serializers import OfferSerializer
+from .signals import content_bulk_updated
+from .views import ContactMessageCreateAPIView
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def seed_catalog(clinics=4, categories=5, treatments_per_category=20, offers_per_clinic=30, blogs=200, appointments=500):
+    """Seed a representative dataset for the hot API queries"""
+    clinic_objs = Clinic.objects.bulk_create([
+        Clinic(
+            name=f"Clinic {i}", specialization="Skin", description="Clinic description",
+            address="Address", city="Delhi", phone="0000000000", email=f"clinic{i}@example.com",
+            main_image="clinics/main/clinic.jpg", google_maps_url="https://maps.example.com",
+            order=i, is_active=i % 4 != 3,
+        )
+        for i in range(clinics)
+    ])
+    category_objs = TreatmentCategory.objects.bulk_create([
+        TreatmentCategory(title=f"Category {i}", description="Category description", order=i)
+        for i in range(categories)
+    ])
+    treatment_objs = Treatment.objects.bulk_create([
+        Treatment(
+            category=category, name=f"{category.title} Treatment {i}", duration="60 minutes",
+            description="Treatment description", order=i,
+            is_featured=i % 10 == 0, is_active=i % 5 != 4,
+        )
+        for category in category_objs
+        for i in range(treatments_per_category)
+    ])
+    TreatmentClinicPricing.objects.bulk_create([
+        TreatmentClinicPricing(treatment=treatment, clinic=clinic, price="$150", order=i,
+                               is_active=(treatment.id + clinic.id) % 3 != 0)
+        for i, treatment in enumerate(treatment_objs)
+        for clinic in clinic_objs
+    ])
+    today = date.today()
+    Offer.objects.bulk_create([
+        Offer(
+            clinic=clinic, header=f"Offer {i}", description="Offer description", image="offers/offer.jpg",
+            valid_from=today - timedelta(days=30), valid_until=today + timedelta(days=i - 15),
+            order=i, is_active=i % 3 != 0,
+        )
+        for clinic in clinic_objs
+        for i in range(offers_per_clinic)
+    ])
+    Blog.objects.bulk_create([
+        Blog(title=f"Blog {i}", slug=f"blog-{i}", content="Blog content", excerpt="Blog excerpt",
+             is_published=i % 4 != 0, is_featured=i % 20 == 0)
+        for i in range(blogs)
+    ])
+    Appointment.objects.bulk_create([
+        Appointment(
+            clinic=clinic_objs[i % clinics], first_name="Test", last_name=f"Patient {i}",
+            email=f"patient{i}@example.com", phone="+919999999999",
+            preferred_date=today + timedelta(days=i % 60), preferred_time=time(10, 0),
+            status=Appointment.STATUS_CHOICES[i % 4][0],
+        )
+        for i in range(appointments)
+    ])
+    return clinic_objs, category_objs, treatment_objs
+
+
+API_TEST_SETTINGS = {
+    'CACHES': LOCMEM_CACHES,
+    'API_SNAPSHOT_REBUILD_DELAY': None,
+    'API_CANONICAL_HOST': 'testserver',
+    'API_PURGE_BACKEND': 'api.cdn.LocalPurgeBackend',
+    'API_PURGE_DELAY': None,
+}
+
+
+@override_settings(**API_TEST_SETTINGS)
+class ApiTestCase(TestCase):
+    """Base test case with an isolated cache, no background rebuilds and in-memory CDN purges"""
+
+    def setUp(self):
+        cache.clear()
+        cdn.LocalPurgeBackend.purged.clear()
+
+
+class HotQueryIndexTests(TestCase):
+    """
+    Guard the index plan in ``api.models``: every hot endpoint query must be
+    answered from its dedicated index rather than a sequential scan.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clinics, cls.categories, cls.treatments = seed_catalog(treatments_per_category=200)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def setUp(self):
+        # Tiny test tables are cheaper to scan than to index, so make the planner
+        # report whether an index *could* serve the query instead.
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index_name, ordered=False):
+        """
+        Assert the plan avoids sequential scans and uses ``index_name``. With
+        ``ordered`` sorts are disabled too, so the index must also supply the
+        ORDER BY (a sort of a few hundred rows always beats an ordered read here).
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f"SET LOCAL enable_sort = {'off' if ordered else 'on'}")
+        plan = queryset.explain()
+        self.assertNotIn("Seq Scan", plan, msg=f"{queryset.query}\n{plan}")
+        self.assertIn(index_name, plan, msg=f"{queryset.query}\n{plan}")
+
+    def test_treatment_queries(self):
+        self.assertUsesIndex(
+            Treatment.objects.filter(is_active=True, is_featured=True),
+            'treatment_featured_idx',
+        )
+        self.assertUsesIndex(
+            Treatment.objects.filter(category=self.categories[0], is_active=True),
+            'treatment_active_cat_idx', ordered=True,
+        )
+        self.assertUsesIndex(
+            TreatmentClinicPricing.objects.filter(clinic=self.clinics[0], is_active=True)
+            .order_by().values('treatment_id'),
+            'pricing_clinic_idx',
+        )
+
+    def test_clinic_queries(self):
+        self.assertUsesIndex(Clinic.objects.filter(is_active=True), 'clinic_active_idx')
+        self.assertUsesIndex(
+            ClinicImage.objects.filter(clinic=self.clinics[0], is_active=True),
+            'clinicimage_active_idx', ordered=True,
+        )
+        self.assertUsesIndex(
+            ClinicTeamMember.objects.filter(clinic=self.clinics[0], is_active=True),
+            'clinicteam_active_idx', ordered=True,
+        )
+
+    def test_offer_queries(self):
+        self.assertUsesIndex(
+            Offer.objects.filter(is_active=True).order_by('order', '-created_at'),
+            'offer_active_idx', ordered=True,
+        )
+        self.assertUsesIndex(Offer.objects.filter(is_active=True).valid(), 'offer_validity_idx')
+        self.assertUsesIndex(Offer.objects.filter(is_active=True).expired(), 'offer_validity_idx')
+        self.assertUsesIndex(
+            Offer.objects.filter(clinic=self.clinics[0], is_active=True).order_by('order', '-created_at'),
+            'offer_active_clinic_idx', ordered=True,
+        )
+
+    def test_blog_queries(self):
+        self.assertUsesIndex(
+            Blog.objects.filter(is_published=True).order_by('-created_at'),
+            'blog_published_idx', ordered=True,
+        )
+        self.assertUsesIndex(
+            Blog.objects.filter(is_published=True, is_featured=True).order_by('-created_at'),
+            'blog_featured_idx', ordered=True,
+        )
+
+    def test_result_and_testimonial_queries(self):
+        self.assertUsesIndex(Result.objects.filter(is_active=True), 'result_active_idx')
+        self.assertUsesIndex(Result.objects.filter(is_active=True, is_featured=True), 'result_featured_idx')
+        self.assertUsesIndex(Testimonial.objects.filter(is_active=True), 'testimonial_active_idx')
+
+    def test_admin_queries(self):
+        self.assertUsesIndex(
+            Appointment.objects.filter(status='pending', preferred_date__gte=date.today()),
+            'appointment_status_date_idx',
+        )
+        self.assertUsesIndex(Appointment.objects.all()[:100], 'appointment_created_idx')
+        self.assertUsesIndex(ContactMessage.objects.all()[:100], 'contact_created_idx')
+
+
+class OfferValidityTests(ApiTestCase):
+    """SQL-side offer validity filtering and bulk expiry"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clinics, _, _ = seed_catalog(clinics=1, offers_per_clinic=30, blogs=0, appointments=0)
+
+    def test_valid_filter_matches_python_property(self):
+        valid_ids = set(Offer.objects.valid().values_list('id', flat=True))
+        expected = {offer.id for offer in Offer.objects.all() if offer.is_valid}
+        self.assertEqual(valid_ids, expected)
+
+    def test_offers_api_valid_mode(self):
+        response = self.client.get('/api/offers/', {'valid': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json())
+        self.assertTrue(all(offer['is_valid'] for offer in response.json()))
+
+        response = self.client.get(f'/api/clinics/{self.clinics[0].id}/offers/', {'valid': 'true'})
+        self.assertTrue(all(offer['is_valid'] for offer in response.json()['offers']))
+
+    def test_expire_deactivates_in_bulk(self):
+        expired = Offer.objects.filter(is_active=True).expired().count()
+        self.assertGreater(expired, 0)
+        self.assertEqual(Offer.objects.expire(), expired)
+        self.assertFalse(Offer.objects.filter(is_active=True).expired().exists())
+
+
+@override_settings(API_SNAPSHOTS_ENABLED=False)
+class ClinicDetailQueryCountTests(ApiTestCase):
+    """Clinic detail must cost a fixed number of queries regardless of clinic size"""
+
+    # clinic, images, team members, offers; treatments come from the catalog
+    EXPECTED_QUERIES = 4
+
+    def seed_clinic_extras(self, clinic, count):
+        ClinicImage.objects.bulk_create([
+            ClinicImage(clinic=clinic, image="clinics/gallery/image.jpg", order=i) for i in range(count)
+        ])
+        ClinicTeamMember.objects.bulk_create([
+            ClinicTeamMember(clinic=clinic, name=f"Member {i}", role="Doctor", order=i) for i in range(count)
+        ])
+
+    def assertClinicDetailQueries(self, clinic):
+        catalog.current()
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self.client.get(f'/api/clinics/{clinic.id}/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_small_clinic(self):
+        clinics, _, _ = seed_catalog(clinics=1, categories=1, treatments_per_category=5,
+                                     offers_per_clinic=3, blogs=0, appointments=0)
+        self.seed_clinic_extras(clinics[0], 2)
+        data = self.assertClinicDetailQueries(clinics[0])
+        self.assertEqual(len(data['images']), 2)
+
+    def test_large_clinic(self):
+        clinics, _, _ = seed_catalog(clinics=3, categories=5, treatments_per_category=40,
+                                     offers_per_clinic=40, blogs=0, appointments=0)
+        self.seed_clinic_extras(clinics[0], 20)
+        data = self.assertClinicDetailQueries(clinics[0])
+
+        expected = list(
+            Treatment.objects.filter(
+                clinic_pricing__clinic=clinics[0], clinic_pricing__is_active=True, is_active=True,
+            ).distinct().order_by('order', 'name').values_list('id', flat=True)
+        )
+        self.assertGreater(len(expected), 80)
+        self.assertEqual([treatment['id'] for treatment in data['treatments']], expected)
+        self.assertTrue(all(treatment['clinic_pricing'] for treatment in data['treatments']))
+        self.assertEqual(len(data['offers']), Offer.objects.filter(clinic=clinics[0], is_active=True).count())
+
+
+class SnapshotTests(ApiTestCase):
+    """Materialized JSON snapshots for the public read API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clinics, _, _ = seed_catalog(clinics=2, categories=2, treatments_per_category=5,
+                                         offers_per_clinic=3, blogs=5, appointments=0)
+
+    def test_fresh_snapshot_served_without_queries(self):
+        url = f'/api/clinics/{self.clinics[0].id}/'
+        first = self.client.get(url)
+        self.assertEqual(first['X-Snapshot'], 'miss')
+
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second['X-Snapshot'], 'hit')
+        self.assertEqual(second.content, first.content)
+
+    def test_content_save_makes_snapshots_stale(self):
+        self.client.get('/api/clinics/')
+        clinic = self.clinics[0]
+        clinic.name = "Renamed Clinic"
+        with self.captureOnCommitCallbacks(execute=True):
+            clinic.save()
+
+        response = self.client.get('/api/clinics/')
+        self.assertEqual(response['X-Snapshot'], 'miss')
+        self.assertIn("Renamed Clinic", [item['name'] for item in response.json()])
+        self.assertTrue(ApiSnapshot.objects.get(path='/api/clinics/').is_fresh)
+
+    def test_unlisted_params_bypass_snapshots(self):
+        response = self.client.get('/api/blogs/', {'search': 'Blog'})
+        self.assertFalse(response.has_header('X-Snapshot'))
+
+    def test_only_canonical_requests_stored(self):
+        inactive = self.clinics[1]
+        Clinic.objects.filter(pk=inactive.pk).update(is_active=False)
+        requests = [
+            ('/api/clinics/', {}, {'HTTP_HOST': 'attacker.example.com'}),
+            ('/api/treatments/', {'clinic_id': '99999'}, {}),
+            ('/api/treatments/', {'clinic_id': str(inactive.id)}, {}),
+            ('/api/treatments/', {'clinic_id': f'0{self.clinics[0].id}'}, {}),
+            ('/api/treatments/', {'category_id': '99999'}, {}),
+            ('/api/treatments/', {'isLanding': 'TRUE'}, {}),
+            ('/api/treatments/categories/nav/', {'limit': '100000'}, {}),
+            ('/api/treatments/', {'price_max': '1e3'}, {}),
+            ('/api/treatments/', {'sort': 'price', 'currency': 'INR'}, {}),
+            (f'/api/clinics/0{self.clinics[0].id}/', {}, {}),
+        ]
+        for path, params, headers in requests:
+            with self.settings(ALLOWED_HOSTS=['*']):
+                response = self.client.get(path, params, **headers)
+            self.assertEqual(response.status_code, 200, msg=path)
+            self.assertFalse(response.has_header('X-Snapshot'), msg=(path, params))
+        self.assertFalse(ApiSnapshot.objects.exists())
+
+        response = self.client.get('/api/treatments/', {'clinic_id': str(self.clinics[0].id)})
+        self.assertEqual(response['X-Snapshot'], 'miss')
+
+    def test_rebuild_drops_non_canonical_snapshots(self):
+        self.client.get('/api/clinics/')
+        snapshots.store(snapshots.SnapshotTarget('/api/clinics/', host='attacker.example.com'), b'[]')
+        snapshots.bump_version()
+        with mock.patch('api.snapshots.connections'):
+            snapshots.rebuild_stale()
+        self.assertEqual(list(ApiSnapshot.objects.values_list('host', flat=True)), ['testserver'])
+        self.assertTrue(ApiSnapshot.objects.get().is_fresh)
+
+    def test_rebuild_public_targets(self):
+        targets = snapshots.public_targets('testserver', 'http')
+        self.assertEqual(snapshots.rebuild(targets), ApiSnapshot.objects.count())
+        self.assertTrue(all(snapshot.is_fresh for snapshot in ApiSnapshot.objects.all()))
+
+    def test_admin_rebuild_all_without_selection(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.post('/admin/api/apisnapshot/', {'action': 'rebuild_all_snapshots', 'index': 0})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(ApiSnapshot.objects.filter(path='/api/clinics/').exists())
+        self.assertContains(self.client.get('/admin/api/apisnapshot/'), 'Fresh')
+
+
+class StaticExportTests(ApiTestCase):
+    """export_static_api against the filesystem storage backend"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clinics, _, cls.treatments = seed_catalog(clinics=2, categories=2, treatments_per_category=5,
+                                                      offers_per_clinic=3, blogs=45, appointments=0)
+
+    def export(self, output):
+        call_command('export_static_api', output=output, workers=1, stdout=io.StringIO())
+        with open(os.path.join(output, 'manifest.json')) as manifest_file:
+            return json.load(manifest_file)['files']
+
+    def test_export_writes_every_permutation_once(self):
+        with tempfile.TemporaryDirectory() as output:
+            files = self.export(output)
+            self.assertIn(f'api/clinics/{self.clinics[0].id}/index.json', files)
+            self.assertIn('api/treatments/index.isLanding=true.json', files)
+            self.assertIn('api/blogs/index.page=2.json', files)
+            self.assertIn('api/blogs/blog-1/index.json', files)
+            self.assertEqual(Blog.objects.get(slug='blog-1').views_count, 0)
+
+            path = os.path.join(output, 'api/clinics/index.json')
+            with open(path, 'rb') as exported:
+                self.assertEqual(json.loads(exported.read())[0]['name'], self.clinics[0].name)
+            mtime = os.stat(path).st_mtime_ns
+
+            # A second export leaves unchanged files alone and drops removed ones
+            treatment = Treatment.objects.filter(is_active=True).first()
+            treatment.delete()
+            files = self.export(output)
+            self.assertEqual(os.stat(path).st_mtime_ns, mtime)
+            self.assertNotIn(f'api/treatments/{treatment.id}/index.json', files)
+            self.assertFalse(os.path.exists(os.path.join(output, f'api/treatments/{treatment.id}/index.json')))
+
+
+@override_settings(**API_TEST_SETTINGS)
+class ParallelStaticExportTests(TransactionTestCase):
+    """The threaded export path; its worker threads need committed data on their own connections"""
+
+    def setUp(self):
+        cache.clear()
+        seed_catalog(clinics=2, categories=2, treatments_per_category=5, offers_per_clinic=3, blogs=15,
+                     appointments=0)
+
+    def export(self, output, workers):
+        call_command('export_static_api', output=output, workers=workers, stdout=io.StringIO())
+        with open(os.path.join(output, 'manifest.json')) as manifest_file:
+            return {name: file['sha256'] for name, file in json.load(manifest_file)['files'].items()}
+
+    def test_threaded_export_matches_serial_export(self):
+        with tempfile.TemporaryDirectory() as serial, tempfile.TemporaryDirectory() as threaded:
+            expected = self.export(serial, workers=1)
+            self.assertEqual(self.export(threaded, workers=4), expected)
+            self.assertIn('api/clinics/index.json', expected)
+
+
+class CdnCachingTests(ApiTestCase):
+    """Cache-Control / Surrogate-Key headers and surrogate key purges"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clinics, _, _ = seed_catalog(clinics=2, categories=2, treatments_per_category=5,
+                                         offers_per_clinic=3, blogs=5, appointments=0)
+
+    def test_headers_on_snapshot_miss_and_hit(self):
+        clinic = self.clinics[0]
+        for expected in ('miss', 'hit'):
+            response = self.client.get(f'/api/clinics/{clinic.id}/')
+            self.assertEqual(response['X-Snapshot'], expected)
+            self.assertIn('s-maxage=3600', response['Cache-Control'])
+            keys = response['Surrogate-Key'].split()
+            self.assertIn(f'clinic-{clinic.id}', keys)
+            self.assertIn('offer', keys)
+
+    def test_blog_detail_not_cacheable(self):
+        response = self.client.get('/api/blogs/blog-1/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Surrogate-Key'))
+
+    def test_save_purges_instance_and_parent_keys(self):
+        offer = Offer.objects.filter(clinic=self.clinics[0]).first()
+        offer.header = "Updated offer"
+        with self.captureOnCommitCallbacks(execute=True):
+            offer.save()
+        self.assertEqual(cdn.LocalPurgeBackend.purged, [sorted(['offer', f'offer-{offer.id}', f'clinic-{self.clinics[0].id}'])])
+
+    def test_expire_offers_purges_offer_lists(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('expire_offers', stdout=io.StringIO())
+        self.assertEqual(cdn.LocalPurgeBackend.purged, [['offer']])
+
+
+class SlotAvailabilityTests(ApiTestCase):
+    """Per-clinic slot capacity, bookings and the availability API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clinics, _, _ = seed_catalog(clinics=1, categories=1, treatments_per_category=1,
+                                         offers_per_clinic=0, blogs=0, appointments=0)
+        cls.clinic = cls.clinics[0]
+        today = date.today()
+        cls.monday = today + timedelta(days=7 - today.weekday())
+        ClinicSchedule.objects.create(clinic=cls.clinic, weekday=0, opens_at=time(10, 0), closes_at=time(12, 0),
+                                      slot_minutes=30, capacity=2)
+
+    def book(self, preferred_time='10:30', preferred_date=None):
+        # Distinct client addresses keep the write throttle out of these tests
+        self.bookings = getattr(self, 'bookings', 0) + 1
+        return self.client.post('/api/appointments/', {
+            'clinic': self.clinic.id, 'first_name': 'Test', 'last_name': 'Patient',
+            'email': f'patient{self.bookings}@example.com', 'phone': '+919999999999',
+            'preferred_date': (preferred_date or self.monday).isoformat(), 'preferred_time': preferred_time,
+        }, REMOTE_ADDR=f'10.0.0.{self.bookings}')
+
+    def availability(self):
+        response = self.client.get(f'/api/clinics/{self.clinic.id}/availability/',
+                                   {'start': self.monday.isoformat(), 'days': 7})
+        return response.json()['days']
+
+    def test_capacity_prevents_overbooking(self):
+        self.assertEqual(self.availability(), [{'date': self.monday.isoformat(),
+                                                'slots': ['10:00', '10:30', '11:00', '11:30']}])
+        self.assertEqual(self.book().status_code, 201)
+        self.assertEqual(self.book().status_code, 201)
+        response = self.book()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('preferred_time', response.json())
+        self.assertEqual(self.availability()[0]['slots'], ['10:00', '11:00', '11:30'])
+
+        # Cancelling in the admin frees the slot again
+        appointment = Appointment.objects.first()
+        appointment.status = 'cancelled'
+        appointment.save()
+        self.assertEqual(self.availability()[0]['slots'], ['10:00', '10:30', '11:00', '11:30'])
+
+    def test_rejects_times_outside_slots_and_closed_days(self):
+        self.assertEqual(self.book('10:15').status_code, 400)
+        self.assertEqual(self.book('12:00').status_code, 400)
+        self.assertEqual(self.book(preferred_date=self.monday + timedelta(days=1)).status_code, 400)
+        self.assertFalse(Appointment.objects.exists())
+
+    def test_cancelling_filtered_appointments_frees_their_slots(self):
+        self.assertEqual(self.book().status_code, 201)
+        self.assertEqual(self.book().status_code, 201)
+        self.assertNotIn('10:30', self.availability()[0]['slots'])
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.post('/admin/api/appointment/?status__exact=pending', {
+            'action': 'mark_cancelled', '_selected_action': list(Appointment.objects.values_list('pk', flat=True)),
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Appointment.objects.exclude(status='cancelled').exists())
+        self.assertIn('10:30', self.availability()[0]['slots'])
+
+    def test_inactive_schedules_close_the_clinic(self):
+        ClinicSchedule.objects.filter(clinic=self.clinic).update(is_active=False)
+        response = self.book()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('preferred_date', response.json())
+        self.assertEqual(self.availability(), [])
+
+    def test_capacity_must_be_positive(self):
+        schedule = ClinicSchedule(clinic=self.clinic, weekday=1, opens_at=time(10, 0), closes_at=time(12, 0),
+                                  capacity=0)
+        with self.assertRaises(ValidationError):
+            schedule.full_clean()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            schedule.save()
+
+    def test_availability_queries_independent_of_bookings(self):
+        Appointment.objects.bulk_create([
+            Appointment(clinic=self.clinic, first_name="Test", last_name=f"Patient {i}",
+                        email=f"patient{i}@example.com", phone="+919999999999",
+                        preferred_date=self.monday + timedelta(days=7 * (i % 4)), preferred_time=time(11, 0))
+            for i in range(2000)
+        ])
+        for week in range(4):
+            availability.recount(self.clinic.id, self.monday + timedelta(days=7 * week))
+
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/clinics/{self.clinic.id}/availability/',
+                                       {'start': self.monday.isoformat(), 'days': 30})
+        days = response.json()['days']
+        self.assertEqual(len(days), 5)
+        self.assertTrue(all(day['slots'] == ['10:00', '10:30', '11:30'] for day in days[:4]))
+
+
+class ThrottleTests(ApiTestCase):
+    """Token-bucket throttling of the public POST endpoints"""
+
+    def contact(self, message='Hello', ip='10.0.0.1'):
+        return self.client.post('/api/contact/', {
+            'name': 'Visitor', 'email': 'visitor@example.com', 'subject': 'Question', 'message': message,
+        }, REMOTE_ADDR=ip)
+
+    @override_settings(API_THROTTLE_RATES={'contact': {'burst': '2/min', 'sustained': '20/day'}})
+    def test_burst_rejected_before_database_work(self):
+        self.assertEqual(self.contact('First').status_code, 201)
+        self.assertEqual(self.contact('Second').status_code, 201)
+        with self.assertNumQueries(0):
+            response = self.contact('Third')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        # Other clients have their own buckets
+        self.assertEqual(self.contact('Fourth', ip='10.0.0.2').status_code, 201)
+        self.assertEqual(ContactMessage.objects.count(), 3)
+        self.assertEqual(list(throttling.rejection_counts(1).values()), [1])
+
+    @override_settings(API_THROTTLE_RATES={'contact': {'burst': '10/min', 'fingerprint': '1/hour'}})
+    def test_duplicate_payload_rejected_across_ips(self):
+        self.assertEqual(self.contact(ip='10.0.0.1').status_code, 201)
+        self.assertEqual(self.contact(ip='10.0.0.2').status_code, 429)
+        self.assertEqual(self.contact('Something else', ip='10.0.0.2').status_code, 201)
+
+    @override_settings(API_THROTTLE_RATES={
+        'contact': {'fingerprint': '1/hour'}, 'appointments': {'fingerprint': '1/hour'},
+    })
+    def test_non_object_payload_skips_fingerprint(self):
+        for path in ['/api/contact/', '/api/appointments/']:
+            response = self.client.post(path, '[{"name": "Visitor"}]', content_type='application/json')
+            self.assertEqual(response.status_code, 400, msg=path)
+
+    @override_settings(API_THROTTLE_RATES={'contact': {'burst': '5/min', 'sustained': '20/day'}})
+    def test_concurrent_burst_spends_one_token_each(self):
+        view = ContactMessageCreateAPIView()
+        start = threading.Barrier(20)
+
+        def attempt(_):
+            request = Request(RequestFactory().post('/api/contact/', REMOTE_ADDR='10.0.0.9'))
+            start.wait()
+            return throttling.TokenBucketThrottle().allow_request(request, view)
+
+        def slow_get(*args, **kwargs):
+            # Widen any read-then-write gap so a racy bucket would let the whole burst through
+            threading.Event().wait(0.01)
+            return cache.get(*args, **kwargs)
+
+        with mock.patch('api.throttling.cache', mock.Mock(wraps=cache, get=mock.Mock(side_effect=slow_get))):
+            with ThreadPoolExecutor(max_workers=20) as executor:
+                allowed = list(executor.map(attempt, range(20)))
+        self.assertEqual(allowed.count(True), 5)
+        # Rejected attempts gave back what they took from the daily bucket
+        throttle = throttling.TokenBucketThrottle()
+        throttle.scope = 'contact'
+        key = throttle.get_cache_key(Request(RequestFactory().post('/', REMOTE_ADDR='10.0.0.9')), view, 'sustained')
+        self.assertEqual(cache.get(f"{key}:{int(timezone.now().timestamp() // 86400)}"), 5)
+
+    def test_reads_not_throttled(self):
+        with override_settings(API_THROTTLE_RATES={'blog_create': {'burst': '1/day'}}):
+            for _ in range(3):
+                self.assertEqual(self.client.get('/api/blogs/').status_code, 200)
+
+
+class BulkAppointmentTests(ApiTestCase):
+    """Batch appointment ingestion for call center staff"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clinics, _, _ = seed_catalog(clinics=2, categories=1, treatments_per_category=1,
+                                         offers_per_clinic=0, blogs=0, appointments=0)
+        today = date.today()
+        cls.monday = today + timedelta(days=7 - today.weekday())
+        ClinicSchedule.objects.create(clinic=cls.clinics[1], weekday=0, opens_at=time(10, 0), closes_at=time(11, 0),
+                                      capacity=1)
+        cls.staff = User.objects.create_user('callcenter', password='password', is_staff=True)
+
+    def row(self, i, clinic=None, preferred_time='10:00'):
+        return {
+            'clinic': (clinic or self.clinics[0]).id, 'first_name': 'Caller', 'last_name': f'{i}',
+            'email': f'caller{i}@example.com', 'phone': '+919999999999',
+            'preferred_date': self.monday.isoformat(), 'preferred_time': preferred_time,
+        }
+
+    def post(self, rows):
+        return self.client.post('/api/appointments/bulk/', rows, content_type='application/json')
+
+    def test_requires_staff(self):
+        self.assertEqual(self.post([self.row(0)]).status_code, 403)
+
+    def test_batch_inserted_with_constant_queries(self):
+        self.client.force_login(self.staff)
+        rows = [self.row(i) for i in range(200)]
+        with mock.patch('api.notifications.send_owner_email') as send_owner_email:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post(rows)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 200)
+        self.assertLess(len(queries), 15)
+        self.assertEqual(Appointment.objects.count(), 200)
+        # One summary notification for the whole batch
+        send_owner_email.assert_called_once()
+        self.assertIn('200', send_owner_email.call_args.args[0])
+
+    def test_partial_failures_reported_per_row(self):
+        self.client.force_login(self.staff)
+        rows = [
+            self.row(0),
+            dict(self.row(1), email='not-an-email'),
+            self.row(2, clinic=self.clinics[1]),
+            self.row(3, clinic=self.clinics[1]),  # same single-capacity slot
+            dict(self.row(4), clinic=999999),
+        ]
+        response = self.post(rows)
+        self.assertEqual(response.status_code, 207)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results],
+                         ['created', 'error', 'created', 'error', 'error'])
+        self.assertIn('email', results[1]['errors'])
+        self.assertIn('preferred_time', results[3]['errors'])
+        self.assertIn('clinic', results[4]['errors'])
+        self.assertEqual(ClinicDaySlots.objects.get(clinic=self.clinics[1]).booked_counts, {'20': 1})
+
+
+class ExportTests(ApiTestCase):
+    """Streaming CSV/XLSX exports"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clinics, _, _ = seed_catalog(clinics=2, categories=1, treatments_per_category=1,
+                                         offers_per_clinic=0, blogs=0, appointments=50)
+        cls.staff = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def test_csv_export_streams_every_row(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/api/exports/appointments.csv', {'status': 'pending'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="appointments-', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual(rows[0][:3], ['ID', 'Clinic', 'First Name'])
+        self.assertEqual(len(rows) - 1, Appointment.objects.filter(status='pending').count())
+        self.assertIn(rows[1][1], [clinic.name for clinic in self.clinics])
+
+    def test_xlsx_export(self):
+        self.client.force_login(self.staff)
+        ContactMessage.objects.create(name="Visitor", email="visitor@example.com", subject="Hi", message="Hello")
+        response = self.client.get('/api/exports/contact-messages.xlsx')
+        self.assertEqual(response.status_code, 200)
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(rows[0][1], 'Name')
+        self.assertEqual(rows[1][1], 'Visitor')
+
+    def test_formula_like_text_neutralized(self):
+        self.client.force_login(self.staff)
+        ContactMessage.objects.all().delete()
+        ContactMessage.objects.create(name='=HYPERLINK("http://evil.example","x")', email="visitor@example.com",
+                                      subject="@SUM(A1)", message="-2+3")
+        response = self.client.get('/api/exports/contact-messages.csv')
+        row = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))[1]
+        self.assertEqual(row[1], '\'=HYPERLINK("http://evil.example","x")')
+        self.assertEqual(row[3:5], ["'@SUM(A1)", "'-2+3"])
+
+        # XLSX keeps the text as is, in string cells that are never evaluated
+        response = self.client.get('/api/exports/contact-messages.xlsx')
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        row = workbook.active[2]
+        self.assertEqual([cell.data_type for cell in row[1:5]], ['s'] * 4)
+        self.assertEqual([row[1].value, row[3].value, row[4].value],
+                         ['=HYPERLINK("http://evil.example","x")', "@SUM(A1)", "-2+3"])
+
+        # Signed numbers such as international phone numbers are left alone
+        Appointment.objects.update(phone="+919999999999")
+        response = self.client.get('/api/exports/appointments.csv')
+        row = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))[1]
+        self.assertEqual(row[5], "+919999999999")
+        response = self.client.get('/api/exports/appointments.xlsx')
+        self.assertEqual(load_workbook(io.BytesIO(b''.join(response.streaming_content))).active['F2'].value,
+                         "+919999999999")
+
+    def test_admin_action_and_permissions(self):
+        self.assertEqual(self.client.get('/api/exports/appointments.csv').status_code, 403)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get('/api/exports/users.csv').status_code, 404)
+        selected = list(Appointment.objects.values_list('pk', flat=True)[:5])
+        response = self.client.post('/admin/api/appointment/', {
+            'action': 'export_csv', '_selected_action': selected,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(b''.join(response.streaming_content).decode('utf-8-sig').splitlines()), 6)
+
+
+class PricingImportTests(ApiTestCase):
+    """Spreadsheet import of treatment clinic pricing through the admin"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clinics, _, cls.treatments = seed_catalog(clinics=2, categories=2, treatments_per_category=30,
+                                                      offers_per_clinic=0, blogs=0, appointments=0)
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.new_clinic = Clinic.objects.create(
+            name="New Clinic", specialization="Skin", description="Clinic description", address="Address",
+            city="Delhi", phone="0000000000", email="new@example.com", main_image="clinics/main/clinic.jpg",
+            google_maps_url="https://maps.example.com",
+        )
+
+    def sheet(self, rows, name='pricing.csv'):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(['Treatment', 'Clinic', 'Price', 'Is Active'])
+        writer.writerows(rows)
+        return SimpleUploadedFile(name, output.getvalue().encode('utf-8'))
+
+    def test_preview_then_apply(self):
+        self.client.force_login(self.admin)
+        url = '/admin/api/treatmentclinicpricing/import/'
+        rows = [[treatment.name, self.new_clinic.name, '₹2,000', 'yes'] for treatment in self.treatments]
+        rows += [[self.treatments[0].name, f'#{self.clinics[0].id}', '₹999', '']]
+        response = self.client.post(url, {'file': self.sheet(rows)})
+        plan = response.context['plan']
+        self.assertEqual((len(plan.to_create), len(plan.to_update), plan.errors), (60, 1, []))
+        # Dry run: nothing written yet
+        self.assertFalse(TreatmentClinicPricing.objects.filter(clinic=self.new_clinic).exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(url, {'apply': '1', 'token': response.context['token']})
+        self.assertRedirects(response, '/admin/api/treatmentclinicpricing/', fetch_redirect_response=False)
+        self.assertLess(len(queries), 20)
+        self.assertEqual(TreatmentClinicPricing.objects.filter(clinic=self.new_clinic, price='₹2,000').count(), 60)
+        self.assertEqual(TreatmentClinicPricing.objects.get(treatment=self.treatments[0], clinic=self.clinics[0]).price, '₹999')
+        self.assertIn('treatmentclinicpricing', cdn.LocalPurgeBackend.purged[0])
+
+    def test_errors_block_apply(self):
+        self.client.force_login(self.admin)
+        rows = [['No Such Treatment', self.clinics[0].name, '$1', ''],
+                [self.treatments[0].name, self.clinics[0].name, '$1', 'maybe']]
+        response = self.client.post('/admin/api/treatmentclinicpricing/import/', {'file': self.sheet(rows)})
+        self.assertEqual([line for line, _ in response.context['plan'].errors], [2, 3])
+        self.assertNotContains(response, 'Apply changes')
+
+        sheet = SimpleUploadedFile('pricing.csv', (
+            f'Treatment,Clinic,Price,Order\n{self.treatments[0].name},{self.clinics[0].name},$1,-1\n'
+            f'{self.treatments[1].name},{self.clinics[0].name},$1,first\n'
+        ).encode('utf-8'))
+        response = self.client.post('/admin/api/treatmentclinicpricing/import/', {'file': sheet})
+        self.assertEqual(response.context['plan'].errors, [
+            (2, "Order must be between 0 and 2147483647"), (3, "Order 'first' is not a whole number"),
+        ])
+
+    def test_ambiguous_names_and_ids_kept_apart(self):
+        self.client.force_login(self.admin)
+        twin = Treatment.objects.create(category=self.treatments[0].category, name=self.treatments[0].name,
+                                        duration="60 minutes", description="Treatment description")
+        numeric = Treatment.objects.create(category=self.treatments[0].category, name=str(twin.id + 1000),
+                                           duration="60 minutes", description="Treatment description")
+        rows = [[twin.name, self.clinics[0].name, '$1', ''],
+                [f'#{twin.id}', self.clinics[0].name, '$2', ''],
+                [numeric.name, self.clinics[0].name, '$3', ''],
+                [str(twin.id), self.clinics[0].name, '$4', '']]
+        plan = self.client.post('/admin/api/treatmentclinicpricing/import/', {'file': self.sheet(rows)}).context['plan']
+        self.assertEqual(plan.errors, [
+            (2, f"Ambiguous treatment '{twin.name}': use one of #{self.treatments[0].id}, #{twin.id}"),
+            (5, f"Unknown treatment '{twin.id}'"),
+        ])
+        self.assertEqual([pricing.treatment for pricing in plan.to_create], [twin, numeric])
+
+    def test_rejects_unknown_format(self):
+        self.client.force_login(self.admin)
+        self.assertContains(self.client.get('/admin/api/treatmentclinicpricing/'), 'Import spreadsheet')
+        response = self.client.post('/admin/api/treatmentclinicpricing/import/',
+                                    {'file': self.sheet([], name='pricing.txt')})
+        self.assertContains(response, 'Upload a .csv or .xlsx file.')
+        sheet = SimpleUploadedFile('pricing.csv', 'Treatment,Clinic,Price\nPeel,Clinic,£50\n'.encode('cp1252'))
+        response = self.client.post('/admin/api/treatmentclinicpricing/import/', {'file': sheet})
+        self.assertContains(response, 'The file is not UTF-8 encoded CSV.')
+
+
+@override_settings(NOTIFICATION_MODE='digest', NOTIFICATION_URGENT_KEYWORDS=['urgent'])
+class NotificationDigestTests(ApiTestCase):
+    """Digest mode for owner notifications"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clinics, _, _ = seed_catalog(clinics=2, categories=1, treatments_per_category=1,
+                                         offers_per_clinic=0, blogs=0, appointments=0)
+
+    def book(self, i, clinic, message='', days_ahead=10):
+        return self.client.post('/api/appointments/', {
+            'clinic': clinic.id, 'first_name': 'Test', 'last_name': f'Patient {i}',
+            'email': f'patient{i}@example.com', 'phone': '+919999999999', 'message': message,
+            'preferred_date': (date.today() + timedelta(days=days_ahead)).isoformat(), 'preferred_time': '10:00',
+        }, REMOTE_ADDR=f'10.0.1.{i}')
+
+    def test_items_held_for_digest_unless_urgent(self):
+        def sent(subject, message, on_sent=None):
+            on_sent()
+
+        with mock.patch('api.notifications.send_owner_email', side_effect=sent) as send_owner_email:
+            self.assertEqual(self.book(1, self.clinics[0]).status_code, 201)
+            self.assertEqual(self.book(2, self.clinics[1]).status_code, 201)
+            self.client.post('/api/contact/', {'name': 'Visitor', 'email': 'visitor@example.com',
+                                               'subject': 'Question', 'message': 'Hello'})
+            self.assertEqual(send_owner_email.call_count, 0)
+
+            self.book(3, self.clinics[0], message='Urgent - allergic reaction')
+            self.book(4, self.clinics[0], days_ahead=0)
+            self.assertEqual(send_owner_email.call_count, 2)
+            self.assertTrue(send_owner_email.call_args_list[0].args[0].startswith('URGENT: '))
+
+        self.assertEqual(notifications.send_digest(per_clinic=False), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('2 new appointment(s), 1 new message(s)', mail.outbox[0].subject)
+        self.assertFalse(Appointment.objects.filter(notified_at__isnull=True).exists())
+        # Nothing pending, nothing sent
+        self.assertEqual(notifications.send_digest(), 0)
+
+    def test_digest_per_clinic(self):
+        with mock.patch('api.notifications.send_owner_email'):
+            for i in range(3):
+                self.book(i, self.clinics[i % 2])
+        call_command('send_notification_digest', per_clinic=True, stdout=io.StringIO())
+        self.assertEqual(sorted(email.subject.split(':')[0] for email in mail.outbox),
+                         [self.clinics[0].name, self.clinics[1].name])
+
+    @override_settings(NOTIFICATION_MODE='immediate')
+    def test_failed_immediate_send_left_for_digest(self):
+        with mock.patch('api.notifications.send_owner_email'):
+            self.book(1, self.clinics[0])
+        appointment = Appointment.objects.get()
+        with mock.patch('api.notifications.send_mail', side_effect=OSError("SMTP down")):
+            notifications.appointment_created(appointment).join()
+        appointment.refresh_from_db()
+        self.assertIsNone(appointment.notified_at)
+
+        self.assertEqual(notifications.send_digest(), 1)
+        appointment.refresh_from_db()
+        self.assertIsNotNone(appointment.notified_at)
+
+
+class DatabaseInvariantTests(ApiTestCase):
+    """Singleton and active-cap rules enforced by the database"""
+
+    def create_benefits(self, count, is_active=True):
+        return [WhyChooseUs.objects.create(title=f"Benefit {i}", description="Why", is_active=is_active)
+                for i in range(count)]
+
+    def test_why_choose_us_active_cap(self):
+        self.create_benefits(4)
+        with self.assertRaisesMessage(ValidationError, "Only 4 'Why Choose Us' benefits"):
+            WhyChooseUs.objects.create(title="Fifth", description="Why")
+        spare = WhyChooseUs.objects.create(title="Spare", description="Why", is_active=False)
+        # update() cannot bypass the rule either
+        with self.assertRaises(ValidationError):
+            WhyChooseUs.objects.filter(pk=spare.pk).update(is_active=True)
+        self.assertEqual(WhyChooseUs.objects.filter(is_active=True).count(), 4)
+
+    def test_bulk_update_can_swap_active_benefits(self):
+        active = self.create_benefits(4)
+        spare = WhyChooseUs.objects.create(title="Spare", description="Why", is_active=False)
+        spare.is_active, active[0].is_active = True, False
+        # The activation comes first, which is only valid once the whole batch is applied
+        WhyChooseUs.objects.bulk_update([spare, active[0]], ['is_active'], batch_size=1)
+        self.assertTrue(WhyChooseUs.objects.get(pk=spare.pk).is_active)
+
+        spare.refresh_from_db()
+        active[0].is_active = True
+        with self.assertRaises(ValidationError):
+            WhyChooseUs.objects.bulk_update([active[0]], ['is_active'])
+
+    def test_admin_rejects_cap_before_saving(self):
+        active = self.create_benefits(4)
+        spare = WhyChooseUs.objects.create(title="Spare", description="Why", is_active=False)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+        response = self.client.post('/admin/api/whychooseus/add/', {
+            'title': "Fifth", 'description': "Why", 'icon': 'clock', 'order': 0, 'is_active': 'on',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Only 4 &#x27;Why Choose Us&#x27; benefits")
+        self.assertFalse(WhyChooseUs.objects.filter(title="Fifth").exists())
+
+        def changelist(activate):
+            data = {'form-TOTAL_FORMS': 5, 'form-INITIAL_FORMS': 5, '_save': 'Save'}
+            for i, benefit in enumerate([*active, spare]):
+                data.update({f'form-{i}-id': benefit.pk, f'form-{i}-order': 0})
+                if benefit in activate:
+                    data[f'form-{i}-is_active'] = 'on'
+            return self.client.post('/admin/api/whychooseus/', data)
+
+        response = changelist(activate=[*active, spare])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Only 4 &#x27;Why Choose Us&#x27; benefits")
+        self.assertNotContains(response, "changed successfully")
+        self.assertFalse(WhyChooseUs.objects.get(pk=spare.pk).is_active)
+
+        # Swapping a benefit in one save is allowed
+        response = changelist(activate=[*active[1:], spare])
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(WhyChooseUs.objects.get(pk=spare.pk).is_active)
+        self.assertFalse(WhyChooseUs.objects.get(pk=active[0].pk).is_active)
+
+    def test_site_settings_singleton(self):
+        SiteSettings.objects.create()
+        with self.assertRaisesMessage(ValidationError, 'Only one SiteSettings instance is allowed'):
+            SiteSettings.objects.create(site_name="Second")
+        self.assertEqual(SiteSettings.objects.count(), 1)
+
+
+class SiteSettingsCacheTests(ApiTestCase):
+    """Process-level site settings served without queries"""
+
+    def test_defaults_without_settings_row(self):
+        response = self.client.get('/api/site-settings/')
+        self.assertEqual(response.json()['site_tagline'], 'Skin Clinic')
+        self.assertEqual(response.json()['primary_email'], 'info@monalisaclinic.com')
+        self.assertIsNone(site_settings.get().pk)
+
+    def test_served_without_queries_and_reloaded_after_save(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            settings_row = SiteSettings.objects.create(site_name="Monalisa", site_tagline="Clinic")
+        self.client.get('/api/site-settings/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/site-settings/')
+        self.assertEqual(response.json()['site_tagline'], 'Clinic')
+        self.assertIn('sitesettings', response['Surrogate-Key'])
+
+        settings_row.site_tagline = "Skin & Laser Clinic"
+        with self.captureOnCommitCallbacks(execute=True):
+            settings_row.save()
+        self.assertEqual(self.client.get('/api/site-settings/').json()['site_tagline'], 'Skin & Laser Clinic')
+
+
+@override_settings(API_SNAPSHOTS_ENABLED=False)
+class CatalogTests(ApiTestCase):
+    """Treatment endpoints answered from the in-memory catalog"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clinics, cls.categories, cls.treatments = seed_catalog(
+            clinics=2, categories=2, treatments_per_category=5, offers_per_clinic=0, blogs=0, appointments=0,
+        )
+
+    def test_endpoints_run_no_queries(self):
+        catalog.current()
+        treatment = Treatment.objects.filter(is_active=True).first()
+        urls = [
+            '/api/treatments/', '/api/treatments/?isLanding=true',
+            f'/api/treatments/?clinic_id={self.clinics[0].id}', '/api/treatments/categories/',
+            '/api/treatments/categories/nav/', f'/api/treatments/{treatment.id}/',
+            f'/api/clinics/{self.clinics[0].id}/treatments/',
+        ]
+        for url in urls:
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_indexes_match_the_database(self):
+        current = catalog.current()
+        clinic = self.clinics[0]
+        expected = list(
+            Treatment.objects.filter(
+                clinic_pricing__clinic=clinic, clinic_pricing__is_active=True, is_active=True,
+            ).order_by('order', 'name').values_list('id', flat=True)
+        )
+        self.assertEqual([treatment.id for treatment in current.clinic_treatments(clinic.id)], expected)
+        category = self.categories[0]
+        self.assertEqual(
+            [treatment.id for treatment in current.category_treatments(category.id)],
+            list(category.items.filter(is_active=True).order_by('order', 'id').values_list('id', flat=True)),
+        )
+        self.assertEqual(current.clinic_treatments('not-a-number'), ())
+
+    def test_rebuilt_after_content_change(self):
+        current = catalog.current()
+        self.assertIs(catalog.current(), current)
+        treatment = Treatment.objects.filter(is_active=True).first()
+        treatment.name = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            treatment.save()
+        self.assertIsNot(catalog.current(), current)
+        self.assertEqual(self.client.get(f'/api/treatments/{treatment.id}/').json()['name'], "Renamed")
+
+
+@override_settings(API_SNAPSHOTS_ENABLED=False)
+class SparseFieldsetTests(ApiTestCase):
+    """?fields= / ?exclude= on list endpoints"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clinics, _, _ = seed_catalog(clinics=1, categories=1, treatments_per_category=3,
+                                         offers_per_clinic=2, blogs=3, appointments=0)
+        Testimonial.objects.create(screenshot="testimonials/review.jpg", reviewer_name="Asha",
+                                   review_text="Great results " * 50, rating=5)
+
+    def test_fields_and_exclude(self):
+        data = self.client.get('/api/testimonials/?fields=id,reviewer_name,rating').json()
+        self.assertEqual(set(data['results'][0]), {'id', 'reviewer_name', 'rating'})
+        data = self.client.get('/api/treatments/?exclude=description,clinic_pricing').json()
+        self.assertNotIn('description', data[0]['items'][0])
+        self.assertNotIn('clinic_pricing', data[0]['items'][0])
+        self.assertIn('name', data[0]['items'][0])
+
+    def test_dropped_columns_are_deferred(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/testimonials/?exclude=review_text')
+        self.assertFalse(any('review_text' in query['sql'] for query in queries.captured_queries))
+
+        serializer = OfferSerializer(fields={'id', 'header', 'is_valid'})
+        self.assertNotIn('valid_until', serializer.deferrable_columns())
+        self.assertIn('description', serializer.deferrable_columns())
+
+
+class CompressionTests(ApiTestCase):
+    """gzip/brotli negotiation and precompressed snapshot bodies"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_catalog(clinics=2, categories=2, treatments_per_category=10, offers_per_clinic=0, blogs=0, appointments=0)
+
+    def test_snapshot_hit_sends_stored_gzip(self):
+        plain = self.client.get('/api/treatments/')
+        response = self.client.get('/api/treatments/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['X-Snapshot'], 'hit')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+        target = snapshots.SnapshotTarget('/api/treatments/', host='testserver', scheme='http')
+        _, _, encoded = snapshots.get_fresh(target)
+        self.assertEqual(response.content, encoded['gzip'])
+
+    def test_negotiation(self):
+        response = self.client.get('/api/treatments/', HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='*;q=0.5')
+        self.assertEqual(compression.negotiate(request, {'gzip': b''}), 'gzip')
+
+    @override_settings(API_SNAPSHOTS_ENABLED=False)
+    def test_live_responses_compressed_above_threshold(self):
+        response = self.client.get('/api/treatments/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        small = self.client.get('/api/health/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(small.has_header('Content-Encoding'))
+
+
+class WarmupTests(ApiTestCase):
+    """Worker warm-up before taking traffic"""
+
+    def test_warm_up_loads_hot_responses(self):
+        seed_catalog(clinics=1, categories=1, treatments_per_category=2, offers_per_clinic=0, blogs=0, appointments=0)
+        self.client.get('/api/treatments/')
+        # Rows for other hosts (stored before snapshots were limited to the canonical one) are not warmed
+        snapshots.store(snapshots.SnapshotTarget('/api/clinics/', host='attacker.example.com'), b'[]')
+        cache.clear()
+
+        timings = warmup.warm_up()
+        targets = warmup.hot_targets()
+        self.assertEqual(timings['targets'], len(targets))
+        self.assertEqual({(target.scheme, target.host) for target in targets}, {('http', 'testserver')})
+        self.assertIn('catalog', timings)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/treatments/')
+        self.assertEqual(response['X-Snapshot'], 'hit')
+
+
+class ApiProfileTests(ApiTestCase):
+    """The slim middleware and URL stack of monalisa_backend.settings_api"""
+
+    def test_public_api_without_sessions(self):
+        from monalisa_backend import settings_api
+
+        with self.settings(MIDDLEWARE=settings_api.MIDDLEWARE, ROOT_URLCONF=settings_api.ROOT_URLCONF,
+                           REST_FRAMEWORK=settings_api.REST_FRAMEWORK):
+            self.assertEqual(self.client.get('/api/site-settings/').status_code, 200)
+            response = self.client.post('/api/contact/', {
+                'name': 'Asha', 'email': 'asha@example.com', 'subject': 'Question', 'message': 'Hello',
+            })
+            self.assertEqual(response.status_code, 201)
+            self.assertFalse(response.cookies)
+            self.assertEqual(self.client.get('/admin/').status_code, 404)
+            self.assertEqual(self.client.get('/api/exports/appointments.csv').status_code, 403)
+
+
+class SearchTests(ApiTestCase):
+    """Site search over the denormalized search table"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = TreatmentCategory.objects.create(title="Facials", description="Facial treatments")
+        cls.facial = Treatment.objects.create(
+            category=cls.category, name="HydraFacial", duration="60 minutes",
+            description="Deep cleansing that hydrates dry skin", is_featured=True,
+        )
+        cls.peel = Treatment.objects.create(
+            category=cls.category, name="Chemical Peel", duration="45 minutes",
+            description="Resurfacing for acne scars and hydration",
+        )
+        cls.blog = Blog.objects.create(title="Living with acne", slug="living-with-acne",
+                                       content="How to manage breakouts", tags="acne, skincare")
+        cls.faq = LandingFAQ.objects.create(question="Is a chemical peel painful?", answer="Mostly a mild tingling.")
+
+    def search(self, query):
+        response = self.client.get('/api/search/', query)
+        self.assertEqual(response.status_code, 200)
+        return [(result['type'], result['id']) for result in response.json()['results']]
+
+    def test_ranked_typed_results(self):
+        response = self.client.get('/api/search/', {'q': 'acne'})
+        data = response.json()
+        self.assertEqual(data['query'], 'acne')
+        # A title match outranks a body match
+        self.assertEqual([(result['type'], result['id']) for result in data['results']],
+                         [('blog', self.blog.id), ('treatment', self.peel.id)])
+        self.assertEqual(data['results'][0]['slug'], 'living-with-acne')
+        self.assertIn('blog', response['Surrogate-Key'].split())
+        # Stemming matches "hydration" and "hydrates"; the featured treatment is boosted
+        self.assertEqual(self.search({'q': 'hydrate'}), [('treatment', self.facial.id), ('treatment', self.peel.id)])
+        self.assertEqual(self.search({'q': '"chemical peel"', 'type': 'landing_faq'}), [('landing_faq', self.faq.id)])
+        self.assertEqual(self.search({'q': 'acne -breakouts', 'type': 'blog,treatment'}), [('treatment', self.peel.id)])
+        self.assertEqual(self.search({'q': ' '}), [])
+        self.assertEqual(self.client.get('/api/search/', {'q': 'acne', 'type': 'clinic'}).status_code, 400)
+
+    def test_entries_follow_content_changes(self):
+        self.peel.is_active = False
+        self.peel.save()
+        self.assertEqual(self.search({'q': 'peel', 'type': 'treatment'}), [])
+        self.category.title = "Glow"
+        self.category.save()
+        self.assertEqual(self.search({'q': 'glow'}), [('treatment', self.facial.id)])
+
+        Blog.objects.filter(pk=self.blog.pk).update(is_published=False)
+        content_bulk_updated(Blog, [self.blog.pk])
+        self.assertEqual(self.search({'q': 'breakouts'}), [])
+        self.faq.delete()
+        self.assertFalse(SearchEntry.objects.filter(kind='landing_faq').exists())
+
+    def test_rebuild_command(self):
+        SearchEntry.objects.all().delete()
+        Treatment.objects.filter(pk=self.peel.pk).update(name="Glycolic Peel")
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(SearchEntry.objects.count(), 4)
+        self.assertEqual(self.search({'q': 'glycolic'}), [('treatment', self.peel.id)])
+
+
+class SuggestTests(ApiTestCase):
+    """Typeahead answered from the in-process prefix index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = TreatmentCategory.objects.create(title="Peels", description="Peels", order=2)
+        cls.peel = Treatment.objects.create(category=cls.category, name="Chemical Peel", duration="45 minutes",
+                                            description="Peel", order=1)
+        cls.featured = Treatment.objects.create(category=cls.category, name="Pearl Peel", duration="30 minutes",
+                                                description="Peel", order=5, is_featured=True)
+        Treatment.objects.create(category=cls.category, name="Peel Retired", duration="30 minutes",
+                                 description="Peel", is_active=False)
+        cls.concern = SkinConcern.objects.create(title="Pigmentation", description="Dark spots", icon="icon.png",
+                                                 treatments="Peels", products="Serums", results="Even tone")
+
+    def suggest(self, query, **params):
+        response = self.client.get('/api/suggest/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(result['type'], result['label']) for result in response.json()['results']]
+
+    def test_prefix_lookup_and_ranking(self):
+        suggest.current()
+        with self.assertNumQueries(0):
+            results = self.suggest('pe')
+        # Featured first, then by order; word starts match ("Chemical Peel")
+        self.assertEqual(results, [('treatment', 'Pearl Peel'), ('treatment', 'Chemical Peel'), ('category', 'Peels')])
+        self.assertEqual(self.suggest('PIGMENT'), [('skin_concern', 'Pigmentation')])
+        self.assertEqual(self.suggest('chemical  pe'), [('treatment', 'Chemical Peel')])
+        self.assertEqual(self.suggest('pe', type='category'), [('category', 'Peels')])
+        self.assertEqual(self.suggest('pe', limit=1), [('treatment', 'Pearl Peel')])
+        self.assertEqual(self.suggest(''), [])
+        self.assertEqual(self.client.get('/api/suggest/', {'q': 'pe', 'type': 'blog'}).status_code, 400)
+
+    def test_short_prefix_ranks_every_match(self):
+        Treatment.objects.bulk_create([
+            Treatment(category=self.category, name=f"Peel {i:03d}", duration="30 minutes", description="Peel",
+                      order=10)
+            for i in range(300)
+        ])
+        zeta = Treatment.objects.create(category=self.category, name="Pezzo Facial", duration="30 minutes",
+                                        description="Peel", order=20, is_featured=True)
+        suggest.current()
+        # Found past 300 alphabetically earlier keys
+        self.assertEqual(self.suggest('pe', limit=2), [('treatment', 'Pearl Peel'), ('treatment', zeta.name)])
+        self.assertEqual(self.suggest('pe', type='category'), [('category', 'Peels')])
+        self.assertEqual(self.suggest('p', type='skin_concern'), [('skin_concern', 'Pigmentation')])
+
+    def test_rebuilt_after_content_change(self):
+        index = suggest.current()
+        with self.captureOnCommitCallbacks(execute=True):
+            Clinic.objects.create(
+                name="Péel Street Clinic", specialization="Skin", description="Clinic", address="Address",
+                city="Delhi", phone="0000000000", email="clinic@example.com", main_image="clinics/main/clinic.jpg",
+                google_maps_url="https://maps.example.com",
+            )
+        self.assertIsNot(suggest.current(), index)
+        self.assertIn(('clinic', "Péel Street Clinic"), self.suggest('peel s'))
+
+
+class RelatedContentTests(ApiTestCase):
+    """TF-IDF related content, precomputed for detail pages"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = TreatmentCategory.objects.create(title="Acne", description="Acne care")
+        cls.peel = Treatment.objects.create(category=category, name="Salicylic Peel", duration="30 minutes",
+                                            description="Salicylic acid peel that clears acne breakouts and oily pores")
+        cls.laser = Treatment.objects.create(category=category, name="Laser Hair Removal", duration="60 minutes",
+                                             description="Permanent laser reduction of unwanted hair")
+        cls.blog = Blog.objects.create(title="Clearing acne breakouts", slug="clearing-acne",
+                                       content="Salicylic peels unclog oily pores and calm breakouts.")
+        cls.concern = SkinConcern.objects.create(
+            title="Unwanted hair", description="Removing unwanted hair for good", icon="icon.png",
+            treatments="Laser hair removal", products="Soothing gel", results="Smooth skin",
+        )
+
+    def test_nearest_neighbours(self):
+        matrix = related.tfidf(["acne peel pores", "acne pores breakouts", "laser hair", "hair laser removal"])
+        indexes, scores = related.nearest_neighbours(matrix, 2)
+        self.assertEqual(list(indexes[:, 0]), [1, 0, 3, 2])
+        self.assertAlmostEqual(float(scores[0, 1]), 0.0)
+        self.assertEqual(related.nearest_neighbours(matrix[:1], 3)[0].shape, (1, 0))
+
+    def test_detail_pages_list_related_content(self):
+        call_command('build_related_content', stdout=io.StringIO())
+        with self.assertNumQueries(1):
+            items = related.for_source('blog', self.blog.id)
+        self.assertEqual(items[0]['type'], 'treatment')
+        self.assertEqual(items[0]['id'], self.peel.id)
+
+        data = self.client.get(f'/api/treatments/{self.laser.id}/').json()
+        self.assertEqual((data['related'][0]['type'], data['related'][0]['id']), ('skin_concern', self.concern.id))
+        data = self.client.get('/api/blogs/clearing-acne/').json()
+        self.assertEqual(data['related'][0]['title'], "Salicylic Peel")
+
+        # Unpublished or deleted neighbours drop out without a rebuild
+        self.peel.is_active = False
+        self.peel.save()
+        items = self.client.get('/api/blogs/clearing-acne/').json()['related']
+        self.assertNotIn(('treatment', self.peel.id), [(item['type'], item['id']) for item in items])
+
+
+class SkinConcernLinkTests(ApiTestCase):
+    """Skin concerns linked to treatments and results"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = TreatmentCategory.objects.create(title="Facials", description="Facials")
+        cls.peel = Treatment.objects.create(category=category, name="Chemical Peel", duration="45 minutes",
+                                            description="Peel")
+        cls.facial = Treatment.objects.create(category=category, name="HydraFacial", duration="60 minutes",
+                                              description="Facial")
+        cls.result = Result.objects.create(condition="Acne Scars", duration="3 months", description="Clearer skin",
+                                           result_image="results/acne.jpg")
+
+    def create_concern(self, title, treatments="", results=""):
+        return SkinConcern.objects.create(title=title, description="Description", icon="icon.png",
+                                          treatments=treatments, products="Products", results=results)
+
+    @override_settings(API_SNAPSHOTS_ENABLED=False)
+    def test_list_embeds_links_in_fixed_queries(self):
+        concern = self.create_concern("Acne")
+        concern.linked_treatments.set([self.peel, self.facial])
+        concern.linked_results.set([self.result])
+        with self.assertNumQueries(4):
+            data = self.client.get('/api/skin-concerns/').json()['results']
+        self.assertEqual([item['name'] for item in data[0]['linked_treatments']], ["Chemical Peel", "HydraFacial"])
+        self.assertEqual(data[0]['linked_results'][0]['condition'], "Acne Scars")
+
+        for i in range(5):
+            self.create_concern(f"Concern {i}").linked_treatments.set([self.peel])
+        self.facial.is_active = False
+        self.facial.save()
+        with self.assertNumQueries(4):
+            data = self.client.get('/api/skin-concerns/').json()['results']
+        self.assertEqual([item['name'] for item in data[0]['linked_treatments']], ["Chemical Peel"])
+
+    def test_link_edits_invalidate_snapshots(self):
+        concern = self.create_concern("Acne")
+        self.assertEqual(self.client.get('/api/skin-concerns/').json()['results'][0]['linked_treatments'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            concern.linked_treatments.add(self.peel)
+        data = self.client.get('/api/skin-concerns/').json()['results']
+        self.assertEqual(data[0]['linked_treatments'][0]['id'], self.peel.id)
+
+    def test_reverse_link_edits_purge_both_sides(self):
+        concern = self.create_concern("Acne")
+        cdn.LocalPurgeBackend.purged.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.peel.skin_concerns.add(concern)
+        purged = set().union(*cdn.LocalPurgeBackend.purged)
+        self.assertTrue({'skinconcern', f'skinconcern-{concern.id}', f'treatment-{self.peel.id}'} <= purged)
+
+        cdn.LocalPurgeBackend.purged.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.peel.skin_concerns.clear()
+        self.assertIn('skinconcern', set().union(*cdn.LocalPurgeBackend.purged))
+
+    def test_migration_links_mentioned_treatments_and_results(self):
+        from importlib import import_module
+        from django.apps import apps
+
+        migration = import_module('api.migrations.0026_skinconcern_links')
+        acne = self.create_concern("Acne", treatments="Chemical peels, a HydraFacial or a Chemical Peel.")
+        dull = self.create_concern("Dull skin", treatments="Hydra facial", results="Fades acne scars")
+        migration.link_mentioned(apps, None)
+        self.assertEqual(set(acne.linked_treatments.all()), {self.peel, self.facial})
+        self.assertEqual(list(acne.linked_results.all()), [self.result])
+        self.assertEqual(list(dull.linked_treatments.all()), [])
+        self.assertEqual(list(dull.linked_results.all()), [self.result])
+
+
+class PricingAmountTests(ApiTestCase):
+    """Parsed numeric pricing and price filters on the treatment endpoints"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clinic = Clinic.objects.create(
+            name="Clinic", specialization="Skin", description="Clinic", address="Address", city="Delhi",
+            phone="0000000000", email="clinic@example.com", main_image="clinics/main/clinic.jpg",
+            google_maps_url="https://maps.example.com",
+        )
+        category = TreatmentCategory.objects.create(title="Facials", description="Facials")
+        cls.treatments = {}
+        for name, price in [("Peel", "₹3,000 - ₹5,000"), ("Facial", "From ₹1,500"), ("Laser", "On request"),
+                            ("Botox", "Rs. 12,000")]:
+            treatment = Treatment.objects.create(category=category, name=name, duration="60 minutes",
+                                                 description=name)
+            TreatmentClinicPricing.objects.create(treatment=treatment, clinic=cls.clinic, price=price)
+            cls.treatments[name] = treatment
+
+    def names(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        items = data['treatments'] if 'treatments' in data else data[0]['items']
+        return [item['name'] for item in items]
+
+    def test_parse_price(self):
+        self.assertEqual(prices.parse_price("$150"), (Decimal('150'), Decimal('150'), 'USD'))
+        self.assertEqual(prices.parse_price("From ₹2,500"), (Decimal('2500'), None, 'INR'))
+        self.assertEqual(prices.parse_price("Up to Rs. 8000"), (None, Decimal('8000'), 'INR'))
+        self.assertEqual(prices.parse_price("3 sessions for $300"), (Decimal('300'), Decimal('300'), 'USD'))
+        self.assertEqual(prices.parse_price("1.5k - 2k"), (Decimal('1500'), Decimal('2000'), ''))
+        self.assertEqual(prices.parse_price("Price on request"), (None, None, ''))
+
+    def test_amounts_follow_price_edits(self):
+        pricing = TreatmentClinicPricing.objects.get(treatment=self.treatments["Laser"])
+        self.assertEqual((pricing.amount_min, pricing.amount_max, pricing.currency), (None, None, ''))
+        pricing.price = "₹7,000"
+        pricing.save(update_fields=['price'])
+        pricing.refresh_from_db()
+        self.assertEqual((pricing.amount_min, pricing.amount_max, pricing.currency),
+                         (Decimal('7000'), Decimal('7000'), 'INR'))
+
+    def test_price_filter_and_sort(self):
+        for url in ['/api/treatments/', f'/api/clinics/{self.clinic.id}/treatments/']:
+            self.assertEqual(self.names(url, sort='price'), ["Facial", "Peel", "Botox", "Laser"])
+            self.assertEqual(self.names(url, sort='-price'), ["Botox", "Peel", "Facial", "Laser"])
+            self.assertEqual(self.names(url, price_max='3000', sort='price'), ["Facial", "Peel"])
+            self.assertEqual(self.client.get(url, {'price_max': 'cheap'}).status_code, 400)
+            self.assertEqual(self.client.get(url, {'sort': 'name'}).status_code, 400)
+        pricing = self.client.get('/api/treatments/', {'price_max': '2000'}).json()[0]['items'][0]['clinic_pricing']
+        self.assertEqual((pricing[0]['amount_min'], pricing[0]['amount_max'], pricing[0]['currency']),
+                         ('1500.00', None, 'INR'))
+
+    def test_prices_compared_within_one_currency(self):
+        treatment = Treatment.objects.create(category=self.treatments["Peel"].category, name="Tint",
+                                             duration="30 minutes", description="Tint")
+        TreatmentClinicPricing.objects.create(treatment=treatment, clinic=self.clinic, price="$40")
+        for url in ['/api/treatments/', f'/api/clinics/{self.clinic.id}/treatments/']:
+            response = self.client.get(url, {'price_max': '3000'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("INR, USD", response.json()['error'])
+            self.assertEqual(self.names(url, price_max='3000', sort='price', currency='inr'), ["Facial", "Peel"])
+            self.assertEqual(self.names(url, price_max='3000', currency='USD'), ["Tint"])
+            self.assertEqual(self.names(url, sort='price', currency='USD')[0], "Tint")
+            self.assertEqual(self.client.get(url, {'sort': 'price', 'currency': 'XYZ'}).status_code, 400)
+
+
+class FacetBrowseTests(ApiTestCase):
+    """Faceted treatment browsing from in-memory bitsets"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clinics, cls.categories, cls.treatments = seed_catalog(
+            clinics=3, categories=3, treatments_per_category=6, offers_per_clinic=0, blogs=0, appointments=0,
+        )
+        # seed_catalog bulk-creates, which skips the duration parsing in save()
+        for i, treatment in enumerate(cls.treatments):
+            treatment.duration = ["20 mins", "45 minutes", "1 hour 30 mins", "3 hours"][i % 4]
+            treatment.save()
+
+    def browse(self, **params):
+        response = self.client.get('/api/treatments/browse/', params)
+        self.assertEqual(response.status_code, 200)
+        # Served live from the facet index, never stored as a snapshot
+        self.assertFalse(response.has_header('X-Snapshot'))
+        return response.json()
+
+    def expected(self, selection):
+        treatments = Treatment.objects.filter(is_active=True, category__is_active=True)
+        if 'category' in selection:
+            treatments = treatments.filter(category_id__in=selection['category'])
+        if 'clinic' in selection:
+            treatments = treatments.filter(clinic_pricing__clinic_id__in=selection['clinic'],
+                                           clinic_pricing__is_active=True, clinic_pricing__clinic__is_active=True)
+        if 'featured' in selection:
+            treatments = treatments.filter(is_featured__in=selection['featured'])
+        return set(treatments.values_list('id', flat=True).distinct())
+
+    def test_results_and_counts_match_the_database(self):
+        category, clinic = self.categories[1], self.clinics[0]
+        facets.current()
+        with self.assertNumQueries(0):
+            data = self.browse(category=f'{category.id}', clinic=f'{clinic.id}')
+        ids = {item['id'] for item in data['results']}
+        self.assertEqual(ids, self.expected({'category': [category.id], 'clinic': [clinic.id]}))
+        self.assertEqual(data['count'], len(ids))
+
+        # A facet's counts ignore its own selection but apply the others
+        counts = {item['value']: item['count'] for item in data['facets']['category']}
+        for other in self.categories:
+            self.assertEqual(counts[other.id], len(self.expected({'category': [other.id], 'clinic': [clinic.id]})))
+        counts = {item['value']: item for item in data['facets']['clinic']}
+        self.assertTrue(counts[clinic.id]['selected'])
+        self.assertEqual(counts[self.clinics[1].id]['count'],
+                         len(self.expected({'category': [category.id], 'clinic': [self.clinics[1].id]})))
+        featured = {item['value']: item['count'] for item in data['facets']['featured']}
+        self.assertEqual(featured[True] + featured[False], data['count'])
+        self.assertFalse(ApiSnapshot.objects.exists())
+
+    def test_duration_buckets(self):
+        data = self.browse(duration='60-120,over-120', featured='false')
+        self.assertTrue(data['results'])
+        for item in data['results']:
+            self.assertIn(item["duration"], ("1 hour 30 mins", "3 hours"))
+        durations = {item['value']: item['count'] for item in data['facets']['duration']}
+        self.assertEqual(list(durations), ['up-to-30', '30-60', '60-120', 'over-120'])
+        self.assertEqual(self.client.get('/api/treatments/browse/', {'duration': 'week'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/treatments/browse/', {'clinic': 'x'}).status_code, 400)
+
+    def test_rebuilt_after_content_change(self):
+        treatment = Treatment.objects.filter(is_active=True).first()
+        before = self.browse(featured='true')['count']
+        treatment.is_featured = not treatment.is_featured
+        with self.captureOnCommitCallbacks(execute=True):
+            treatment.save()
+        self.assertEqual(self.browse(featured='true')['count'], before + (1 if treatment.is_featured else -1))
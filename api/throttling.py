@@ -0,0 +1,159 @@
+"""
+Token-bucket throttling for the public write endpoints.
+
+Each throttled view names a scope in ``API_THROTTLE_RATES``. A request must
+find a token in every bucket of its scope:
+
+- ``burst`` and ``sustained``: keyed by client IP, e.g. ``5/min`` and ``50/day``;
+- ``fingerprint``: keyed by a hash of the submitted payload, so the same
+  booking replayed from many IPs is still limited.
+
+Buckets are counted as sliding windows: a counter per bucket and window of
+the rate's period, spent with ``cache.add``/``cache.incr``. The previous
+window counts towards the limit in proportion to how much of it still
+overlaps, so like a token bucket the allowance refills gradually rather than
+all at once.
+
+Counters live in the default cache, so all workers share them. Only Redis
+(``REDIS_URL``) and local memory increment atomically, so only there does
+each concurrent request get its own count. The file cache used without
+Redis reads and rewrites the counter unlocked, so concurrent requests can
+lose counts and limits are approximate. Throttles run in
+``APIView.initial()``, before the serializer or any query, and rejections
+are counted per scope and day.
+"""
+import hashlib
+import logging
+import time
+from collections.abc import Mapping
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger('api.throttling')
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+DEFAULT_THROTTLE_RATES = {
+    'appointments': {'burst': '5/min', 'sustained': '50/day', 'fingerprint': '3/hour'},
+    'contact': {'burst': '3/min', 'sustained': '20/day', 'fingerprint': '2/hour'},
+    'blog_create': {'burst': '5/min', 'sustained': '100/day', 'fingerprint': '2/hour'},
+}
+
+METRICS_TIMEOUT = 60 * 60 * 24 * 31
+
+
+def parse_rate(rate):
+    """``'5/min'`` -> ``(5, 60)``: bucket capacity and the seconds to refill it"""
+    num, period = rate.split('/')
+    return int(num), DURATIONS[period[0]]
+
+
+def increment(key, timeout, delta=1):
+    """Atomically add ``delta`` to the counter at ``key``, creating it; returns the new count"""
+    if cache.add(key, delta, timeout):
+        return delta
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.set(key, delta, timeout)
+        return delta
+
+
+def metrics_key(scope, bucket, day):
+    return f"api:throttle:rejected:{scope}:{bucket}:{day.isoformat()}"
+
+
+def record_rejection(scope, bucket):
+    increment(metrics_key(scope, bucket, timezone.localdate()), METRICS_TIMEOUT)
+
+
+def rejection_counts(days=7):
+    """Rejected requests per day, scope and bucket for the last ``days`` days"""
+    rates = getattr(settings, 'API_THROTTLE_RATES', DEFAULT_THROTTLE_RATES)
+    today = timezone.localdate()
+    counts = {}
+    for offset in range(days):
+        day = today - timedelta(days=offset)
+        keys = {
+            metrics_key(scope, bucket, day): (scope, bucket)
+            for scope, buckets in rates.items() for bucket in buckets
+        }
+        for key, value in cache.get_many(keys).items():
+            counts[(day,) + keys[key]] = value
+    return counts
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle unsafe requests with the token buckets configured for the view's
+    ``throttle_scope``. Views may set ``throttle_fingerprint_fields`` to the
+    payload fields that identify a duplicate submission (default: all fields).
+    """
+
+    def allow_request(self, request, view):
+        if request.method in SAFE_METHODS or not getattr(settings, 'API_THROTTLE_ENABLED', True):
+            return True
+
+        self.scope = getattr(view, 'throttle_scope', None)
+        rates = getattr(settings, 'API_THROTTLE_RATES', DEFAULT_THROTTLE_RATES).get(self.scope)
+        if not rates:
+            return True
+
+        now = time.time()
+        self.wait_seconds = 0
+        spent = []
+        for bucket, rate in rates.items():
+            capacity, duration = parse_rate(rate)
+            window, elapsed = divmod(now, duration)
+            key = self.get_cache_key(request, view, bucket)
+            if key is None:
+                continue
+            # Spend first: the count returned is this request's own, however many race it
+            current_key = f"{key}:{int(window)}"
+            count = increment(current_key, duration * 2)
+            spent.append(current_key)
+            previous = cache.get(f"{key}:{int(window) - 1}", 0)
+            overlap = 1 - elapsed / duration
+            if count + previous * overlap > capacity:
+                # Only requests that get through spend from every bucket
+                for spent_key in spent:
+                    cache.decr(spent_key)
+                self.wait_seconds = self.get_wait(capacity, duration, elapsed, count, previous)
+                record_rejection(self.scope, bucket)
+                logger.warning(f"Throttled {request.method} {request.path} ({self.scope}/{bucket}) "
+                               f"from {self.get_ident(request)}")
+                return False
+        return True
+
+    def get_wait(self, capacity, duration, elapsed, count, previous):
+        """Seconds until a request counted as ``count`` in this window would fit"""
+        if count > capacity or not previous:
+            return duration - elapsed
+        # The previous window's share shrinks until count + previous * overlap == capacity
+        return max(0, duration * (1 - (capacity - count) / previous) - elapsed)
+
+    def get_cache_key(self, request, view, bucket):
+        """The bucket's counter key; None when the bucket does not apply to the request"""
+        if bucket == 'fingerprint':
+            if not isinstance(request.data, Mapping):
+                # Not a form or JSON object: the serializer rejects it, there is nothing to fingerprint
+                return None
+            ident = self.get_fingerprint(request, view)
+        else:
+            ident = self.get_ident(request)
+        return f"api:throttle:{self.scope}:{bucket}:{ident}"
+
+    def get_fingerprint(self, request, view):
+        data = request.data
+        fields = getattr(view, 'throttle_fingerprint_fields', None) or sorted(data.keys())
+        payload = '\n'.join(f"{field}={str(data.get(field, '')).strip().lower()}" for field in fields)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def wait(self):
+        return self.wait_seconds
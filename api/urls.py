@@ -18,6 +18,7 @@ urlpatterns = [
     path('treatments/', views.treatments_api, name='treatments'),
     path('treatments/categories/', views.treatment_categories_api, name='treatment_categories'),
     path('treatments/categories/nav/', views.treatment_categories_nav_api, name='treatment_categories_nav'),
+    path('treatments/browse/', views.treatment_browse_api, name='treatment_browse'),
     path('treatments/<int:treatment_id>/', views.treatment_detail_api, name='treatment_detail'),
     path('treatments/faq/', views.TreatmentFAQAPIView.as_view(), name='treatment_faq'),
     
@@ -26,6 +27,7 @@ urlpatterns = [
     path('clinics/<int:clinic_id>/', views.clinic_detail_api, name='clinic_detail'),
     path('clinics/<int:clinic_id>/treatments/', views.clinic_treatments_api, name='clinic_treatments'),
     path('clinics/<int:clinic_id>/offers/', views.clinic_offers_api, name='clinic_offers'),
+    path('clinics/<int:clinic_id>/availability/', views.clinic_availability_api, name='clinic_availability'),
     
     # Offers endpoints
     path('offers/', views.offers_api, name='offers_list'),
@@ -48,6 +50,8 @@ urlpatterns = [
     
     # Appointment booking
     path('appointments/', views.AppointmentCreateAPIView.as_view(), name='appointment_create'),
+    path('appointments/bulk/', views.AppointmentBulkCreateAPIView.as_view(), name='appointment_bulk_create'),
+    path('exports/<slug:name>.<slug:file_format>', views.export_api, name='export'),
     
     # Contact message
     path('contact/', views.ContactMessageCreateAPIView.as_view(), name='contact_create'),
@@ -57,4 +61,8 @@ urlpatterns = [
     
     # Site settings
     path('site-settings/', views.site_settings_api, name='site_settings'),
+    
+    # Search
+    path('search/', views.search_api, name='search'),
+    path('suggest/', views.suggest_api, name='suggest'),
 ] 
\ No newline at end of file
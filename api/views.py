@@ -1,27 +1,54 @@
 from django.shortcuts import render
-from rest_framework import generics, status
-from rest_framework.decorators import api_view
+from rest_framework import generics, permissions, status
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.db import models
+from django.db import models, transaction
+from django.conf import settings
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.http import Http404
+from datetime import date
+from . import availability, catalog, cdn, compression, exports, facets, notifications, search, site_settings, suggest
 from .models import *
 from .serializers import *
+from .snapshots import snapshot_view
+from .throttling import TokenBucketThrottle
 
 
+class SparseFieldsMixin:
+    """``?fields=``/``?exclude=`` for generic list views: trims the output and defers the unused columns"""
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.update(sparse_fieldset(self.request))
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fieldset = sparse_fieldset(self.request)
+        if fieldset:
+            queryset = self.get_serializer_class()(**fieldset).defer_dropped(queryset)
+        return queryset
+
+
+@method_decorator(snapshot_view(), name='dispatch')
 class LandingPageBgAPIView(generics.RetrieveAPIView):
     """API view for landing page background image or carousel"""
     serializer_class = LandingPageBgSerializer
     
     def get_object(self):
+        cdn.add_keys('landingpagebg')
         return get_object_or_404(LandingPageBg, is_active=True)
 
 
+@snapshot_view(params=('isLanding',))
 @api_view(['GET'])
 def about_us_api(request):
     """API view for About Us content with isLanding parameter"""
     is_landing = request.query_params.get('isLanding', 'false').lower() == 'true'
     
     page_type = 'landing' if is_landing else 'normal'
+    cdn.add_keys('aboutus')
     
     try:
         about_us = AboutUs.objects.get(page_type=page_type, is_active=True)
@@ -46,20 +73,21 @@ def about_us_api(request):
             )
 
 
+@snapshot_view(params=('limit',))
 @api_view(['GET'])
 def treatment_categories_nav_api(request):
     """API view for treatment categories with limited treatments for navbar mega menu"""
     limit = int(request.query_params.get('limit', 6))
-    
-    categories = TreatmentCategory.objects.filter(is_active=True).prefetch_related('items__clinic_pricing__clinic')
+    cdn.add_keys('treatmentcategory', 'treatment')
+    treatment_catalog = catalog.current()
     
     result = []
-    for category in categories:
-        treatments = category.items.filter(is_active=True)[:limit]
+    for category in treatment_catalog.active_categories:
+        treatments = treatment_catalog.category_treatments(category.id)
         
-        if treatments.exists():
+        if treatments:
             treatment_items = []
-            for treatment in treatments:
+            for treatment in treatments[:limit]:
                 treatment_items.append({
                     "id": treatment.id,
                     "name": treatment.name,
@@ -70,36 +98,34 @@ def treatment_categories_nav_api(request):
                 "title": category.title,
                 "description": category.description,
                 "treatments": treatment_items,
-                "total_count": category.items.filter(is_active=True).count()
+                "total_count": len(treatments)
             }
             result.append(category_data)
     
     return Response(result)
 
 
+@snapshot_view()
 @api_view(['GET'])
 def treatment_categories_api(request):
     """API view for treatment categories list (for categories page)"""
-    categories = TreatmentCategory.objects.filter(is_active=True)
+    treatment_catalog = catalog.current()
+    cdn.add_keys('treatmentcategory', 'treatment')
     
     result = []
-    for category in categories:
-        treatment_count = category.items.filter(is_active=True).count()
-        if treatment_count > 0:
+    for category in treatment_catalog.active_categories:
+        treatments = treatment_catalog.category_treatments(category.id)
+        if treatments:
             # Get first treatment image as category thumbnail
-            first_treatment = category.items.filter(is_active=True).first()
             thumbnail = ""
-            if first_treatment and first_treatment.image:
-                if request:
-                    thumbnail = request.build_absolute_uri(first_treatment.image.url)
-                else:
-                    thumbnail = first_treatment.image.url
+            if treatments[0].image:
+                thumbnail = request.build_absolute_uri(treatments[0].image)
             
             category_data = {
                 "id": category.id,
                 "title": category.title,
                 "description": category.description,
-                "treatment_count": treatment_count,
+                "treatment_count": len(treatments),
                 "thumbnail": thumbnail
             }
             result.append(category_data)
@@ -107,54 +133,92 @@ def treatment_categories_api(request):
     return Response(result)
 
 
+@snapshot_view(params=('isLanding', 'clinic_id', 'category_id', 'sort'))
 @api_view(['GET'])
 def treatments_api(request):
-    """API view for treatments with isLanding parameter and optional clinic filter"""
+    """API view for treatments with isLanding parameter, optional clinic filter and price filter/sort"""
     is_landing = request.query_params.get('isLanding', 'false').lower() == 'true'
     clinic_id = request.query_params.get('clinic_id', None)
     category_id = request.query_params.get('category_id', None)
+    try:
+        price_max, sort, currency = catalog.price_filter(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    treatment_catalog = catalog.current()
+    context = {'request': request, 'clinic_id': clinic_id, 'catalog': treatment_catalog}
+    fieldset = sparse_fieldset(request)
     
     if is_landing:
-        # Return featured treatments for landing page
-        treatments = Treatment.objects.filter(is_active=True, is_featured=True).prefetch_related('clinic_pricing__clinic')
-        if clinic_id:
-            # Filter treatments that have pricing for the specific clinic
-            treatments = treatments.filter(clinic_pricing__clinic_id=clinic_id, clinic_pricing__is_active=True)
-        serializer = TreatmentLandingSerializer(treatments, many=True, context={'request': request, 'clinic_id': clinic_id})
+        # Return featured treatments for landing page, optionally only those priced at the clinic
+        treatments = treatment_catalog.featured_treatments(clinic_id)
+        try:
+            treatments = treatment_catalog.by_price(treatments, clinic_id, price_max, sort, currency)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = TreatmentLandingSerializer(treatments, many=True, context=context, **fieldset)
         return Response(serializer.data)
     else:
         # Return treatment categories with items for normal page
-        categories = TreatmentCategory.objects.filter(is_active=True).prefetch_related('items__clinic_pricing__clinic')
+        categories = treatment_catalog.active_categories
+        cdn.add_keys('treatmentcategory')
         
         # Filter by category if specified
         if category_id:
-            categories = categories.filter(id=category_id)
+            categories = [category for category in categories if str(category.id) == category_id]
         
         result = []
         for category in categories:
-            treatments = category.items.filter(is_active=True)
-            if clinic_id:
-                # Filter treatments that have pricing for the specific clinic
-                treatments = treatments.filter(clinic_pricing__clinic_id=clinic_id, clinic_pricing__is_active=True)
+            # Optionally only the treatments that have pricing for the clinic
+            treatments = treatment_catalog.category_treatments(category.id, clinic_id)
+            try:
+                treatments = treatment_catalog.by_price(treatments, clinic_id, price_max, sort, currency)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
-            if treatments.exists():  # Only include categories that have treatments
+            if treatments:  # Only include categories that have treatments
                 category_data = {
                     "id": category.id,
                     "title": category.title,
                     "description": category.description,
-                    "items": TreatmentItemSerializer(treatments, many=True, context={'request': request, 'clinic_id': clinic_id}).data
+                    "items": TreatmentItemSerializer(treatments, many=True, context=context, **fieldset).data
                 }
                 result.append(category_data)
         
         return Response(result)
 
 
-class TreatmentFAQAPIView(generics.ListAPIView):
+# Not snapshotted: answered from the in-memory facet index, and every facet
+# combination would otherwise be stored as its own snapshot
+@api_view(['GET'])
+def treatment_browse_api(request):
+    """API view for treatments filtered by category, clinic, featured and duration, with facet counts"""
+    try:
+        selection = facets.parse_selection(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    cdn.add_keys('treatmentcategory', 'treatment', 'clinic')
+    index = facets.current()
+    treatments, facet_counts = index.browse(selection)
+    
+    # Pricing is narrowed to the clinic when exactly one is selected
+    clinics = selection.get('clinic', ())
+    clinic_id = next(iter(clinics)) if len(clinics) == 1 else None
+    context = {'request': request, 'clinic_id': clinic_id, 'catalog': catalog.current()}
+    return Response({
+        'count': len(treatments),
+        'results': TreatmentItemSerializer(treatments, many=True, context=context, **sparse_fieldset(request)).data,
+        'facets': facet_counts,
+    })
+
+
+@method_decorator(snapshot_view(params=('page',)), name='dispatch')
+class TreatmentFAQAPIView(SparseFieldsMixin, generics.ListAPIView):
     """API view for treatment FAQs"""
     serializer_class = TreatmentFAQSerializer
     queryset = TreatmentFAQ.objects.filter(is_active=True)
 
 
+@snapshot_view(params=('isLanding',))
 @api_view(['GET'])
 def results_api(request):
     """API view for results with isLanding parameter"""
@@ -162,6 +226,7 @@ def results_api(request):
     
     if is_landing:
         # Return one featured result for landing page
+        cdn.add_keys('result')
         try:
             result = Result.objects.filter(is_active=True, is_featured=True).first()
             if result:
@@ -180,23 +245,29 @@ def results_api(request):
     else:
         # Return all results for normal page
         results = Result.objects.filter(is_active=True)
-        serializer = ResultSerializer(results, many=True, context={'request': request})
+        serializer = sparse_list_serializer(ResultSerializer, results, {'request': request})
         return Response(serializer.data)
 
 
-class SkinConcernsAPIView(generics.ListAPIView):
-    """API view for skin concerns"""
+@method_decorator(snapshot_view(params=('page',)), name='dispatch')
+class SkinConcernsAPIView(SparseFieldsMixin, generics.ListAPIView):
+    """API view for skin concerns, with their linked treatments and results"""
     serializer_class = SkinConcernSerializer
     queryset = SkinConcern.objects.filter(is_active=True)
+    
+    def get_queryset(self):
+        return SkinConcernSerializer.setup_eager_loading(super().get_queryset())
 
 
-class LandingFAQAPIView(generics.ListAPIView):
+@method_decorator(snapshot_view(params=('page',)), name='dispatch')
+class LandingFAQAPIView(SparseFieldsMixin, generics.ListAPIView):
     """API view for landing page FAQs"""
     serializer_class = LandingFAQSerializer
     queryset = LandingFAQ.objects.filter(is_active=True)
 
 
-class WhyChooseUsAPIView(generics.ListAPIView):
+@method_decorator(snapshot_view(params=('page',)), name='dispatch')
+class WhyChooseUsAPIView(SparseFieldsMixin, generics.ListAPIView):
     """API view for Why Choose Us benefits"""
     serializer_class = WhyChooseUsSerializer
     queryset = WhyChooseUs.objects.filter(is_active=True)
@@ -206,6 +277,9 @@ class AppointmentCreateAPIView(generics.CreateAPIView):
     """API view for creating appointment bookings"""
     serializer_class = AppointmentSerializer
     queryset = Appointment.objects.all()
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'appointments'
+    throttle_fingerprint_fields = ['email', 'phone', 'preferred_date', 'preferred_time']
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -221,7 +295,79 @@ class AppointmentCreateAPIView(generics.CreateAPIView):
         )
 
 
-class TestimonialAPIView(generics.ListAPIView):
+class AppointmentBulkCreateAPIView(generics.GenericAPIView):
+    """API view for creating appointment bookings in batches (call center staff)"""
+    serializer_class = AppointmentBulkItemSerializer
+    permission_classes = [permissions.IsAdminUser]
+    
+    def post(self, request, *args, **kwargs):
+        rows = request.data
+        max_rows = getattr(settings, 'API_BULK_APPOINTMENTS_MAX', 500)
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {"error": "Expected a non-empty list of appointments"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(rows) > max_rows:
+            return Response(
+                {"error": f"At most {max_rows} appointments can be submitted at once"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Resolve every referenced clinic with one query
+        clinic_ids = set()
+        for row in rows:
+            try:
+                clinic_ids.add(int(row.get('clinic')))
+            except (AttributeError, TypeError, ValueError):
+                pass
+        clinics = Clinic.objects.in_bulk(clinic_ids)
+        
+        results = [None] * len(rows)
+        valid = []
+        for index, row in enumerate(rows):
+            if not isinstance(row, dict):
+                results[index] = {"index": index, "status": "error", "errors": {"non_field_errors": ["Expected an object"]}}
+                continue
+            serializer = self.get_serializer(data=row, context={'request': request, 'clinics': clinics})
+            if serializer.is_valid():
+                valid.append((index, Appointment(**serializer.validated_data)))
+            else:
+                results[index] = {"index": index, "status": "error", "errors": serializer.errors}
+        
+        created = []
+        with transaction.atomic():
+            slot_errors = availability.reserve_many([appointment for _, appointment in valid])
+            for position, (index, appointment) in enumerate(valid):
+                if position in slot_errors:
+                    results[index] = {"index": index, "status": "error", "errors": slot_errors[position]}
+                else:
+                    created.append((index, appointment))
+            Appointment.objects.bulk_create([appointment for _, appointment in created])
+        
+        for index, appointment in created:
+            results[index] = {"index": index, "status": "created", "appointment_id": appointment.id}
+        if created:
+            notifications.notify_bulk_appointments([appointment for _, appointment in created], clinics)
+        
+        if len(created) == len(rows):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(
+            {
+                "created": len(created),
+                "failed": len(rows) - len(created),
+                "results": results
+            },
+            status=response_status
+        )
+
+
+@method_decorator(snapshot_view(params=('page',)), name='dispatch')
+class TestimonialAPIView(SparseFieldsMixin, generics.ListAPIView):
     """API view for testimonials (Google review screenshots)"""
     serializer_class = TestimonialSerializer
     queryset = Testimonial.objects.filter(is_active=True)
@@ -236,6 +382,9 @@ class ContactMessageCreateAPIView(generics.CreateAPIView):
     """API view for creating contact messages"""
     serializer_class = ContactMessageSerializer
     queryset = ContactMessage.objects.all()
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'contact'
+    throttle_fingerprint_fields = ['email', 'subject', 'message']
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -252,11 +401,16 @@ class ContactMessageCreateAPIView(generics.CreateAPIView):
 
 
 # Blog Views
-class BlogListCreateAPIView(generics.ListCreateAPIView):
+@method_decorator(snapshot_view(params=('featured', 'page')), name='dispatch')
+class BlogListCreateAPIView(SparseFieldsMixin, generics.ListCreateAPIView):
     """API view for listing and creating blog posts"""
+    queryset = Blog.objects.filter(is_published=True)
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'blog_create'
+    throttle_fingerprint_fields = ['title', 'content']
     
     def get_queryset(self):
-        queryset = Blog.objects.filter(is_published=True)
+        queryset = super().get_queryset()
         
         # Filter by featured
         is_featured = self.request.query_params.get('featured', None)
@@ -313,9 +467,10 @@ class BlogDetailAPIView(generics.RetrieveUpdateAPIView):
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         
-        # Increment view count
-        instance.views_count += 1
-        instance.save(update_fields=['views_count'])
+        # Increment view count (static exports and snapshot renders are not visits)
+        if not getattr(request, 'is_internal_render', False):
+            instance.views_count += 1
+            instance.save(update_fields=['views_count'])
         
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
@@ -337,51 +492,55 @@ class BlogDetailAPIView(generics.RetrieveUpdateAPIView):
 
 
 # Treatment Detail View
+@snapshot_view(params=('clinic_id',))
 @api_view(['GET'])
 def treatment_detail_api(request, treatment_id):
     """API view for detailed treatment information"""
     clinic_id = request.query_params.get('clinic_id', None)
+    treatment_catalog = catalog.current()
     
-    try:
-        treatment = Treatment.objects.filter(id=treatment_id, is_active=True).prefetch_related('clinic_pricing__clinic').first()
-        if not treatment:
-            return Response(
-                {"error": "Treatment not found"},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        # Check if treatment is available at the specified clinic
-        if clinic_id:
-            if not treatment.clinic_pricing.filter(clinic_id=clinic_id, is_active=True).exists():
-                return Response(
-                    {"error": "Treatment not available at this clinic"},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-        
-        serializer = TreatmentDetailSerializer(treatment, context={'request': request, 'clinic_id': clinic_id})
-        return Response(serializer.data)
-    except Treatment.DoesNotExist:
+    treatment = treatment_catalog.treatments.get(treatment_id)
+    if not treatment:
         return Response(
             {"error": "Treatment not found"},
             status=status.HTTP_404_NOT_FOUND
         )
+    
+    # Check if treatment is available at the specified clinic
+    if clinic_id and not treatment_catalog.pricing(treatment.id, clinic_id):
+        return Response(
+            {"error": "Treatment not available at this clinic"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    serializer = TreatmentDetailSerializer(
+        treatment, context={'request': request, 'clinic_id': clinic_id, 'catalog': treatment_catalog},
+    )
+    return Response(serializer.data)
 
 
 # Clinic Views
+@snapshot_view()
 @api_view(['GET'])
 def clinics_api(request):
     """API view for clinics list"""
     clinics = Clinic.objects.filter(is_active=True)
-    serializer = ClinicListSerializer(clinics, many=True, context={'request': request})
+    serializer = sparse_list_serializer(ClinicListSerializer, clinics, {'request': request})
     return Response(serializer.data)
 
 
+@snapshot_view(params=('valid',))
 @api_view(['GET'])
 def clinic_detail_api(request, clinic_id):
-    """API view for clinic detail"""
+    """API view for clinic detail with optional valid-offers filter"""
+    valid_only = request.query_params.get('valid', 'false').lower() == 'true'
+    
     try:
-        clinic = get_object_or_404(Clinic, id=clinic_id, is_active=True)
-        serializer = ClinicDetailSerializer(clinic, context={'request': request})
+        clinics = ClinicDetailSerializer.setup_eager_loading(Clinic.objects.all(), valid_offers=valid_only)
+        clinic = get_object_or_404(clinics, id=clinic_id, is_active=True)
+        serializer = ClinicDetailSerializer(
+            clinic, context={'request': request, 'valid_offers': valid_only, 'catalog': catalog.current()},
+        )
         return Response(serializer.data)
     except Clinic.DoesNotExist:
         return Response(
@@ -390,42 +549,55 @@ def clinic_detail_api(request, clinic_id):
         )
 
 
+@snapshot_view(params=('sort',))
 @api_view(['GET'])
 def clinic_treatments_api(request, clinic_id):
-    """API view for treatments specific to a clinic"""
+    """API view for treatments specific to a clinic, with optional price filter/sort"""
     try:
-        clinic = get_object_or_404(Clinic, id=clinic_id, is_active=True)
-        # Get treatments that have pricing for this clinic
-        treatments = Treatment.objects.filter(
-            clinic_pricing__clinic=clinic, 
-            clinic_pricing__is_active=True,
-            is_active=True
-        ).prefetch_related('clinic_pricing__clinic').distinct().order_by('order', 'name')
-        
-        serializer = TreatmentItemSerializer(treatments, many=True, context={'request': request, 'clinic_id': clinic_id})
-        
-        return Response({
-            'clinic': {
-                'id': clinic.id,
-                'name': clinic.name,
-                'city': clinic.city
-            },
-            'treatments': serializer.data
-        })
-    except Clinic.DoesNotExist:
-        return Response(
-            {"error": "Clinic not found"}, 
-            status=status.HTTP_404_NOT_FOUND
-        )
+        price_max, sort, currency = catalog.price_filter(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    treatment_catalog = catalog.current()
+    clinic = treatment_catalog.clinics.get(clinic_id)
+    if clinic is None or not clinic.is_active:
+        raise Http404("No Clinic matches the given query.")
+    cdn.add_keys(cdn.instance_key(clinic))
+    
+    # Get treatments that have pricing for this clinic
+    treatments = treatment_catalog.clinic_treatments(clinic.id)
+    try:
+        treatments = treatment_catalog.by_price(treatments, clinic.id, price_max, sort, currency)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = TreatmentItemSerializer(
+        treatments, many=True, context={'request': request, 'clinic_id': clinic_id, 'catalog': treatment_catalog},
+        **sparse_fieldset(request),
+    )
+    
+    return Response({
+        'clinic': {
+            'id': clinic.id,
+            'name': clinic.name,
+            'city': clinic.city
+        },
+        'treatments': serializer.data
+    })
 
 
+@snapshot_view(params=('valid',))
 @api_view(['GET'])
 def clinic_offers_api(request, clinic_id):
-    """API view for offers specific to a clinic"""
+    """API view for offers specific to a clinic with optional valid-offers filter"""
+    valid_only = request.query_params.get('valid', 'false').lower() == 'true'
+    
     try:
         clinic = get_object_or_404(Clinic, id=clinic_id, is_active=True)
-        offers = Offer.objects.filter(clinic=clinic, is_active=True).order_by('order', '-created_at')
-        serializer = OfferSerializer(offers, many=True, context={'request': request})
+        offers = Offer.objects.filter(clinic=clinic, is_active=True)
+        if valid_only:
+            # Drop offers outside their validity window in SQL
+            offers = offers.valid()
+        offers = offers.order_by('order', '-created_at')
+        serializer = sparse_list_serializer(OfferSerializer, offers, {'request': request})
         
         return Response({
             'clinic': {
@@ -442,50 +614,81 @@ def clinic_offers_api(request, clinic_id):
         )
 
 
+@api_view(['GET'])
+def clinic_availability_api(request, clinic_id):
+    """API view for free appointment slots of a clinic over the next days"""
+    clinic = get_object_or_404(Clinic, id=clinic_id, is_active=True)
+    try:
+        start = date.fromisoformat(request.query_params['start']) if 'start' in request.query_params else timezone.localdate()
+        days = int(request.query_params.get('days', 30))
+    except ValueError:
+        return Response(
+            {"error": "start must be a YYYY-MM-DD date and days a number"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    days = max(1, min(days, availability.MAX_DAYS))
+    
+    return Response({
+        'clinic': {
+            'id': clinic.id,
+            'name': clinic.name,
+        },
+        'days': [
+            {
+                'date': day['date'].isoformat(),
+                'slots': [slot.strftime('%H:%M') for slot in day['slots']],
+            }
+            for day in availability.free_slots(clinic.id, start, days)
+        ]
+    })
+
+
+@snapshot_view(params=('clinic_id', 'valid'))
 @api_view(['GET'])
 def offers_api(request):
-    """API view for all active offers"""
+    """API view for all active offers with optional clinic and valid-offers filters"""
     clinic_id = request.query_params.get('clinic_id', None)
+    valid_only = request.query_params.get('valid', 'false').lower() == 'true'
     
     offers = Offer.objects.filter(is_active=True)
     if clinic_id:
         offers = offers.filter(clinic_id=clinic_id)
+    if valid_only:
+        # Drop offers outside their validity window in SQL
+        offers = offers.valid()
     
     offers = offers.order_by('order', '-created_at')
-    serializer = OfferSerializer(offers, many=True, context={'request': request})
+    serializer = sparse_list_serializer(OfferSerializer, offers, {'request': request})
     return Response(serializer.data)
 
 
-# Site Settings View
+# Export View
 @api_view(['GET'])
-def site_settings_api(request):
-    """API view for site settings"""
-    try:
-        site_settings = SiteSettings.objects.first()
-        if site_settings:
-            serializer = SiteSettingsSerializer(site_settings)
-            return Response(serializer.data)
-        else:
-            # Return default values if no settings exist
-            return Response({
-                "site_name": "Monalisa Wellness",
-                "site_tagline": "Skin Clinic",
-                "site_description": "Expert skincare treatments and products that transform your skin and enhance your natural beauty.",
-                "contact_email": "info@monalisaclinic.com",
-                "contact_phone": "092891 57655",
-                "address": "Delhi & Gurugram\nMultiple Locations",
-                "social_facebook": "",
-                "social_instagram": "",
-                "social_twitter": "",
-                "business_hours": "Monday - Sunday: Open Daily\nCloses at: 7:30 PM\nCall for specific timings",
-                "offers_strip_color": "#DC2626",
-                "offers_strip_gradient_color": "#B91C1C"
-            })
-    except Exception as e:
+@permission_classes([permissions.IsAdminUser])
+def export_api(request, name, file_format):
+    """API view for streaming CSV/XLSX exports of appointments and contact messages (staff only)"""
+    if name not in exports.EXPORTS or file_format not in exports.CONTENT_TYPES:
         return Response(
-            {"error": "Failed to fetch site settings"}, 
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            {"error": f"Unknown export. Available: {', '.join(exports.EXPORTS)} as csv or xlsx"},
+            status=status.HTTP_404_NOT_FOUND
         )
+    
+    queryset = exports.EXPORTS[name]['model'].objects.all()
+    if name == 'appointments':
+        if request.query_params.get('status'):
+            queryset = queryset.filter(status=request.query_params['status'])
+        if request.query_params.get('clinic_id'):
+            queryset = queryset.filter(clinic_id=request.query_params['clinic_id'])
+    return exports.export_response(name, queryset, file_format)
+
+
+# Site Settings View
+@api_view(['GET'])
+def site_settings_api(request):
+    """API view for site settings, served from the process-level copy"""
+    cdn.add_keys('sitesettings')
+    body, encoded = site_settings.rendered()
+    return compression.precompressed_response(request, body, encoded)
 
 
 # Additional utility views
@@ -495,15 +698,76 @@ def health_check(request):
     return Response({"status": "OK", "message": "Monalisa Wellness API is running"})
 
 
+@api_view(['GET'])
+def search_api(request):
+    """API view for ranked site search across treatments, skin concerns, blogs and FAQs"""
+    query = request.query_params.get('q', '').strip()
+    kinds = [kind for kind in request.query_params.get('type', '').split(',') if kind]
+    unknown = set(kinds) - set(search.SOURCES)
+    if unknown:
+        return Response(
+            {"error": f"Unknown type(s): {', '.join(sorted(unknown))}. Choose from {', '.join(search.SOURCES)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        limit = int(request.query_params.get('limit', 20))
+    except ValueError:
+        return Response({"error": "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+    
+    results = list(search.search(query, kinds, limit)) if query else []
+    # Any edit to a searchable model may change the results
+    cdn.add_keys(*(search.SOURCES[kind][0]._meta.model_name for kind in kinds or search.SOURCES))
+    return Response({
+        'query': query,
+        'count': len(results),
+        'results': [
+            {
+                'type': entry.kind,
+                'id': entry.object_id,
+                'title': entry.title,
+                'excerpt': entry.excerpt,
+                'slug': entry.slug,
+                'score': round(entry.score, 4),
+            }
+            for entry in results
+        ]
+    })
+
+
+@api_view(['GET'])
+def suggest_api(request):
+    """API view for typeahead over treatment, category, skin concern and clinic names, answered from memory"""
+    query = request.query_params.get('q', '')
+    types = [kind for kind in request.query_params.get('type', '').split(',') if kind]
+    unknown = set(types) - set(suggest.TYPES)
+    if unknown:
+        return Response(
+            {"error": f"Unknown type(s): {', '.join(sorted(unknown))}. Choose from {', '.join(suggest.TYPES)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 8)), suggest.MAX_LIMIT))
+    except ValueError:
+        return Response({"error": "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+    
+    cdn.add_keys('treatment', 'treatmentcategory', 'skinconcern', 'clinic')
+    suggestions = suggest.current().lookup(query, types or None, limit)
+    return Response({
+        'query': query,
+        'results': [suggestion.as_dict() for suggestion in suggestions],
+    })
+
+
 @api_view(['GET'])
 def api_endpoints(request):
     """List all available API endpoints"""
     endpoints = {
         "Landing Page Background": "/api/landing-bg/",
         "About Us": "/api/about-us/ (add ?isLanding=true for landing page)",
-        "Treatments": "/api/treatments/ (add ?isLanding=true for featured, ?category_id=X for category filter)",
+        "Treatments": "/api/treatments/ (add ?isLanding=true for featured, ?category_id=X for category filter, ?price_max=5000 and ?sort=price|-price)",
         "Treatment Categories": "/api/treatments/categories/ (for categories page)",
         "Treatment Categories Nav": "/api/treatments/categories/nav/ (for navbar mega menu, ?limit=6)",
+        "Treatment Browse": "/api/treatments/browse/ (facet counts; ?category=1,2&clinic=3&featured=true&duration=30-60)",
         "Treatment Detail": "/api/treatments/{id}/",
         "Treatment FAQs": "/api/treatments/faq/",
         "Blog List & Create": "/api/blogs/ (GET: list, POST: create)",
@@ -513,11 +777,18 @@ def api_endpoints(request):
         "Landing Page FAQs": "/api/landing/faq/",
         "Why Choose Us": "/api/why-choose-us/",
         "Clinics List": "/api/clinics/",
-        "Clinic Detail": "/api/clinics/{id}/",
+        "Clinic Detail": "/api/clinics/{id}/ (add ?valid=true for currently valid offers only)",
+        "Clinic Offers": "/api/clinics/{id}/offers/ (add ?valid=true for currently valid offers only)",
+        "Offers": "/api/offers/ (?clinic_id=X for clinic filter, ?valid=true for currently valid offers only)",
+        "Clinic Availability": "/api/clinics/{id}/availability/ (free appointment slots, ?days=30&start=YYYY-MM-DD)",
         "Book Appointment": "/api/appointments/ (POST)",
+        "Bulk Appointments": "/api/appointments/bulk/ (POST a list, staff only)",
+        "Exports": "/api/exports/{appointments|contact-messages}.{csv|xlsx} (staff only, appointments accept ?status=&clinic_id=)",
         "Contact Message": "/api/contact/ (POST)",
         "Testimonials": "/api/testimonials/",
         "Site Settings": "/api/site-settings/",
+        "Suggest": "/api/suggest/?q=hyd (typeahead over treatments, categories, skin concerns and clinics; ?type=treatment&limit=8)",
+        "Search": "/api/search/?q=acne (treatments, skin concerns, blogs and FAQs; ?type=blog,treatment&limit=20)",
         "Health Check": "/api/health/",
         "API Endpoints": "/api/endpoints/",
     }
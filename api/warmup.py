@@ -0,0 +1,113 @@
+"""
+Worker warm-up, so the first visitors after a deploy or restart do not pay for
+cold imports, URL resolution and empty caches.
+
+``warm_up()`` imports the views, primes the URL resolver, loads the catalog,
+typeahead index and site settings into process memory and pulls the hottest
+API snapshots into the cache (rendering any that are stale). The gunicorn
+hooks in ``gunicorn.conf.py`` run it once in the master when the app is
+preloaded (workers then inherit the warm state copy-on-write) or else in
+every worker before it accepts requests. Timings are logged per phase.
+"""
+import logging
+import os
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.urls import get_resolver, resolve
+
+from . import catalog, site_settings, snapshots, suggest
+
+logger = logging.getLogger('api.warmup')
+
+# The endpoints every page view needs, warmed with their public parameter permutations
+HOT_PATHS = [
+    '/api/landing-bg/',
+    '/api/about-us/',
+    '/api/treatments/',
+    '/api/treatments/categories/',
+    '/api/treatments/categories/nav/',
+    '/api/results/',
+    '/api/skin-concerns/',
+    '/api/landing/faq/',
+    '/api/why-choose-us/',
+    '/api/clinics/',
+    '/api/offers/',
+    '/api/testimonials/',
+    '/api/blogs/',
+]
+
+
+def warmup_enabled():
+    return getattr(settings, 'API_WARMUP', True)
+
+
+def prime_urls():
+    """Import the views and build the resolver's lookup tables"""
+    import_module(settings.ROOT_URLCONF)
+    import_module('api.serializers')
+    get_resolver()._populate()
+    for path in HOT_PATHS:
+        resolve(path)
+
+
+def hot_targets():
+    """
+    Public targets of the hot endpoints on the canonical host, for each scheme
+    it was served on (https before any snapshot exists). Bounded by the
+    content, not by the snapshots visitors happened to create.
+    """
+    from .models import ApiSnapshot
+
+    host = snapshots.canonical_host()
+    schemes = set(ApiSnapshot.objects.filter(host=host).values_list('scheme', flat=True).distinct()) or {'https'}
+    return [
+        target
+        for scheme in sorted(schemes)
+        for target in snapshots.public_targets(host, scheme)
+        if target.path in HOT_PATHS
+    ]
+
+
+def release_connections():
+    """Close database and cache connections, which must not be shared with forked workers"""
+    connections.close_all()
+    for cache in caches.all():
+        cache.close()
+
+
+def warm_up():
+    """Warm this process; returns ``{phase: milliseconds}`` plus the number of ``targets`` warmed"""
+    timings = {}
+    started = last = time.monotonic()
+
+    def mark(phase):
+        nonlocal last
+        now = time.monotonic()
+        timings[phase] = round((now - last) * 1000, 1)
+        last = now
+
+    prime_urls()
+    mark('urls')
+    try:
+        catalog.current()
+        mark('catalog')
+        suggest.current()
+        mark('suggest')
+        site_settings.loaded()
+        mark('site_settings')
+        targets = hot_targets()
+        for target in targets:
+            snapshots.render(target, refresh=False)
+        mark('responses')
+        timings['targets'] = len(targets)
+    except Exception:
+        logger.exception("Warm-up could not load content")
+    timings['total'] = round((time.monotonic() - started) * 1000, 1)
+    phases = ', '.join(f"{phase} {value}ms" for phase, value in timings.items() if phase not in ('total', 'targets'))
+    logger.info(f"Warm-up of process {os.getpid()} took {timings['total']}ms ({phases}); "
+                f"{timings.get('targets', 0)} hot response(s) ready")
+    return timings
@@ -23,12 +23,23 @@ AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 AWS_STORAGE_BUCKET_NAME = os.getenv('AWS_STORAGE_BUCKET_NAME')
 AWS_S3_REGION_NAME = os.getenv('AWS_S3_REGION_NAME')
 
+# Cache Configuration
+# Leave empty to use the local file cache (single host only)
+REDIS_URL = os.getenv('REDIS_URL', '')
+
+# CDN Configuration
+# Leave empty to skip CDN purges (surrogate keys are still sent)
+FASTLY_SERVICE_ID = os.getenv('FASTLY_SERVICE_ID', '')
+FASTLY_API_TOKEN = os.getenv('FASTLY_API_TOKEN', '')
+
 # Django Settings
 # SECRET_KEY = os.getenv('SECRET_KEY')
 SECRET_KEY = 'django-insecure-fallback-key'
 # DEBUG = os.getenv('DEBUG')
 DEBUG = os.getenv('DEBUG') == 'True'
 ALLOWED_HOSTS = ['*']
+# Public host of the API; only requests on it are served from snapshots
+API_CANONICAL_HOST = os.getenv('API_CANONICAL_HOST', 'monalisaclinic.up.railway.app')
 
 # Email Configuration (for appointment notifications)
 # 
@@ -51,4 +62,10 @@ EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True').lower() == 'true'
 # Set to 'False' for development/local (fixes macOS SSL certificate issues)
 # Set to 'True' for production (recommended)
 EMAIL_SSL_VERIFY = os.getenv('EMAIL_SSL_VERIFY', 'False').lower() == 'true'
-OWNER_EMAIL = os.getenv('OWNER_EMAIL', 'owner@monalisawellness.com') 
\ No newline at end of file
+OWNER_EMAIL = os.getenv('OWNER_EMAIL', 'owner@monalisawellness.com') 
+
+# Owner notifications
+# 'immediate' emails every appointment/contact message; 'digest' batches them for the
+# send_notification_digest command ('global' or 'clinic' grouping)
+NOTIFICATION_MODE = os.getenv('NOTIFICATION_MODE', 'immediate')
+NOTIFICATION_DIGEST_GROUPING = os.getenv('NOTIFICATION_DIGEST_GROUPING', 'global')
\ No newline at end of file
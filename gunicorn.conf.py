@@ -0,0 +1,28 @@
+"""
+Gunicorn hooks for the web dyno; gunicorn loads this file from the working directory.
+
+The API is warmed up before it takes traffic (see api/warmup.py): once in the
+master when started with --preload, so workers inherit the warm state
+copy-on-write, otherwise in each worker after it loads the app.
+"""
+import time
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        from api import warmup
+        if warmup.warmup_enabled():
+            warmup.warm_up()
+            warmup.release_connections()
+
+
+def post_fork(server, worker):
+    worker.forked_at = time.monotonic()
+
+
+def post_worker_init(worker):
+    if not worker.cfg.preload_app:
+        from api import warmup
+        if warmup.warmup_enabled():
+            warmup.warm_up()
+    worker.log.info(f"Worker {worker.pid} ready {(time.monotonic() - worker.forked_at) * 1000:.0f}ms after fork")
@@ -58,6 +58,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
     'storages',
@@ -66,6 +67,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.compression.CompressionMiddleware',
+    'api.cdn.CachePolicyMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -169,6 +172,76 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20
 }
 
+# Throttling
+# Token buckets for the public POST endpoints, keyed by client IP (burst, sustained)
+# and by payload fingerprint; see api/throttling.py. Set NUM_PROXIES in
+# REST_FRAMEWORK when running behind a load balancer so client IPs are used.
+API_THROTTLE_ENABLED = globals().get('API_THROTTLE_ENABLED', True)
+API_THROTTLE_RATES = {
+    'appointments': {'burst': '5/min', 'sustained': '50/day', 'fingerprint': '3/hour'},
+    'contact': {'burst': '3/min', 'sustained': '20/day', 'fingerprint': '2/hour'},
+    'blog_create': {'burst': '5/min', 'sustained': '100/day', 'fingerprint': '2/hour'},
+}
+
+# Largest batch accepted by /api/appointments/bulk/
+API_BULK_APPOINTMENTS_MAX = 500
+
+# Cache Configuration
+# Redis is shared by every worker and dyno; without it fall back to a file cache
+# so the gunicorn workers on one host still share API snapshots and versions.
+REDIS_URL = globals().get('REDIS_URL', os.getenv('REDIS_URL', ''))
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(BASE_DIR, '.cache'),
+        }
+    }
+
+# API Snapshots
+# Serve public GET endpoints from pre-rendered JSON until content changes
+API_SNAPSHOTS_ENABLED = globals().get('API_SNAPSHOTS_ENABLED', True)
+# Only requests on this Host are snapshotted (ALLOWED_HOSTS may be a wildcard);
+# the snapshot rebuilds and warm-up render for it too
+API_CANONICAL_HOST = globals().get(
+    'API_CANONICAL_HOST', os.getenv('API_CANONICAL_HOST', 'monalisaclinic.up.railway.app')
+)
+# Seconds to wait after the last content save before re-rendering stale snapshots
+# in the background (None disables background rebuilds)
+API_SNAPSHOT_REBUILD_DELAY = 2
+# Warm each gunicorn worker (or the master with --preload) before it takes traffic;
+# see gunicorn.conf.py and api/warmup.py
+API_WARMUP = globals().get('API_WARMUP', True)
+
+# CDN Caching
+# Public API responses carry Cache-Control and Surrogate-Key headers (see api/cdn.py);
+# content edits purge the affected keys, batched over API_PURGE_DELAY seconds.
+FASTLY_SERVICE_ID = globals().get('FASTLY_SERVICE_ID', os.getenv('FASTLY_SERVICE_ID', ''))
+FASTLY_API_TOKEN = globals().get('FASTLY_API_TOKEN', os.getenv('FASTLY_API_TOKEN', ''))
+if FASTLY_SERVICE_ID and FASTLY_API_TOKEN:
+    API_PURGE_BACKEND = 'api.cdn.FastlyPurgeBackend'
+else:
+    API_PURGE_BACKEND = 'api.cdn.LoggingPurgeBackend'
+API_PURGE_DELAY = 1
+
+# Compression
+# /api/ responses of at least API_COMPRESS_MIN_SIZE bytes are sent gzip- or
+# brotli-encoded per Accept-Encoding; snapshots store their compressed variants.
+API_COMPRESS_MIN_SIZE = 1024
+
+# Search
+# PostgreSQL text search configuration used to stem /api/search/ documents and queries
+API_SEARCH_CONFIG = globals().get('API_SEARCH_CONFIG', 'english')
+# Related items per blog/treatment/skin concern kept by build_related_content
+API_RELATED_TOP_K = 5
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -197,6 +270,17 @@ EMAIL_TIMEOUT = 5  # 5 second timeout for email connections
 DEFAULT_FROM_EMAIL = globals().get('EMAIL_HOST_USER', 'noreply@monalisawellness.com')
 OWNER_EMAIL = globals().get('OWNER_EMAIL', 'owner@monalisawellness.com')
 
+# Owner Notifications
+# 'immediate': one email per appointment/contact message.
+# 'digest': items are collected and sent by `manage.py send_notification_digest`, run from the
+# scheduler at the digest interval, as one summary ('global') or one per clinic ('clinic').
+# Urgent items (keyword match, or appointments within NOTIFICATION_URGENT_WITHIN_DAYS days)
+# are always emailed immediately.
+NOTIFICATION_MODE = globals().get('NOTIFICATION_MODE', os.getenv('NOTIFICATION_MODE', 'immediate'))
+NOTIFICATION_DIGEST_GROUPING = globals().get('NOTIFICATION_DIGEST_GROUPING', os.getenv('NOTIFICATION_DIGEST_GROUPING', 'global'))
+NOTIFICATION_URGENT_WITHIN_DAYS = 1
+NOTIFICATION_URGENT_KEYWORDS = ['urgent', 'emergency', 'allergic', 'reaction', 'severe pain', 'bleeding']
+
 # SSL Certificate Verification
 # Set to False to disable SSL certificate verification (for development/local)
 # Set to True for production (recommended)
@@ -0,0 +1,44 @@
+"""
+Settings for API-only worker processes.
+
+Same configuration as ``monalisa_backend.settings`` without the admin and
+everything only the admin needs: admin_interface, colorfield, sessions,
+messages, auth, static files, templates, and the session, CSRF, auth,
+message and clickjacking middleware. The anonymous public API uses none of
+them.
+
+Serve it with ``gunicorn monalisa_backend.wsgi_api`` (or ``asgi_api``) and
+route ``/admin/`` to workers on the full settings. The staff-only endpoints
+(``/api/appointments/bulk/`` and ``/api/exports/``) need an admin session,
+so route them to the admin workers too.
+"""
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    'django.contrib.postgres',
+    'rest_framework',
+    'corsheaders',
+    'storages',
+    'api',
+]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'api.compression.CompressionMiddleware',
+    'api.cdn.CachePolicyMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+ROOT_URLCONF = 'monalisa_backend.urls_api'
+
+TEMPLATES = []
+
+WSGI_APPLICATION = 'monalisa_backend.wsgi_api.application'
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    # No sessions or users: every request is anonymous
+    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'UNAUTHENTICATED_USER': None,
+}
@@ -0,0 +1,8 @@
+"""
+URL configuration for API-only workers (``monalisa_backend.settings_api``).
+"""
+from django.urls import path, include
+
+urlpatterns = [
+    path('api/', include('api.urls')),
+]
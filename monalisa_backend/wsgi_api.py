@@ -0,0 +1,13 @@
+"""
+WSGI config for API-only workers.
+
+Same as ``wsgi.py`` with the slim ``monalisa_backend.settings_api`` profile.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'monalisa_backend.settings_api')
+
+application = get_wsgi_application()